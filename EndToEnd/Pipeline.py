@@ -10,8 +10,11 @@ if project_root not in sys.path:
 
 from STTPhase.SimpleSTT import record_until_q
 from STTPhase.wavWhisperSingleFile import processAudio
-from RAGs.Implementation_with_GRPO import ask_query_with_grpo
-from TTSPhase.ElevenLabsAPIText import genAudioText
+from RAGs.Implementation_with_GRPO import ask_query_with_grpo, stream_answer_sentences
+from TTSPhase.ElevenLabsAPIText import genAudioText, genAudioSentences
+
+# Stream the answer sentence by sentence into TTS (set ANSWER_STREAMING=0 for the GRPO answer)
+ANSWER_STREAMING = os.getenv("ANSWER_STREAMING", "1").lower() not in ("0", "false", "no")
 
 def main():
     # Use absolute path for current working directory
@@ -26,6 +29,11 @@ def main():
     # 2. Transcribe audio
     transcript = processAudio(base_filename, current_dir)
 
+    if ANSWER_STREAMING:
+        # 3+4. Each answer sentence goes to TTS while flan-t5 decodes the next one
+        genAudioSentences(stream_answer_sentences(transcript), filename=f"response_{timestamp}", directory=current_dir)
+        return
+
     # 3. Query RAG with GRPO
     answer = ask_query_with_grpo(transcript)
 
@@ -0,0 +1,242 @@
+"""End-to-end latency benchmark for the voice pipeline.
+
+Runs the real STT and RAG stages over the sample recordings and sends the
+answers to a local fake ElevenLabs server (or --base-url), timing every stage:
+
+    decode       wav -> 16 kHz float32 array
+    transcribe   speech-to-text on the configured STT_BACKEND
+    retrieve     KB similarity search (top 3)
+    generate     one batched generate() call for the GRPO candidate group
+    reward       clean + score the candidates and pick the best one
+    synthesize   TTS of the chosen answer (cache bypassed)
+    end_to_end   sum of the above for one recording
+
+and reports p50/p95/p99 per stage plus peak RSS. Results go to JSON so runs
+can be compared across commits:
+
+    python EndToEnd/benchmark.py --repeats 3 --output bench_$(git rev-parse --short HEAD).json
+    python EndToEnd/benchmark.py --compare bench_old.json --output bench_new.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+
+import numpy as np
+
+# Dynamically add project root to sys.path if needed
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from TTSPhase.fakeElevenServer import start_server
+
+DEFAULT_INPUT_DIRS = [
+    os.path.join(project_root, "STTPhase", "samplesWavs"),
+    os.path.join(project_root, "STTPhase", "recordedWavs"),
+]
+STAGES = ["decode", "transcribe", "retrieve", "generate", "reward", "synthesize", "end_to_end"]
+PERCENTILES = (50, 95, 99)
+
+
+def find_wavs(directories):
+    paths = []
+    for directory in directories:
+        if os.path.isdir(directory):
+            paths += [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.lower().endswith(".wav")]
+    return paths
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    summary = {f"p{p}": round(float(np.percentile(samples, p)), 4) for p in PERCENTILES}
+    summary["mean"] = round(float(np.mean(samples)), 4)
+    summary["n"] = len(samples)
+    return summary
+
+
+class Pipeline:
+    """The pipeline's stages called one at a time so each can be timed on its own."""
+
+    def __init__(self):
+        from STTPhase.wavAPIDirectory import load_audio
+        from STTPhase.wavWhisperSingleFile import transcribeArray
+        from RAGs.Implementation_with_GRPO import build_prompt, clean_response, get_pipe, get_retriever, grpo
+        from TTSPhase.ElevenLabsAPIText import synthesizeText
+        from Shared.modelRegistry import registry
+
+        self.load_audio = load_audio
+        self.transcribe_array = transcribeArray
+        self.build_prompt = build_prompt
+        self.clean_response = clean_response
+        self.get_pipe = get_pipe
+        self.get_retriever = get_retriever
+        self.grpo = grpo
+        self.synthesize_text = synthesizeText
+        self.registry = registry
+
+    def load_models(self):
+        start = time.perf_counter()
+        ok = self.registry.load_all()
+        return ok, round(time.perf_counter() - start, 2)
+
+    def run(self, path):
+        """One recording through every stage; returns (timings, record)."""
+        timings = {}
+
+        def timed(stage, fn, *args, **kwargs):
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            timings[stage] = time.perf_counter() - start
+            return result
+
+        audio, _ = timed("decode", self.load_audio, path)
+        if audio is None:
+            raise ValueError(f"could not decode {path}")
+        transcript = timed("transcribe", self.transcribe_array, audio).strip()
+        docs = timed("retrieve", lambda q: self.get_retriever().invoke(q)[:3], transcript)
+        context = " ".join(doc.page_content for doc in docs)
+        prompt = self.build_prompt(transcript, docs)
+        candidates = timed("generate", self.grpo.generate_response_group, prompt, self.get_pipe())
+
+        def pick():
+            cleaned = [self.clean_response(c) for c in candidates]
+            rewards = [self.grpo.calculate_reward(c, transcript, context) for c in cleaned]
+            return self.grpo.select_best_response(transcript, context, cleaned, rewards)
+
+        answer, reward = timed("reward", pick)
+        audio_bytes = timed("synthesize", self.synthesize_text, answer, use_cache=False)
+        timings["end_to_end"] = sum(timings.values())
+        return timings, {
+            "file": os.path.relpath(path, project_root),
+            "audio_seconds": round(len(audio) / 16000, 2),
+            "transcript": transcript,
+            "answer": answer,
+            "reward": round(float(reward), 3),
+            "tts_bytes": len(audio_bytes or b""),
+        }
+
+
+def compare(previous, current):
+    """Print the p50/p95 change of every stage against an earlier report."""
+    print(f"\n{'stage':<12} {'p50 before':>11} {'p50 now':>9} {'Δ%':>7} {'p95 before':>11} {'p95 now':>9} {'Δ%':>7}")
+    for stage in STAGES:
+        old, new = previous["stages"].get(stage), current["stages"].get(stage)
+        if not old or not new:
+            continue
+        row = [stage]
+        for p in ("p50", "p95"):
+            change = (new[p] - old[p]) / old[p] * 100 if old[p] else float("nan")
+            row += [f"{old[p]:.3f}", f"{new[p]:.3f}", f"{change:+.1f}"]
+        print(f"{row[0]:<12} {row[1]:>11} {row[2]:>9} {row[3]:>7} {row[4]:>11} {row[5]:>9} {row[6]:>7}")
+    print(f"peak RSS: {previous['peak_rss_mb']} MB -> {current['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark of the STT -> RAG -> TTS pipeline")
+    parser.add_argument("--inputs", nargs="+", default=DEFAULT_INPUT_DIRS, help="Directories with .wav recordings")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the recordings (after one warm-up file)")
+    parser.add_argument("--base-url", help="Use a running TTS API (default: start a local fake server)")
+    parser.add_argument("--first-byte-ms", type=float, default=350)
+    parser.add_argument("--realtime-factor", type=float, default=0.25)
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--compare", help="Earlier JSON report to diff against")
+    args = parser.parse_args()
+
+    paths = find_wavs(args.inputs)
+    if not paths:
+        sys.exit(f"No .wav files found in {args.inputs}")
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = start_server(first_byte_ms=args.first_byte_ms, realtime_factor=args.realtime_factor)
+    # The shared TTS client reads its endpoint when it is first created
+    os.environ["ELEVENLABS_BASE_URL"] = base_url
+
+    try:
+        pipeline = Pipeline()
+        models_ready, load_seconds = pipeline.load_models()
+        if not models_ready:
+            sys.exit(f"Model preload failed: {json.dumps(pipeline.registry.status()['models'], indent=2)}")
+        rss_after_load = peak_rss_mb()
+        print(f"✅ Models ready in {load_seconds}s (peak RSS {rss_after_load} MB)")
+
+        pipeline.run(paths[0])  # warm-up: first-call allocations and lazy inits stay out of the numbers
+        samples = {stage: [] for stage in STAGES}
+        records, failures = [], []
+        for repeat in range(args.repeats):
+            for path in paths:
+                try:
+                    timings, record = pipeline.run(path)
+                except Exception as e:
+                    failures.append({"file": os.path.relpath(path, project_root), "error": f"{type(e).__name__}: {e}"})
+                    print(f"❌ {path}: {e}")
+                    continue
+                for stage, seconds in timings.items():
+                    samples[stage].append(seconds)
+                if repeat == 0:
+                    records.append(record)
+                print(f"🎧 {record['file']}: {timings['end_to_end']:.2f}s")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "stt_backend": os.getenv("STT_BACKEND", "whisper"),
+            "stt_model_size": os.getenv("STT_MODEL_SIZE", "tiny"),
+            "gen_backend": os.getenv("GEN_BACKEND", "auto"),
+            "grpo_group_size": pipeline.grpo.group_size,
+            "tts_base_url": base_url,
+            "cpus": os.cpu_count(),
+        },
+        "files": len(paths),
+        "repeats": args.repeats,
+        "model_load_seconds": load_seconds,
+        "peak_rss_after_load_mb": rss_after_load,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+        "records": records,
+        "failures": failures,
+    }
+
+    print(f"\n{'stage':<12} {'p50':>8} {'p95':>8} {'p99':>8} {'n':>5}")
+    for stage, summary in report["stages"].items():
+        if summary:
+            print(f"{stage:<12} {summary['p50']:>8.3f} {summary['p95']:>8.3f} {summary['p99']:>8.3f} {summary['n']:>5}")
+    print(f"peak RSS: {report['peak_rss_mb']} MB")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
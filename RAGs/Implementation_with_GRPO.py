@@ -1,15 +1,31 @@
-from langchain.schema import Document
+import os
+import sys
+
+# Dynamically add project root to sys.path if needed
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
+from transformers import pipeline
 from langchain_community.llms import HuggingFacePipeline
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
+from RAGs.index_store import load_or_build_index
+from RAGs.semantic_cache import SemanticCache
+from RAGs.generation_backends import describe, load_seq2seq
+from RAGs.batch_scheduler import GEN_BATCHING, GenerationBatcher
+from RAGs.sentence_stream import split_sentences, stream_pieces
+from Shared.metrics import GRPO_REWARD, STAGE_SECONDS, record_cache_lookup, stage_timer
+from Shared.modelRegistry import registry
 import torch
 import numpy as np
 from collections import deque
+from functools import lru_cache
 import json
+import time
 
 # Knowledge base texts
 kb_texts = [
@@ -55,34 +71,75 @@ kb_texts = [
     "Leave seller feedback: Rate third-party sellers to help other customers make informed decisions.",
 ]
 
-docs = [Document(page_content=text) for text in kb_texts]
 splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=50)
-split_docs = splitter.split_documents(docs)
-
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/multi-qa-mpnet-base-dot-v1")
-vectorstore = FAISS.from_documents(split_docs, embeddings)
-retriever = vectorstore.as_retriever(search_kwargs={"k": 3, "fetch_k": 10})
 
+# The index lives on disk and is memory-mapped; only KB entries that changed
+# since the last run are embedded again.
+embedding_model_name = "sentence-transformers/multi-qa-mpnet-base-dot-v1"
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", os.path.join(current_dir, "index", "grpo"))
 model_path = "google/flan-t5-base"
-tokenizer = AutoTokenizer.from_pretrained(model_path)
-model = AutoModelForSeq2SeqLM.from_pretrained(
-    model_path,
-    device_map="auto",
-    torch_dtype=torch.float16
-)
 
-pipe = pipeline(
-    "text2text-generation",
-    model=model,
-    tokenizer=tokenizer,
-    max_new_tokens=150,
-    min_new_tokens=20,
-    do_sample=False,
-    num_beams=2,
-    early_stopping=True
-)
+# Decoding of the production answer (the GRPO group overrides sampling/beams per call)
+GENERATE_KWARGS = {"max_new_tokens": 150, "min_new_tokens": 20, "do_sample": False,
+                   "num_beams": 2, "early_stopping": True}
+
+
+# The embedder, the index and flan-t5 are registered with the model registry and
+# built on first use (or by the server's parallel startup preload), not at import.
+def _load_embeddings():
+    return HuggingFaceEmbeddings(model_name=embedding_model_name)
+
+
+def _load_index():
+    return load_or_build_index(kb_texts, registry.get("embeddings"), embedding_model_name, splitter, INDEX_DIR)
+
+
+def build_generator(backend=None):
+    """flan-t5 text2text pipeline on the selected backend (GEN_BACKEND, see generation_backends)"""
+    model, tokenizer = load_seq2seq(model_path, backend)
+    print(f"Generator backend: {describe(model)}")
+    return pipeline(
+        "text2text-generation",
+        model=model,
+        tokenizer=tokenizer,
+        **GENERATE_KWARGS
+    )
+
+
+registry.register("embeddings", _load_embeddings, lambda e: e.embed_query("warm up"))
+registry.register("kb_index", _load_index, lambda store: store.similarity_search("warm up", k=1))
+registry.register("generator", build_generator,
+                  lambda p: p("Question: warm up\nAnswer:", max_new_tokens=2, min_new_tokens=1))
+
+
+def get_vectorstore():
+    return registry.get("kb_index")
+
+
+def get_pipe():
+    return registry.get("generator")
+
+
+@lru_cache(maxsize=None)
+def get_generator():
+    """What ask_query_with_grpo generates with: the micro-batcher over the pipeline (GEN_BATCHING) or the pipeline itself"""
+    if not GEN_BATCHING:
+        return get_pipe()
+    return GenerationBatcher.from_pipeline(get_pipe(), GENERATE_KWARGS)
+
+
+@lru_cache(maxsize=None)
+def get_retriever():
+    return get_vectorstore().as_retriever(k=3)
+
+
+def retrieve_docs(query_text, lookup=None):
+    """Top 3 KB chunks; a semantic cache miss passes its lookup so the query isn't embedded twice"""
+    # The cache and the index share the registry's embeddings, so the vector is interchangeable
+    if lookup is not None:
+        return get_vectorstore().similarity_search_by_vector(lookup.embedding, k=3)
+    return get_retriever().invoke(query_text)[:3]
 
-hf_llm = HuggingFacePipeline(pipeline=pipe)
 
 prompt_template = """Based on the context below, provide a direct answer to the question. Use only the information from the context. In case you dont have the context, tell them that you will escalate to a higher level customer care staff. make sure to greet them everytime they ask something.
 Context: {context}
@@ -96,22 +153,33 @@ PROMPT = PromptTemplate(
     input_variables=["context", "question"]
 )
 
-qa = RetrievalQA.from_chain_type(
-    llm=hf_llm,
-    retriever=retriever,
-    chain_type="stuff",
-    chain_type_kwargs={"prompt": PROMPT},
-    return_source_documents=False
-)
+
+@lru_cache(maxsize=None)
+def get_qa():
+    return RetrievalQA.from_chain_type(
+        llm=HuggingFacePipeline(pipeline=get_pipe()),
+        retriever=get_retriever(),
+        chain_type="stuff",
+        chain_type_kwargs={"prompt": PROMPT},
+        return_source_documents=False
+    )
 
 
 class GRPOOptimizer:
     """Group Relative Policy Optimization for improving responses"""
     
-    def __init__(self, group_size=4, learning_rate=0.001, gamma=0.99):
+    def __init__(self, group_size=4, learning_rate=0.001, gamma=0.99,
+                 decoding="sample", temperature=0.8, top_p=0.95):
         self.group_size = group_size
         self.learning_rate = learning_rate
         self.gamma = gamma
+        # Nucleus sampling is the only group mode: group beam search (num_beam_groups +
+        # diversity_penalty) is deprecated in transformers and being moved out of core
+        if decoding != "sample":
+            print(f"⚠️ GRPO decoding '{decoding}' is not supported; using nucleus sampling")
+        self.decoding = "sample"
+        self.temperature = temperature
+        self.top_p = top_p
         self.response_history = deque(maxlen=100)
         self.reward_baseline = 0.5
         
@@ -151,17 +219,23 @@ class GRPOOptimizer:
         
         return max(0.0, min(1.0, reward))
     
-    def generate_response_group(self, query, qa_chain, num_responses=None):
-        """Generate multiple responses for the same query"""
+    def decoding_kwargs(self, num_responses):
+        """Generation kwargs that make one generate call return a diverse group"""
+        return {
+            "do_sample": True,
+            "num_beams": 1,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "num_return_sequences": num_responses,
+        }
+    
+    def generate_response_group(self, prompt, generator, num_responses=None):
+        """Generate multiple responses for the same prompt in one batched generate call"""
         if num_responses is None:
             num_responses = self.group_size
         
-        responses = []
-        for _ in range(num_responses):
-            response = qa_chain.invoke(query)
-            responses.append(response['result'])
-        
-        return responses
+        outputs = generator(prompt, **self.decoding_kwargs(num_responses))
+        return [output['generated_text'] for output in outputs]
     
     def compute_group_advantages(self, rewards):
         """Compute advantages using group normalization"""
@@ -205,7 +279,56 @@ class GRPOOptimizer:
         }
 
 
-grpo = GRPOOptimizer(group_size=4, learning_rate=0.001)
+grpo = GRPOOptimizer(
+    group_size=int(os.getenv("GRPO_GROUP_SIZE", "4")),
+    learning_rate=0.001,
+    decoding=os.getenv("GRPO_DECODING", "sample"),
+    temperature=float(os.getenv("GRPO_TEMPERATURE", "0.8")),
+    top_p=float(os.getenv("GRPO_TOP_P", "0.95")),
+)
+
+
+# Near-duplicate questions ("where is my order" / "track my package") are
+# answered from here; the cache empties itself when the KB index changes.
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "1").lower() not in ("0", "false", "no")
+
+
+@lru_cache(maxsize=None)
+def get_answer_cache():
+    if not SEMANTIC_CACHE:
+        return None
+    return SemanticCache(
+        registry.get("embeddings"),
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "1024")),
+        ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+        kb_version=get_vectorstore().current_version,
+    )
+
+
+_LAZY_ATTRIBUTES = {
+    "embeddings": lambda: registry.get("embeddings"),
+    "vectorstore": get_vectorstore,
+    "retriever": get_retriever,
+    "pipe": get_pipe,
+    "model": lambda: get_pipe().model,
+    "tokenizer": lambda: get_pipe().tokenizer,
+    "qa": get_qa,
+    "answer_cache": get_answer_cache,
+}
+
+
+def __getattr__(name):
+    # Module-level names from before the registry keep working, loaded on access
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def build_prompt(query_text, retrieved_docs):
+    """Fill the QA prompt the same way the "stuff" chain does"""
+    context = "\n\n".join(doc.page_content for doc in retrieved_docs)
+    return PROMPT.format(context=context, question=query_text)
 
 
 def clean_response(response_text):
@@ -237,25 +360,59 @@ def clean_response(response_text):
     return text if text else "I don't have enough information to answer that question. I will escalate this issue to a senior staff. Thank you for your time."
 
 
-def ask_query_with_grpo(query_text, use_grpo=True):
-    """Ask query with GRPO optimization"""
+def ask_query_with_grpo(query_text, use_grpo=True, use_cache=True):
+    """Ask query with GRPO optimization, answering repeats from the semantic cache"""
+    
+    lookup = None
+    answer_cache = get_answer_cache()
+    if use_cache and answer_cache is not None:
+        with stage_timer("cache_lookup"):
+            lookup = answer_cache.lookup(query_text)
+        record_cache_lookup("answer", lookup.answer is not None)
+        if lookup.answer is not None:
+            print(f"\nQuery: {query_text}")
+            print(f"Answer (cached, similarity {lookup.similarity:.3f}): {lookup.answer}")
+            return lookup.answer
+    
+    answer = _answer_query(query_text, use_grpo, lookup)
+    if lookup is not None:
+        answer_cache.store(query_text, answer, vector=lookup.vector)
+    return answer
+
+
+def _answer_query(query_text, use_grpo, lookup=None):
+    """Retrieve, generate and (with GRPO) pick the best candidate"""
     
-    retrieved_docs = retriever.get_relevant_documents(query_text)
-    context = " ".join([doc.page_content for doc in retrieved_docs[:3]])
+    # One retrieval feeds both the prompt and the reward's context overlap check
+    with stage_timer("retrieve"):
+        retrieved_docs = retrieve_docs(query_text, lookup)
+    context = " ".join([doc.page_content for doc in retrieved_docs])
+    prompt = build_prompt(query_text, retrieved_docs)
     
     if use_grpo:
         print(f"Generating {grpo.group_size} candidate responses...")
-        responses = grpo.generate_response_group(query_text, qa)
+        start = time.perf_counter()
+        responses = grpo.generate_response_group(prompt, get_generator())
+        generate_seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(generate_seconds, stage="generate")
+        # The group comes out of one batched generate call, so each candidate's share is an even split
+        per_candidate = generate_seconds / max(len(responses), 1)
+        for _ in responses:
+            STAGE_SECONDS.observe(per_candidate, stage="generate_candidate")
         
-        cleaned_responses = [clean_response(r) for r in responses]
-        
-        rewards = [grpo.calculate_reward(r, query_text, context) for r in cleaned_responses]
-        
-        advantages, mean_reward = grpo.compute_group_advantages(rewards)
-        
-        best_response, best_reward = grpo.select_best_response(
-            query_text, context, cleaned_responses, rewards
-        )
+        with stage_timer("reward"):
+            cleaned_responses = [clean_response(r) for r in responses]
+            
+            rewards = [grpo.calculate_reward(r, query_text, context) for r in cleaned_responses]
+            
+            advantages, mean_reward = grpo.compute_group_advantages(rewards)
+            
+            best_response, best_reward = grpo.select_best_response(
+                query_text, context, cleaned_responses, rewards
+            )
+        for reward in rewards:
+            GRPO_REWARD.observe(reward, kind="candidate")
+        GRPO_REWARD.observe(best_reward, kind="best")
         
         print(f"\nQuery: {query_text}")
         print(f"Answer: {best_response}")
@@ -273,8 +430,9 @@ def ask_query_with_grpo(query_text, use_grpo=True):
         return best_response
     
     else:
-        response = qa.invoke(query_text)
-        cleaned_answer = clean_response(response['result'])
+        with stage_timer("generate"):
+            response = get_generator()(prompt)[0]['generated_text']
+        cleaned_answer = clean_response(response)
         
         print(f"\nQuery: {query_text}")
         print(f"Answer: {cleaned_answer}")
@@ -282,6 +440,62 @@ def ask_query_with_grpo(query_text, use_grpo=True):
         return cleaned_answer
 
 
+# Token streaming decodes one sequence, so the streamed answer is a single
+# greedy candidate instead of a GRPO-ranked group
+STREAM_GENERATE_KWARGS = {"max_new_tokens": 150, "min_new_tokens": 20, "do_sample": False, "num_beams": 1}
+
+
+def stream_answer_events(query_text, use_cache=True, max_sentences=3):
+    """
+    Answer query_text as a stream of (kind, value) events:
+    ("cached", answer) on a semantic cache hit, ("retrieval", hits) once the KB
+    has been searched, ("token", text) per decoded piece and ("sentence", text)
+    per cleaned sentence, in the order they happen
+    """
+    
+    lookup = None
+    answer_cache = get_answer_cache()
+    if use_cache and answer_cache is not None:
+        with stage_timer("cache_lookup"):
+            lookup = answer_cache.lookup(query_text)
+        record_cache_lookup("answer", lookup.answer is not None)
+        if lookup.answer is not None:
+            yield "cached", lookup.answer
+            for sentence in split_sentences(lookup.answer):
+                yield "sentence", sentence
+            return
+    
+    with stage_timer("retrieve"):
+        retrieved_docs = retrieve_docs(query_text, lookup)
+    yield "retrieval", [{"doc_id": doc.metadata.get("doc_id"), "text": doc.page_content} for doc in retrieved_docs]
+    prompt = build_prompt(query_text, retrieved_docs)
+    
+    sentences = []
+    start = time.perf_counter()
+    for kind, text in stream_pieces(get_pipe(), prompt, max_sentences, **STREAM_GENERATE_KWARGS):
+        if kind == "sentence":
+            text = clean_response(text)
+            sentences.append(text)
+        yield kind, text
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="generate_stream")
+    if not sentences:
+        sentences.append(clean_response(""))
+        yield "sentence", sentences[0]
+    
+    answer = " ".join(sentences)
+    print(f"\nQuery: {query_text}")
+    print(f"Answer (streamed): {answer}")
+    if lookup is not None:
+        answer_cache.store(query_text, answer, vector=lookup.vector)
+
+
+def stream_answer_sentences(query_text, use_cache=True, max_sentences=3):
+    """Yield the answer sentence by sentence while flan-t5 is still generating the rest"""
+    for kind, value in stream_answer_events(query_text, use_cache, max_sentences):
+        if kind == "sentence":
+            yield value
+
+
 if __name__ == "__main__":
     print("=== Testing RAG with GRPO Optimization ===\n")
     
@@ -300,4 +514,7 @@ if __name__ == "__main__":
     print("\n\nFinal Performance Summary:")
     stats = grpo.get_performance_stats()
     if stats:
-        print(json.dumps(stats, indent=2))
\ No newline at end of file
+        print(json.dumps(stats, indent=2))
+    if get_answer_cache() is not None:
+        print("\nSemantic Cache:")
+        print(json.dumps(get_answer_cache().stats(), indent=2))
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""Dynamic micro-batching of flan-t5 generation across concurrent requests.
+
+Every /process call used to run its own generate() on a batch of one prompt, so
+N concurrent users meant N small forward passes competing for the same cores.
+GenerationBatcher collects the prompts submitted by concurrent callers for up to
+GEN_BATCH_WINDOW_MS after the first one arrives (or until GEN_MAX_BATCH prompts
+are waiting), pads them into one tensor and runs a single model.generate() on a
+dispatcher thread, then hands each caller its own slice of the output.
+
+Only calls with identical generation kwargs (decoding mode, sampling settings,
+num_return_sequences, ...) can share a forward pass; a window holding different
+kwargs runs one batch per kwargs group. While a batch is running new prompts
+queue up, so under load the next batch starts full and without waiting.
+
+The batcher is called like the transformers pipeline it wraps,
+``batcher(prompt, **kwargs) -> [{"generated_text": ...}, ...]``, so it drops in
+wherever the pipeline is used. Callers block on a Future, so batches can only
+fill as far as there are concurrent callers: the server sizes its gen stage to at
+least GEN_MAX_BATCH workers while batching is on (server/executors.py).
+
+A profiled request (Shared/profiling.py) pauses its own profiler while it waits
+and the batch it is part of is profiled on the batcher thread under that
+request, so its profile still shows tokenization and beam search. A batch shared
+by several profiled requests is attributed to the first of them.
+
+RAGs/bench_batching.py measures throughput and latency under concurrent load
+with and without the batcher.
+
+Environment:
+    GEN_BATCHING            route generation through the batcher (default 1)
+    GEN_BATCH_WINDOW_MS     how long the first prompt waits for company (default 10)
+    GEN_MAX_BATCH           prompts per generate() call (default 8)
+"""
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import torch
+
+from Shared.metrics import STAGE_SECONDS, metrics
+from Shared.profiling import current_profile
+
+GEN_BATCHING = os.getenv("GEN_BATCHING", "1").lower() not in ("0", "false", "no")
+GEN_BATCH_WINDOW_MS = float(os.getenv("GEN_BATCH_WINDOW_MS", "10"))
+GEN_MAX_BATCH = max(1, int(os.getenv("GEN_MAX_BATCH", "8")))
+
+BATCH_SIZE = metrics.histogram(
+    "voicellm_gen_batch_size", "Prompts per batched generate() call.",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32))
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "voicellm_gen_queue_wait_seconds", "Time a prompt waited for its batch to start.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+QUEUE_DEPTH = metrics.gauge(
+    "voicellm_gen_queue_depth", "Prompts waiting for the generation batcher.")
+
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ("prompt", "kwargs", "key", "future", "submitted", "profile")
+
+    def __init__(self, prompt, kwargs):
+        self.prompt = prompt
+        self.kwargs = kwargs
+        # Lists (e.g. bad_words_ids) become tuples so the key can group requests
+        self.key = tuple(sorted((name, _freeze(value)) for name, value in kwargs.items()))
+        hash(self.key)  # anything still unhashable fails here, in the caller
+        self.future = Future()
+        self.submitted = time.perf_counter()
+        self.profile = current_profile.get()
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class GenerationBatcher:
+    """Collects concurrent prompts into padded batches for one seq2seq model."""
+
+    def __init__(self, model, tokenizer, default_kwargs=None,
+                 window_ms=GEN_BATCH_WINDOW_MS, max_batch_size=GEN_MAX_BATCH):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.default_kwargs = dict(default_kwargs or {})
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.batches = 0
+        self.prompts = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        QUEUE_DEPTH.set_function(lambda: {(): self._queue.qsize()})
+        self._thread = threading.Thread(target=self._dispatch_loop, name="gen-batcher", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_pipeline(cls, pipe, default_kwargs=None, **kwargs):
+        return cls(pipe.model, pipe.tokenizer, default_kwargs, **kwargs)
+
+    def _enqueue(self, prompt, kwargs):
+        if self._closed:
+            raise RuntimeError("generation batcher is closed")
+        request = _Request(prompt, {**self.default_kwargs, **kwargs})
+        self._queue.put(request)
+        return request
+
+    def submit(self, prompt, **kwargs):
+        """Queue one prompt; the Future resolves to its list of generated texts."""
+        return self._enqueue(prompt, kwargs).future
+
+    def generate(self, prompt, **kwargs):
+        """Blocking: the generated texts for prompt (num_return_sequences of them)."""
+        request = self._enqueue(prompt, kwargs)
+        if request.profile is None:
+            return request.future.result()
+        with request.profile.paused():
+            return request.future.result()
+
+    def __call__(self, prompt, **kwargs):
+        # Same shape as the text2text pipeline's output for a single prompt
+        return [{"generated_text": text} for text in self.generate(prompt, **kwargs)]
+
+    def close(self):
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        """Batch counters since start (bench_batching.py reports them)."""
+        return {
+            "batches": self.batches,
+            "prompts": self.prompts,
+            "avg_batch_size": round(self.prompts / self.batches, 2) if self.batches else None,
+            "queued": self._queue.qsize(),
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+        }
+
+    def _collect(self):
+        """Block for the first request, then gather more until the window closes or the batch is full."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        pending = [first]
+        deadline = time.perf_counter() + self.window
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Already queued requests are taken even once the window is over
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is _STOP:
+                self._queue.put(_STOP)
+                break
+            pending.append(request)
+        return pending
+
+    def _dispatch_loop(self):
+        while True:
+            pending = self._collect()
+            if pending is None:
+                return
+            try:
+                groups = {}
+                for request in pending:
+                    groups.setdefault(request.key, []).append(request)
+                for group in groups.values():
+                    self._run_batch(group)
+            except Exception as e:
+                # Never let the thread die: callers would wait on their Futures forever
+                for request in pending:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _run_batch(self, group):
+        started = time.perf_counter()
+        for request in group:
+            QUEUE_WAIT_SECONDS.observe(started - request.submitted)
+        BATCH_SIZE.observe(len(group))
+        self.batches += 1
+        self.prompts += len(group)
+        prompts, kwargs = [r.prompt for r in group], group[0].kwargs
+        profile = next((r.profile for r in group if r.profile is not None), None)
+        try:
+            with STAGE_SECONDS.time(stage="generate_batch"):
+                if profile is None:
+                    texts = self._generate(prompts, kwargs)
+                else:
+                    texts = profile.run("gen", lambda: self._generate(prompts, kwargs),
+                                        name=f"GenerationBatcher._generate (batch of {len(group)})")
+        except Exception as e:
+            for request in group:
+                request.future.set_exception(e)
+            return
+        per_prompt = len(texts) // len(group)
+        for i, request in enumerate(group):
+            request.future.set_result(texts[i * per_prompt:(i + 1) * per_prompt])
+
+    def _generate(self, prompts, kwargs):
+        """One padded generate() over all prompts; returns num_return_sequences texts per prompt, in order."""
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        device = getattr(self.model, "device", None)
+        if device is not None:
+            inputs = inputs.to(device)
+        with torch.inference_mode():
+            output = self.model.generate(**inputs, **kwargs)
+        return self.tokenizer.batch_decode(output, skip_special_tokens=True)
@@ -0,0 +1,113 @@
+"""Throughput of flan-t5 generation under concurrent load, with and without micro-batching.
+
+For each concurrency level, that many client threads send the RAG prompts as fast
+as they get answers back, either straight to model.generate (one forward pass per
+request, as before batch_scheduler) or through a GenerationBatcher. Reports
+requests/sec, per-request latency and the batcher's average batch size:
+
+    python RAGs/bench_batching.py --concurrency 1,2,4,8 --requests 32 --output batching.json
+    python RAGs/bench_batching.py --grpo          # GRPO candidate groups instead of one greedy answer
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+# Dynamically add project root to sys.path if needed
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from RAGs.batch_scheduler import GEN_BATCH_WINDOW_MS, GEN_MAX_BATCH, GenerationBatcher
+from RAGs.bench_generation import DEFAULT_QUERIES
+from RAGs.generation_backends import describe, load_seq2seq
+from RAGs.Implementation_with_GRPO import GENERATE_KWARGS, build_prompt, get_retriever, grpo, model_path
+
+
+def run_load(generate, prompts, concurrency, total):
+    """total requests from `concurrency` closed-loop clients; returns (wall seconds, latencies)."""
+    def client(i):
+        start = time.perf_counter()
+        generate(prompts[i % len(prompts)])
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(client, range(total)))
+    return time.perf_counter() - start, latencies
+
+
+def main(levels, total, window_ms, max_batch, use_grpo):
+    retriever = get_retriever()
+    prompts = [build_prompt(q, retriever.invoke(q)[:3]) for q in DEFAULT_QUERIES]
+    model, tokenizer = load_seq2seq(model_path)
+    device = getattr(model, "device", torch.device("cpu"))
+    kwargs = dict(GENERATE_KWARGS, **grpo.decoding_kwargs(grpo.group_size)) if use_grpo else dict(GENERATE_KWARGS)
+
+    def unbatched(prompt):
+        inputs = tokenizer(prompt, return_tensors="pt").to(device)
+        with torch.inference_mode():
+            return model.generate(**inputs, **kwargs)
+
+    results = []
+    for concurrency in levels:
+        for mode in ("unbatched", "batched"):
+            batcher = None
+            if mode == "batched":
+                batcher = GenerationBatcher(model, tokenizer, kwargs, window_ms=window_ms, max_batch_size=max_batch)
+                generate = batcher.generate
+            else:
+                generate = unbatched
+            generate(prompts[0])  # warm-up
+            wall, latencies = run_load(generate, prompts, concurrency, total)
+            result = {
+                "mode": mode,
+                "concurrency": concurrency,
+                "requests": total,
+                "requests_per_sec": round(total / wall, 3),
+                "latency_p50_s": round(float(np.percentile(latencies, 50)), 3),
+                "latency_p95_s": round(float(np.percentile(latencies, 95)), 3),
+            }
+            if batcher is not None:
+                result["avg_batch_size"] = batcher.stats()["avg_batch_size"]
+                batcher.close()
+            results.append(result)
+            print(f"✅ {mode:<9} x{concurrency}: {result['requests_per_sec']} req/s, "
+                  f"p50 {result['latency_p50_s']}s, p95 {result['latency_p95_s']}s"
+                  + (f", avg batch {result['avg_batch_size']}" if batcher is not None else ""))
+
+    for concurrency in levels:
+        rates = {r["mode"]: r["requests_per_sec"] for r in results if r["concurrency"] == concurrency}
+        print(f"x{concurrency}: batched / unbatched throughput = {rates['batched'] / rates['unbatched']:.2f}")
+    return {
+        "model": model_path,
+        "engine": describe(model),
+        "torch_threads": torch.get_num_threads(),
+        "decoding": "grpo" if use_grpo else "greedy",
+        "window_ms": window_ms,
+        "max_batch_size": max_batch,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark generation micro-batching under concurrent load")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated numbers of concurrent clients")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per concurrency level and mode")
+    parser.add_argument("--window-ms", type=float, default=GEN_BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=GEN_MAX_BATCH)
+    parser.add_argument("--grpo", action="store_true", help="Use the GRPO candidate-group decoding")
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    report = main([int(c) for c in args.concurrency.split(",")], args.requests,
+                  args.window_ms, args.max_batch, args.grpo)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
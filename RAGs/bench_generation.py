@@ -0,0 +1,116 @@
+"""Compare flan-t5 generation backends on the RAG prompts.
+
+For each backend: load time, tokens/sec and per-answer latency with the same
+decoding settings as the production pipeline, plus agreement with the
+reference backend's answers (exact match and word error rate).
+
+    python RAGs/bench_generation.py --backends torch,int8,onnx --output gen_bench.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import torch
+
+# Dynamically add project root to sys.path if needed
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from RAGs.generation_backends import describe, load_seq2seq
+from RAGs.Implementation_with_GRPO import GENERATE_KWARGS, build_prompt, clean_response, get_retriever, model_path
+from STTPhase.werUtils import wordErrorRate
+
+DEFAULT_QUERIES = [
+    "How do I track my order?",
+    "What is your refund policy?",
+    "Can I cancel my Prime membership?",
+    "What should I do if my package is damaged?",
+    "my order says shipped for last 4-5 days but didnt receive yet",
+    "What payment methods does Amazon accept?",
+    "How do I return an item?",
+    "How do I reset my password?",
+]
+
+def run_backend(backend, prompts, repeats):
+    start = time.perf_counter()
+    model, tokenizer = load_seq2seq(model_path, backend)
+    load_seconds = time.perf_counter() - start
+    device = getattr(model, "device", torch.device("cpu"))
+
+    def generate(prompt):
+        inputs = tokenizer(prompt, return_tensors="pt").to(device)
+        with torch.inference_mode():
+            output = model.generate(**inputs, **GENERATE_KWARGS)
+        # Seq2seq outputs start with the decoder start token
+        return tokenizer.decode(output[0], skip_special_tokens=True), output.shape[-1] - 1
+
+    generate(prompts[0])  # warm-up
+    answers, latencies, tokens = [], [], 0
+    for _ in range(repeats):
+        answers = []
+        for prompt in prompts:
+            start = time.perf_counter()
+            text, new_tokens = generate(prompt)
+            latencies.append(time.perf_counter() - start)
+            tokens += new_tokens
+            answers.append(clean_response(text))
+    return {
+        "backend": backend,
+        "engine": describe(model),
+        "load_seconds": round(load_seconds, 2),
+        "tokens_per_sec": round(tokens / sum(latencies), 2),
+        "latency_p50_s": round(float(np.percentile(latencies, 50)), 3),
+        "latency_p95_s": round(float(np.percentile(latencies, 95)), 3),
+    }, answers
+
+
+def main(backends, reference, queries, repeats):
+    retriever = get_retriever()
+    prompts = [build_prompt(q, retriever.invoke(q)[:3]) for q in queries]
+    if reference not in backends:
+        backends = [reference] + backends
+
+    results, answers = [], {}
+    for backend in backends:
+        try:
+            result, answers[backend] = run_backend(backend, prompts, repeats)
+        except ImportError as e:
+            print(f"⚠️ Skipping {backend}: {e}")
+            continue
+        results.append(result)
+        print(f"✅ {backend}: {result}")
+
+    baseline = answers[reference]
+    for result in results:
+        candidate = answers[result["backend"]]
+        result["exact_match_vs_" + reference] = round(np.mean([a == b for a, b in zip(baseline, candidate)]), 3)
+        result["wer_vs_" + reference] = round(float(np.mean([wordErrorRate(a, b) for a, b in zip(baseline, candidate)])), 4)
+    return {
+        "model": model_path,
+        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "torch_threads": torch.get_num_threads(),
+        "queries": len(queries),
+        "repeats": repeats,
+        "results": results,
+        "answers": {backend: dict(zip(queries, texts)) for backend, texts in answers.items()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark flan-t5 generation backends")
+    parser.add_argument("--backends", default="torch,int8,onnx")
+    parser.add_argument("--reference", default="torch", help="Backend whose answers the others are compared to")
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--output", help="Write the full report (including answers) as JSON")
+    args = parser.parse_args()
+
+    report = main(args.backends.split(","), args.reference, DEFAULT_QUERIES, args.repeats)
+    print(json.dumps(report["results"], indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
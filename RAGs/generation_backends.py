@@ -0,0 +1,72 @@
+"""Backends for loading the flan-t5 generator.
+
+    torch   plain PyTorch; dtype follows the device (fp16 on CUDA, fp32 on CPU,
+            where fp16 matmuls are emulated and slower than fp32)
+    int8    PyTorch with dynamic int8 quantization of every nn.Linear (CPU only)
+    onnx    ONNX Runtime graph exported through optimum, decoder with KV-cache
+            (needs `pip install optimum[onnxruntime]`)
+    auto    torch with the per-device dtype
+
+Select with GEN_BACKEND; RAGs/bench_generation.py compares them.
+"""
+import os
+
+import torch
+
+GEN_BACKEND = os.getenv("GEN_BACKEND", "auto").lower()
+BACKENDS = ("auto", "torch", "int8", "onnx")
+
+
+def pick_device():
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def dtype_for(device):
+    """fp16 only where the hardware runs it natively."""
+    return torch.float16 if device == "cuda" else torch.float32
+
+
+def load_seq2seq(model_path, backend=None):
+    """
+    Load (model, tokenizer) for model_path with the given backend (default GEN_BACKEND).
+    The returned model works with transformers.pipeline and .generate().
+    """
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    backend = (backend or GEN_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown GEN_BACKEND '{backend}', expected one of {BACKENDS}")
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    device = pick_device()
+
+    if backend in ("auto", "torch"):
+        if device == "cuda":
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_path, device_map="auto", torch_dtype=dtype_for(device))
+        else:
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_path, torch_dtype=dtype_for(device))
+        return model.eval(), tokenizer
+
+    if backend == "int8":
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_path, torch_dtype=torch.float32).eval()
+        # Weights are stored as int8 and activations quantized on the fly per batch,
+        # which roughly halves the matmul cost of the Linear-heavy T5 blocks on CPU
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8), tokenizer
+
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise ImportError("GEN_BACKEND=onnx needs optimum with onnxruntime (pip install optimum[onnxruntime])") from e
+    # export=True converts the checkpoint on first load; use_cache exports the
+    # decoder-with-past graph so each step only runs the newest token
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True, use_cache=True)
+    return model, tokenizer
+
+
+def describe(model):
+    """Short label for logs and /models."""
+    if type(model).__module__.startswith("optimum"):
+        return "onnxruntime"
+    quantized = any(type(m).__module__.startswith("torch.ao.nn.quantized") for m in model.modules())
+    if quantized:
+        return "torch-int8"
+    return f"torch-{str(next(model.parameters()).dtype).replace('torch.', '')}-{next(model.parameters()).device.type}"
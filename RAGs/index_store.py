@@ -0,0 +1,337 @@
+"""Persistent, memory-mapped vector index for the RAG knowledge base.
+
+Layout of an index directory:
+    meta.json           embedding model name, vector dim, the current file
+                        generation and a fingerprint of everything that
+                        affects the vectors (model + splitter)
+    vectors.<gen>.f32   raw float32 rows, append-only, opened with np.memmap
+    docstore.<gen>.jsonl
+                        one record per row ({"doc_id", "text"}) plus
+                        {"delete": doc_id} tombstones, append-only
+    .lock               flock'd by writers so several workers can share a directory
+
+Loading only maps the vector file and replays the docstore, so startup no
+longer re-embeds the corpus, and every worker mapping the same file shares its
+pages through the OS cache. Documents are added or deleted individually;
+``compact()`` rewrites the files once tombstones pile up.
+"""
+import os
+import json
+import fcntl
+import hashlib
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+import faiss
+from langchain.schema import Document
+from langchain_core.retrievers import BaseRetriever
+
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+
+# Everything a search reads, published as one immutable snapshot so a refresh
+# never shows a reader new rows with old vectors (or the other way round).
+#   docstore_size  file size the snapshot was read at (refresh() compares it)
+#   docstore_end   byte offset just past the last complete line
+IndexState = namedtuple("IndexState", ["generation", "dim", "rows", "dead", "vectors",
+                                       "docstore_size", "docstore_end"])
+EMPTY_STATE = IndexState(0, None, [], frozenset(), None, 0, 0)
+
+
+def doc_id_for(text):
+    """Stable id for a knowledge-base entry, derived from its content."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def embedding_fingerprint(model_name, splitter):
+    """Hash of everything that changes the stored vectors."""
+    parts = [
+        model_name,
+        type(splitter).__name__,
+        str(getattr(splitter, "_chunk_size", "")),
+        str(getattr(splitter, "_chunk_overlap", "")),
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class PersistentIndex:
+    """Append-only on-disk vector store searched through a read-only memory map."""
+
+    def __init__(self, directory, embeddings, model_name, splitter):
+        self.directory = directory
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.splitter = splitter
+        self.fingerprint = embedding_fingerprint(model_name, splitter)
+        self.version = 0        # bumped on every add/delete; lets caches notice KB changes
+        self._state = EMPTY_STATE
+        self._refresh_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    # Row data of the current snapshot; searches take self._state once instead
+    @property
+    def generation(self):
+        return self._state.generation
+
+    @property
+    def dim(self):
+        return self._state.dim
+
+    @property
+    def rows(self):
+        return self._state.rows    # row -> {"doc_id", "text"}
+
+    @property
+    def dead(self):
+        return self._state.dead    # row numbers hidden by a tombstone
+
+    @property
+    def vectors(self):
+        return self._state.vectors
+
+    # --- paths / locking ---
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _vectors_path(self, generation=None):
+        return self._path(f"vectors.{self.generation if generation is None else generation}.f32")
+
+    def _docstore_path(self, generation=None):
+        return self._path(f"docstore.{self.generation if generation is None else generation}.jsonl")
+
+    @contextmanager
+    def _write_lock(self):
+        with open(self._path(LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # --- loading ---
+
+    def _read_meta(self):
+        try:
+            with open(self._path(META_FILE), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, dim, generation):
+        tmp_path = self._path(META_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"model_name": self.model_name, "dim": dim,
+                       "generation": generation, "fingerprint": self.fingerprint}, f)
+        os.replace(tmp_path, self._path(META_FILE))
+
+    def _load(self):
+        meta = self._read_meta()
+        if meta is None or meta.get("fingerprint") != self.fingerprint:
+            if meta is not None:
+                print(f"Index at {self.directory} was built with a different embedding setup; rebuilding.")
+            self._reset_files()
+            return
+        self._publish(self._replay_docstore(meta["dim"], meta.get("generation", 0)))
+
+    def _reset_files(self):
+        for name in os.listdir(self.directory):
+            if name.startswith(("vectors.", "docstore.")) or name == META_FILE:
+                os.remove(self._path(name))
+        self._publish(EMPTY_STATE)
+
+    def _publish(self, state):
+        self._state = state  # one assignment: readers see the old snapshot or the new one
+        self.version += 1
+
+    def _replay_docstore(self, dim, generation):
+        """Read the docstore of a generation into a new IndexState (nothing is published)."""
+        rows, dead, rows_by_doc = [], set(), {}
+        path = self._docstore_path(generation)
+        end = 0
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn write from a crashed writer; _append_docstore cuts it off
+                    record = json.loads(line)
+                    end += len(line)
+                    if "delete" in record:
+                        dead.update(rows_by_doc.pop(record["delete"], ()))
+                    else:
+                        rows_by_doc.setdefault(record["doc_id"], []).append(len(rows))
+                        rows.append(record)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        # The docstore is written after the vectors, so it is the source of truth
+        # for how many rows are complete.
+        vectors = None
+        if rows and dim is not None:
+            vectors = np.memmap(self._vectors_path(generation), dtype=np.float32, mode="r",
+                                shape=(len(rows), dim))
+        return IndexState(generation, dim, rows, frozenset(dead), vectors, size, end)
+
+    def refresh(self):
+        """Pick up rows another process appended (or a compaction) since we last loaded."""
+        with self._refresh_lock:
+            path = self._docstore_path()
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size != self._state.docstore_size:
+                meta = self._read_meta()
+                if meta and meta.get("fingerprint") == self.fingerprint:
+                    self._publish(self._replay_docstore(meta["dim"], meta.get("generation", 0)))
+
+    def current_version(self):
+        """Version after picking up changes from other processes; changes whenever the KB does."""
+        self.refresh()
+        return self.version
+
+    # --- queries ---
+
+    def doc_ids(self):
+        """Ids of documents currently live in the index."""
+        state = self._state
+        return {row["doc_id"] for i, row in enumerate(state.rows) if i not in state.dead}
+
+    def __len__(self):
+        state = self._state
+        return len(state.rows) - len(state.dead)
+
+    def similarity_search(self, query, k=3):
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding, k=3):
+        """similarity_search for an already embedded query (e.g. from the semantic cache)."""
+        self.refresh()
+        state = self._state
+        if state.vectors is None:
+            return []
+        query_vector = np.asarray([embedding], dtype=np.float32)
+        # Over-fetch so tombstoned rows can be dropped without a second search
+        fetch = min(len(state.rows), k + len(state.dead))
+        _, indices = faiss.knn(query_vector, state.vectors, fetch, metric=faiss.METRIC_L2)
+        results = []
+        for idx in indices[0]:
+            if idx < 0 or idx in state.dead:
+                continue
+            row = state.rows[idx]
+            results.append(Document(page_content=row["text"], metadata={"doc_id": row["doc_id"]}))
+            if len(results) >= k:
+                break
+        return results
+
+    def as_retriever(self, k=3):
+        return MmapRetriever(store=self, k=k)
+
+    # --- updates ---
+
+    def add_texts(self, texts):
+        """Split, embed and append knowledge-base entries. Returns the new doc ids."""
+        texts = [t for t in texts if doc_id_for(t) not in self.doc_ids()]
+        if not texts:
+            return []
+        chunks = self.splitter.split_documents(
+            [Document(page_content=t, metadata={"doc_id": doc_id_for(t)}) for t in texts]
+        )
+        vectors = np.asarray(self.embeddings.embed_documents([c.page_content for c in chunks]), dtype=np.float32)
+        with self._write_lock():
+            self.refresh()
+            state = self._state
+            dim = state.dim
+            if dim is None:
+                dim = int(vectors.shape[1])
+                self._write_meta(dim, state.generation)
+            with open(self._vectors_path(state.generation), "ab") as f:
+                # Trim rows left behind by a writer that died before updating the docstore
+                f.truncate(len(state.rows) * dim * 4)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            records = [{"doc_id": c.metadata["doc_id"], "text": c.page_content} for c in chunks]
+            self._append_docstore(records, state)
+            self._publish(self._replay_docstore(dim, state.generation))
+        return sorted({r["doc_id"] for r in records})
+
+    def delete(self, doc_ids):
+        """Tombstone documents by id; their rows are skipped until the next compact()."""
+        doc_ids = [d for d in doc_ids if d in self.doc_ids()]
+        if not doc_ids:
+            return
+        with self._write_lock():
+            self.refresh()
+            state = self._state
+            self._append_docstore([{"delete": d} for d in doc_ids], state)
+            self._publish(self._replay_docstore(state.dim, state.generation))
+
+    def _append_docstore(self, records, state):
+        """Append records (caller holds the write lock and has just refreshed into state)."""
+        with open(self._docstore_path(state.generation), "ab") as f:
+            if state.docstore_size > state.docstore_end:
+                # Cut off a torn line from a crashed writer, or the next record would be glued onto it
+                f.truncate(state.docstore_end)
+            f.write("".join(json.dumps(r) + "\n" for r in records).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def sync(self, texts):
+        """Make the index hold exactly ``texts``, embedding only what changed."""
+        wanted = {doc_id_for(t): t for t in texts}
+        current = self.doc_ids()
+        stale = current - wanted.keys()
+        missing = [t for d, t in wanted.items() if d not in current]
+        if stale:
+            self.delete(stale)
+        if missing:
+            print(f"Embedding {len(missing)} new knowledge-base entries...")
+            self.add_texts(missing)
+        if len(self.dead) > max(16, len(self.rows) // 4):
+            self.compact()
+
+    def compact(self):
+        """Rewrite vectors and docstore without tombstoned rows.
+
+        The compacted files are written under the next generation number and
+        only become live when meta.json is atomically replaced; readers still
+        mapping the old generation keep working until they refresh.
+        """
+        with self._write_lock():
+            self.refresh()
+            state = self._state
+            keep = [i for i in range(len(state.rows)) if i not in state.dead]
+            vectors = np.asarray(state.vectors[keep]) if keep else np.zeros((0, state.dim or 0), np.float32)
+            old_generation, new_generation = state.generation, state.generation + 1
+            for path, payload in (
+                (self._vectors_path(new_generation), vectors.astype(np.float32).tobytes()),
+                (self._docstore_path(new_generation),
+                 "".join(json.dumps(state.rows[i]) + "\n" for i in keep).encode("utf-8")),
+            ):
+                with open(path, "wb") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._write_meta(state.dim, new_generation)
+            self._publish(self._replay_docstore(state.dim, new_generation))
+            for path in (self._vectors_path(old_generation), self._docstore_path(old_generation)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class MmapRetriever(BaseRetriever):
+    """LangChain retriever over a PersistentIndex, usable in RetrievalQA."""
+
+    store: PersistentIndex
+    k: int = 3
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.store.similarity_search(query, k=self.k)
+
+
+def load_or_build_index(texts, embeddings, model_name, splitter, directory):
+    """Open the index in ``directory`` and bring it in line with ``texts``."""
+    store = PersistentIndex(directory, embeddings, model_name, splitter)
+    store.sync(texts)
+    return store
@@ -1,11 +1,19 @@
-from langchain.schema import Document
+import os
+import sys
+
+# Dynamically add project root to sys.path if needed
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
 from langchain_community.llms import HuggingFacePipeline
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
+from RAGs.index_store import load_or_build_index
 import torch
 
 kb_texts = [
@@ -51,21 +59,17 @@ kb_texts = [
     "Leave seller feedback: Rate third-party sellers to help other cv. Customers make informed decisions.",
 ]
 
-docs = [Document(page_content=text) for text in kb_texts]
 splitter = RecursiveCharacterTextSplitter(
     chunk_size=200,  
     chunk_overlap=50  
 )
-split_docs = splitter.split_documents(docs)
-
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/multi-qa-mpnet-base-dot-v1")
-vectorstore = FAISS.from_documents(split_docs, embeddings)
-retriever = vectorstore.as_retriever(
-    search_kwargs={
-        "k": 3,  
-        "fetch_k": 10  
-    }
-)
+
+# Persistent, memory-mapped index; see RAGs/index_store.py
+embedding_model_name = "sentence-transformers/multi-qa-mpnet-base-dot-v1"
+embeddings = HuggingFaceEmbeddings(model_name=embedding_model_name)
+INDEX_DIR = os.getenv("RAG_BASIC_INDEX_DIR", os.path.join(current_dir, "index", "basic"))
+vectorstore = load_or_build_index(kb_texts, embeddings, embedding_model_name, splitter, INDEX_DIR)
+retriever = vectorstore.as_retriever(k=3)
 
 model_path = "google/flan-t5-base"
 tokenizer = AutoTokenizer.from_pretrained(model_path)
@@ -0,0 +1,133 @@
+"""Semantic answer cache for the RAG pipeline.
+
+Past queries are embedded with the same embeddings object the retriever uses
+and kept, L2-normalised, in a small FAISS inner-product index. A new query
+whose cosine similarity to a cached one clears the threshold gets the stored
+answer back without retrieval or generation. Entries expire after a TTL, the
+least recently used ones are evicted past ``max_entries``, and the whole cache
+is dropped whenever the knowledge-base version it was filled under changes.
+
+A lookup also returns the raw query embedding, so a miss can search the
+knowledge base with it instead of running the embedder a second time.
+"""
+import time
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import faiss
+
+# vector: the L2-normalised key for store(); embedding: the raw query embedding
+CacheLookup = namedtuple("CacheLookup", ["answer", "vector", "similarity", "embedding"])
+
+
+class SemanticCache:
+    """Thread-safe LRU/TTL cache of answers keyed by query embedding similarity."""
+
+    def __init__(self, embeddings, threshold=0.92, max_entries=1024, ttl_seconds=3600, kb_version=None):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Callable returning the current knowledge-base version (e.g. PersistentIndex.version)
+        self.kb_version = kb_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._index = None
+        self._entries = OrderedDict()  # id -> {"query", "answer", "created"}
+        self._next_id = 0
+        self._filled_under = kb_version() if kb_version else None
+
+    def embed(self, query_text):
+        return self._normalized(self.embeddings.embed_query(query_text))
+
+    @staticmethod
+    def _normalized(embedding):
+        vector = np.asarray([embedding], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _check_kb_version(self):
+        if self.kb_version is None:
+            return
+        current = self.kb_version()
+        if current != self._filled_under:
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+            self._filled_under = current
+
+    def _clear(self):
+        self._index = None
+        self._entries.clear()
+
+    def _remove(self, entry_id):
+        self._entries.pop(entry_id, None)
+        self._index.remove_ids(np.asarray([entry_id], dtype=np.int64))
+
+    def lookup(self, query_text):
+        """
+        Return a CacheLookup; ``answer`` is None on a miss. Pass ``vector`` on to
+        store() and ``embedding`` to the vector store's similarity_search_by_vector.
+        """
+        embedding = self.embeddings.embed_query(query_text)
+        vector = self._normalized(embedding)
+        with self._lock:
+            self._check_kb_version()
+            if self._index is None or self._index.ntotal == 0:
+                self.misses += 1
+                return CacheLookup(None, vector, 0.0, embedding)
+            similarities, ids = self._index.search(vector, 1)
+            similarity, entry_id = float(similarities[0][0]), int(ids[0][0])
+            entry = self._entries.get(entry_id)
+            if entry is not None and time.time() - entry["created"] > self.ttl_seconds:
+                self._remove(entry_id)
+                entry = None
+            if entry is None or similarity < self.threshold:
+                self.misses += 1
+                return CacheLookup(None, vector, similarity, embedding)
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return CacheLookup(entry["answer"], vector, similarity, embedding)
+
+    def store(self, query_text, answer, vector=None):
+        if vector is None:
+            vector = self.embed(query_text)
+        with self._lock:
+            self._check_kb_version()
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            now = time.time()
+            expired = [i for i, e in self._entries.items() if now - e["created"] > self.ttl_seconds]
+            for entry_id in expired:
+                self._remove(entry_id)
+            while len(self._entries) >= self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self.evictions += 1
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(vector, np.asarray([entry_id], dtype=np.int64))
+            self._entries[entry_id] = {"query": query_text, "answer": answer, "created": now}
+
+    def invalidate(self):
+        """Drop every cached answer (e.g. after editing the knowledge base by hand)."""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
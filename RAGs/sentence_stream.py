@@ -0,0 +1,106 @@
+import re
+import functools
+import threading
+from contextlib import nullcontext
+
+from Shared.profiling import current_profile
+
+# A sentence ends at . ! or ? followed by whitespace; the final sentence is
+# whatever is left when generation stops.
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+MIN_SENTENCE_CHARS = 6  # same cut-off clean_response uses for sentence fragments
+STREAM_TIMEOUT = 60  # seconds to wait for the next decoded piece
+
+
+class SentenceChunker:
+    """Accumulates streamed text and hands back complete sentences as they close."""
+
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        parts = SENTENCE_END.split(self.buffer)
+        self.buffer = parts.pop()
+        sentences, carry = [], ""
+        for part in parts:
+            carry = f"{carry} {part}".strip() if carry else part.strip()
+            # Fragments like "Hi." are merged into the next sentence instead of being spoken alone
+            if len(carry) >= self.min_chars:
+                sentences.append(carry)
+                carry = ""
+        if carry:
+            self.buffer = f"{carry} {self.buffer}"
+        return sentences
+
+    def flush(self):
+        tail, self.buffer = self.buffer.strip(), ""
+        return [tail] if tail else []
+
+
+def split_sentences(text):
+    """Split a finished answer the same way streamed output is split."""
+    chunker = SentenceChunker()
+    return chunker.feed(text) + chunker.flush()
+
+
+def stream_pieces(generator_pipe, prompt, max_sentences=3, **generate_kwargs):
+    """
+    Run generate() for prompt on a background thread and yield ("token", text) for
+    every decoded piece and ("sentence", text) as soon as a sentence's closing
+    punctuation has been decoded. Stops generation once max_sentences have been
+    produced (answers are capped at 2-3 sentences anyway).
+    Token streaming needs a single sequence, so callers pass greedy or sampling
+    settings, not beam search.
+    In a profiled request the generate() thread is profiled under that request
+    while the consuming thread pauses its own profiler.
+    """
+    from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+    class _StopWhenSet(StoppingCriteria):
+        def __init__(self, event):
+            self.event = event
+
+        def __call__(self, input_ids, scores, **kwargs):
+            return self.event.is_set()
+
+    tokenizer, model = generator_pipe.tokenizer, generator_pipe.model
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    # The timeout keeps a consumer from waiting forever if generate() dies on its thread
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=STREAM_TIMEOUT)
+    stop = threading.Event()
+    generate = functools.partial(model.generate, **inputs, **generate_kwargs, streamer=streamer,
+                                 stopping_criteria=StoppingCriteriaList([_StopWhenSet(stop)]))
+    profile = current_profile.get()
+    if profile is not None:
+        generate = functools.partial(profile.run, "gen", generate, "model.generate (answer stream)")
+    worker = threading.Thread(target=generate, name="answer-stream", daemon=True)
+
+    chunker = SentenceChunker()
+    produced = 0
+    # Entered before the worker starts so its profiler can take the profiling slot
+    with profile.paused() if profile is not None else nullcontext():
+        worker.start()
+        try:
+            for text in streamer:
+                if text:
+                    yield "token", text
+                for sentence in chunker.feed(text):
+                    yield "sentence", sentence
+                    produced += 1
+                    if produced >= max_sentences:
+                        return
+            for sentence in chunker.flush():
+                yield "sentence", sentence
+        finally:
+            # Early exit (sentence cap, consumer gone): generate() stops at its next step
+            stop.set()
+            worker.join()
+
+
+def stream_sentences(generator_pipe, prompt, max_sentences=3, **generate_kwargs):
+    """Like stream_pieces, but only the finished sentences."""
+    for kind, text in stream_pieces(generator_pipe, prompt, max_sentences, **generate_kwargs):
+        if kind == "sentence":
+            yield text
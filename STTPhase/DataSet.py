@@ -1,140 +1,277 @@
+import io
 import os
-import requests
+import sys
+import json
+import time
 import wave
-from pydub import AudioSegment
-import re
 import tarfile
+import argparse
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import requests
+
+# Dynamically add project root to sys.path if needed
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
 # --- CONFIGURATION CONSTANTS ---
-DATASET_ROOT = "LibriSpeech/dev-clean"
 WAV_OUTPUT_DIR = "processed_wavs"
-LOG_FILE = "transcription_log.txt"
+MANIFEST_FILE = "librispeech_manifest.jsonl"
 LIBRISPEECH_URL = "http://www.openslr.org/resources/12/dev-clean.tar.gz"
-ARCHIVE_NAME = "dev-clean.tar.gz"
-
-# Ensure the output directory exists
-os.makedirs(WAV_OUTPUT_DIR, exist_ok=True)
-
-def download_and_extract_dataset():
-    """Downloads and extracts the LibriSpeech dev-clean dataset if not present."""
-    if not os.path.exists(DATASET_ROOT):
-        print(f"Dataset not found at '{DATASET_ROOT}'. Downloading...")
-        response = requests.get(LIBRISPEECH_URL, stream=True)
-        with open(ARCHIVE_NAME, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        print("Download complete. Extracting...")
-        with tarfile.open(ARCHIVE_NAME, "r:gz") as tar:
-            tar.extractall(path=".")
-        print("Extraction complete.")
-        os.remove(ARCHIVE_NAME)
-    else:
-        print("Dataset already exists.")
 
-# --- UTILITY FUNCTIONS (from your original script) ---
+TARGET_SAMPLE_RATE = 16000
+DEFAULT_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 2))
+DOWNLOAD_TIMEOUT = 60  # seconds without data before the download is abandoned
 
-def load_audio(filename):
-    """Loads a WAV file and returns audio bytes and sample rate."""
-    # This is slightly modified to handle the expected WAV format from pydub
+
+# --- STREAMING SOURCES ---
+
+def iter_archive(source):
+    """
+    Yield (member name, bytes) for every .flac and .trans.txt in a LibriSpeech
+    tar.gz. source is a URL, a local tarball or an already extracted directory.
+    URLs and tarballs are read as a stream ("r|gz"), so members are handed out
+    while the rest of the archive is still downloading and nothing is written
+    to disk first.
+    """
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.endswith((".flac", ".trans.txt")):
+                    with open(os.path.join(root, name), "rb") as f:
+                        yield name, f.read()
+        return
+
+    if source.startswith(("http://", "https://")):
+        response = requests.get(source, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        fileobj = response.raw
+    else:
+        fileobj = open(source, "rb")
     try:
-        with wave.open(filename, "rb") as wf:
-            audio_bytes = wf.readframes(wf.getnframes())
-            sample_rate = wf.getframerate()
-        return audio_bytes, sample_rate
-    except wave.Error as e:
-        print(f"ERROR: Could not load WAV file: {filename}. {e}")
-        return None, None
-
-def call_stt_api(audio_content, sample_rate, audio_id):
-    """Placeholder for actual API call, simulates a result."""
-    print(f"  -> Calling STT API for {audio_id} at {sample_rate} Hz...")
-    # In a real scenario, this is where you'd send a POST request to your API
-    # with the audio_content and parameters.
-    return f"[STT Result]: Simulated transcription for {audio_id}"
-
-def convert_flac_to_wav(flac_path, wav_output_path):
-    """Converts a FLAC file to a 16kHz WAV file using pydub."""
+        with tarfile.open(fileobj=fileobj, mode="r|gz") as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith((".flac", ".trans.txt")):
+                    # A stream can't seek back, so the member is read before moving on
+                    yield os.path.basename(member.name), tar.extractfile(member).read()
+    finally:
+        fileobj.close()
+
+
+def parse_transcripts(data):
+    """{audio_id: text} from a chapter's .trans.txt ("84-121123-0000 TEXT ...")."""
+    transcripts = {}
+    for line in data.decode("utf-8").splitlines():
+        parts = line.strip().split(" ", 1)
+        if len(parts) == 2:
+            transcripts[parts[0]] = parts[1]
+    return transcripts
+
+
+def chapter_of(name):
+    """(speaker, chapter) of a LibriSpeech member name ("84-121123-0000.flac", "84-121123.trans.txt")."""
+    return tuple(name.split(".", 1)[0].split("-")[:2])
+
+
+# --- DECODE WORKERS ---
+
+def resample(audio, source_rate):
+    """Linear resample to 16 kHz (LibriSpeech is already 16 kHz, so normally a no-op)."""
+    if source_rate == TARGET_SAMPLE_RATE or audio.size == 0:
+        return audio
+    duration = audio.size / source_rate
+    target = np.linspace(0, duration, int(round(duration * TARGET_SAMPLE_RATE)), endpoint=False)
+    return np.interp(target, np.arange(audio.size) / source_rate, audio).astype(np.float32)
+
+
+def write_wav(path, audio):
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(TARGET_SAMPLE_RATE)
+        wf.writeframes(pcm.tobytes())
+
+
+def decode_flac(audio_id, flac_bytes, wav_dir=None, return_audio=False):
+    """
+    Decode one FLAC in-process with libsndfile (no ffmpeg subprocess), optionally
+    write it as a 16 kHz mono wav, and return its manifest record (plus the float32
+    array when return_audio is set, for direct transcription).
+    """
+    import soundfile as sf
+
+    parts = audio_id.split("-")
+    if len(parts) != 3:
+        return {"id": audio_id, "status": "error",
+                "error": "not a LibriSpeech utterance id (speaker-chapter-utterance)"}, None
     try:
-        # Load the FLAC file
-        audio = AudioSegment.from_file(flac_path, format="flac")
-        
-        # Resample to 16kHz (Standard for most STT APIs) and save as WAV
-        audio = audio.set_frame_rate(16000)
-        audio.export(wav_output_path, format="wav")
-        return True
+        audio, sample_rate = sf.read(io.BytesIO(flac_bytes), dtype="float32")
     except Exception as e:
-        print(f"  -> ERROR: Failed to convert {flac_path} to WAV. Ensure FFmpeg is installed and accessible.")
-        print(f"  -> Error details: {e}")
-        return False
-
-# --- MAIN DATASET PROCESSING LOGIC ---
-
-def process_dataset():
-    """Iterates through the LibriSpeech dataset, converts FLAC to WAV, and calls the STT API."""
-    
-    total_processed = 0
-    
-    # 1. Find the master transcript file
-    # LibriSpeech structure has a single .trans.txt file per chapter (e.g., in 121123/)
-    for root, dirs, files in os.walk(DATASET_ROOT):
-        for file in files:
-            if file.endswith(".trans.txt"):
-                trans_file_path = os.path.join(root, file)
-                chapter_id = os.path.basename(root)
-                print(f"Found transcript file for chapter {chapter_id}: {trans_file_path}")
-                
-                # 2. Process each line in the transcript file
-                with open(trans_file_path, 'r') as f_trans, open(LOG_FILE, 'a') as f_log:
-                    for line in f_trans:
-                        line = line.strip()
-                        if not line:
-                            continue
-                            
-                        # Format: AUDIO_ID TRANSCRIPT_TEXT
-                        parts = line.split(" ", 1)
-                        audio_id = parts[0]
-                        ground_truth = parts[1]
-                        
-                        # Construct file paths
-                        # Example: 84-121123-0000 -> 84/121123/84-121123-0000.flac
-                        speaker_id = audio_id.split('-')[0]
-                        
-                        flac_filename = f"{audio_id}.flac"
-                        flac_path = os.path.join(DATASET_ROOT, speaker_id, chapter_id, flac_filename)
-                        
-                        wav_filename = f"{audio_id}.wav"
-                        wav_output_path = os.path.join(WAV_OUTPUT_DIR, wav_filename)
-
-                        print(f"\nProcessing {audio_id}...")
-                        
-                        # 3. Convert FLAC to WAV
-                        if convert_flac_to_wav(flac_path, wav_output_path):
-                            
-                            # 4. Load the new WAV file
-                            audio_content, sample_rate = load_audio(wav_output_path)
-                            
-                            if audio_content is not None:
-                                # 5. Call the STT API
-                                stt_result = call_stt_api(audio_content, sample_rate, audio_id)
-                                
-                                # 6. Log the results
-                                log_entry = (
-                                    f"ID: {audio_id}\n"
-                                    f"GT: {ground_truth}\n"
-                                    f"STT: {stt_result}\n"
-                                    "------------------------------------------\n"
-                                )
-                                f_log.write(log_entry)
-                                total_processed += 1
-                            
-                        # Optional: Remove the temporary WAV file to save space
-                        # os.remove(wav_output_path)
-                        
-    print(f"\n--- Processing Complete ---")
-    print(f"Total files processed: {total_processed}")
-    print(f"Results logged to: {LOG_FILE}")
+        return {"id": audio_id, "status": "error", "error": f"{type(e).__name__}: {e}"}, None
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    audio = resample(audio, sample_rate)
+
+    speaker_id, chapter_id = parts[:2]
+    record = {
+        "id": audio_id,
+        "speaker": speaker_id,
+        "chapter": chapter_id,
+        "duration": round(audio.size / TARGET_SAMPLE_RATE, 3),
+        "num_samples": int(audio.size),
+        "sample_rate": TARGET_SAMPLE_RATE,
+        "audio_path": None,
+        "status": "ok",
+    }
+    if wav_dir:
+        record["audio_path"] = os.path.join(wav_dir, f"{audio_id}.wav")
+        write_wav(record["audio_path"], audio)
+    return record, (audio if return_audio else None)
+
+
+# --- MANIFEST ---
+
+def load_manifest_ids(manifest_path):
+    """Ids that already have an ok record, so an interrupted run resumes where it stopped."""
+    done = set()
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from an interrupted run
+                if record.get("status") == "ok":
+                    done.add(record["id"])
+    return done
+
+
+def ingest(source=LIBRISPEECH_URL, manifest_path=MANIFEST_FILE, wav_dir=WAV_OUTPUT_DIR,
+           workers=DEFAULT_WORKERS, transcribe=False, limit=None):
+    """
+    Stream a LibriSpeech split into a JSONL manifest (one record per utterance with
+    speaker, chapter, duration, reference text and, if written, the wav path).
+    FLAC members are decoded on a process pool while the archive is still being
+    read; with transcribe the decoded arrays go straight to the configured STT
+    backend and each record also gets the hypothesis and its WER.
+    wav_dir=None skips writing wavs altogether.
+    """
+    if wav_dir:
+        os.makedirs(wav_dir, exist_ok=True)
+    done = load_manifest_ids(manifest_path)
+    if transcribe:
+        from STTPhase.wavWhisperSingleFile import transcribeArray
+        from STTPhase.werUtils import corpusErrorRate, wordErrorRate
+
+    transcripts = {}   # reference text seen in .trans.txt members
+    waiting = {}       # decoded records whose .trans.txt hasn't streamed past yet
+    pending = set()
+    pairs = []
+    report = {"files": 0, "failed": 0, "skipped": 0, "audio_seconds": 0.0, "stt_seconds": 0.0}
+    max_pending = workers * 4  # bounds the FLAC bytes held in memory ahead of the pool
+
+    def write(record):
+        manifest.write(json.dumps(record) + "\n")
+        if record["status"] != "ok":
+            report["failed"] += 1
+            print(f"  -> Skipping {record['id']}: {record['error']}")
+            return
+        report["files"] += 1
+        report["audio_seconds"] += record["duration"]
+        if transcribe and record["text"] is not None:
+            pairs.append((record["text"], record["hypothesis"]))
+        if report["files"] % 100 == 0:
+            manifest.flush()
+            print(f"  -> {report['files']} files, {report['audio_seconds'] / 3600:.2f} h of audio")
+
+    def attach_text(record):
+        record["text"] = transcripts.get(record["id"])
+        if transcribe and record["text"] is not None and record["status"] == "ok":
+            record["wer"] = round(wordErrorRate(record["text"], record["hypothesis"]), 4)
+        return record
+
+    def collect(futures):
+        for future in futures:
+            record, audio = future.result()
+            if transcribe and audio is not None:
+                start = time.perf_counter()
+                record["hypothesis"] = transcribeArray(audio).strip()
+                record["stt_seconds"] = round(time.perf_counter() - start, 3)
+                report["stt_seconds"] += record["stt_seconds"]
+            if record["id"] in transcripts or record["status"] != "ok":
+                write(attach_text(record))
+            else:
+                waiting[record["id"]] = record
+
+    start = time.perf_counter()
+    submitted = 0
+    # spawn: the parent may hold torch/STT models, which don't survive fork well
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool, \
+            open(manifest_path, "a", encoding="utf-8") as manifest:
+        for name, data in iter_archive(source):
+            if name.endswith(".trans.txt"):
+                transcripts.update(parse_transcripts(data))
+                for audio_id in [i for i in waiting if i in transcripts]:
+                    write(attach_text(waiting.pop(audio_id)))
+                continue
+            audio_id = name[:-len(".flac")]
+            if audio_id in done:
+                report["skipped"] += 1
+                continue
+            if limit is not None and submitted >= limit:
+                # Keep reading only until the transcripts of what was decoded have streamed past
+                collect(wait(pending).done)
+                pending = set()
+                if not waiting:
+                    break
+                # A chapter's .trans.txt sits in the chapter's own directory: once the archive
+                # has moved on to another chapter, the missing transcripts aren't coming
+                if chapter_of(name) not in {(r["speaker"], r["chapter"]) for r in waiting.values()}:
+                    break
+                continue
+            pending.add(pool.submit(decode_flac, audio_id, data, wav_dir, transcribe))
+            submitted += 1
+            if len(pending) >= max_pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(wait(pending).done)
+        # Utterances whose transcript never appeared in the archive
+        for record in waiting.values():
+            write(attach_text(record))
+
+    elapsed = time.perf_counter() - start
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["files_per_sec"] = round(report["files"] / elapsed, 3) if report["files"] else 0.0
+    # How many seconds of audio are prepared per wall-clock second
+    report["audio_x_realtime"] = round(report["audio_seconds"] / elapsed, 1) if elapsed else None
+    if transcribe and pairs:
+        report["wer"] = round(corpusErrorRate(pairs, "word"), 4)
+    report["manifest"] = manifest_path
+    print(f"\n✅ Ingested {report['files']} files ({report['audio_seconds'] / 3600:.2f} h of audio) in {elapsed:.1f}s: "
+          f"{report['files_per_sec']} files/sec, {report['audio_x_realtime']}x real time"
+          + (f", WER {report['wer']}" if "wer" in report else ""))
+    return report
+
 
 if __name__ == "__main__":
-    download_and_extract_dataset()
-    process_dataset()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Stream a LibriSpeech split into a JSONL manifest")
+    parser.add_argument("--source", default=LIBRISPEECH_URL,
+                        help="URL or path of a LibriSpeech .tar.gz, or an extracted directory")
+    parser.add_argument("--manifest", default=MANIFEST_FILE)
+    parser.add_argument("--wav-dir", default=WAV_OUTPUT_DIR, help="Where to write 16 kHz wavs")
+    parser.add_argument("--no-wav", action="store_true", help="Only write the manifest, no wav files")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--transcribe", action="store_true",
+                        help="Transcribe decoded audio in memory and record hypothesis + WER")
+    parser.add_argument("--limit", type=int, help="Stop after this many new utterances")
+    args = parser.parse_args()
+
+    report = ingest(args.source, args.manifest, None if args.no_wav else args.wav_dir,
+                    args.workers, args.transcribe, args.limit)
+    print(json.dumps(report, indent=2))
@@ -1,13 +1,21 @@
+import os
+import sys
 import pyaudio
-import collections
 import time
+import collections
 from queue import Queue
-from threading import Thread
-import struct
-import numpy as np
+from threading import Thread, Lock, current_thread
 import wave
 import keyboard # <-- NEW IMPORT
 
+# Dynamically add project root to sys.path if needed
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from STTPhase.vadDetectors import Segmenter, chunk_rms, make_vad, VAD_MODE
+from STTPhase.wavWhisperSingleFile import get_model, transcribeArray, pcmToFloat
+
 # --- Global Control Flag ---
 STOP_LISTENING_FLAG = False 
 
@@ -20,18 +28,28 @@ PADDING_DURATION_MS = 300
 CHUNK_SIZE = int(RATE * CHUNK_DURATION_MS / 1000)
 PADDING_CHUNKS = int(PADDING_DURATION_MS / CHUNK_DURATION_MS)
 VOICE_ACTIVITY_TIMEOUT = 5000 
-# --- VAD Parameters (RMS Method) ---
-THRESHOLD = 500
+# --- VAD Parameters ---
+# Detector thresholds adapt to the room's noise floor; pick the detector with
+# VAD_MODE=energy|spectral|webrtc (see vadDetectors.py, vadReplay.py to evaluate)
 
-# Queue for storing full speech segments
+SAMPLE_WIDTH = pyaudio.get_sample_size(FORMAT)
+
+# --- Consumer Parameters ---
+# With openai-whisper each consumer thread gets its own replica; faster-whisper shares one model
+NUM_CONSUMERS = int(os.getenv("STT_CONSUMERS", "2"))
+SAVE_SEGMENTS = os.getenv("SAVE_SEGMENTS", "0") == "1"
+SEGMENT_DIR = os.getenv("SEGMENT_DIR", "speechSegments")
+MIN_SEGMENT_BYTES = int(RATE * 0.25) * 2  # ignore blips shorter than 250 ms
+STATS_INTERVAL = float(os.getenv("STT_STATS_INTERVAL", "30"))
+
+# Queue for storing full speech segments as (enqueued_at, pcm bytes)
 speech_queue = Queue()
+segment_counter = 0
+counter_lock = Lock()
 
 def calculate_rms(chunk):
     """Calculate the Root Mean Square (RMS) energy of an audio chunk."""
-    count = len(chunk) // 2
-    format = "%dh" % count
-    shorts = struct.unpack(format, chunk)
-    return np.sqrt(np.mean(np.square(shorts)))
+    return chunk_rms(chunk)
 
 # --- NEW FUNCTION: Key Listener ---
 def key_listener():
@@ -58,61 +76,27 @@ def audio_producer():
                             frames_per_buffer=CHUNK_SIZE)
 
         print("--- LISTENING STARTED ---")
-        print(f"--- RMS Threshold is set to: {THRESHOLD} ---")
-        
-        ring_buffer = collections.deque(maxlen=PADDING_CHUNKS) 
-        triggered = False
-        voiced_data = []
-        silent_chunks = 0
+        print(f"--- VAD mode: {VAD_MODE} (adaptive noise floor) ---")
+
+        vad = make_vad()
+        segmenter = Segmenter(vad)
 
         # Loop breaks if the keyboard thread sets the flag
         while not STOP_LISTENING_FLAG:
+            chunk = stream.read(CHUNK_SIZE, exception_on_overflow=False)
+            was_triggered = segmenter.triggered
+            segment = segmenter.feed(chunk)
 
-            
-            # Check for immediate stop condition (to break before reading a chunk)
-            if STOP_LISTENING_FLAG:
-                break
+            if segmenter.triggered and not was_triggered:
+                print(f"...Speech detected (RMS: {vad.last_rms:.0f}, floor: {vad.noise_floor:.0f}), starting recording...")
+            if segment is not None:
+                print("...End of speech detected, sending for transcription...")
+                enqueue_segment(segment.audio)
 
-            # print("--- LISTENING STARTED --- I'm Listening ", voiced_data)
-                
-            chunk = stream.read(CHUNK_SIZE, exception_on_overflow=False)
-            rms_energy = calculate_rms(chunk)
-            # is_speech = rms_energy > THRESHOLD
-            is_speech = True #TODO: NOTE: NEED TO MAKE IT WORKKKKKKKK
-
-            if not triggered:
-                ring_buffer.append(chunk)
-                if is_speech:
-                    print(f"...Speech detected (RMS: {rms_energy:.0f}), starting recording...")
-                    triggered = True
-                    voiced_data.extend(list(ring_buffer))
-                    ring_buffer.clear()
-                    silent_chunks = 0
-            else:
-                voiced_data.append(chunk)
-                if is_speech:
-                    silent_chunks = 0
-                else:
-                    silent_chunks += 1
-                
-                if silent_chunks > PADDING_CHUNKS:
-                    print("...End of speech detected, sending for transcription...")
-                    
-                    cutoff_index = len(voiced_data) - silent_chunks
-                    full_audio_segment = b''.join(voiced_data[:cutoff_index])
-                    
-                    speech_queue.put(full_audio_segment)
-                    
-                    # Reset state
-                    triggered = False
-                    voiced_data = []
-                    silent_chunks = 0
-                    ring_buffer.extend(voiced_data[-PADDING_CHUNKS:]) 
-        
-        if triggered and voiced_data:
+        segment = segmenter.flush()
+        if segment is not None:
             print("...Saving last segment before quitting...")
-            full_audio_segment = b''.join(voiced_data)
-            speech_queue.put(full_audio_segment)
+            enqueue_segment(segment.audio)
 
     except Exception as e:
         print(f"An error occurred in the audio producer: {e}")
@@ -124,72 +108,140 @@ def audio_producer():
             stream.stop_stream()
             stream.close()
         audio.terminate()
-        # Signal the consumer to stop only if the stop flag was set
-        if STOP_LISTENING_FLAG:
-             speech_queue.put(None)
-
+        # One sentinel per consumer; queued segments ahead of them still get transcribed
+        for _ in range(NUM_CONSUMERS):
+            speech_queue.put(None)
+
+
+class SegmentStats:
+    """Thread-safe counters for the consumer pool: queue depth and per-segment latency."""
+
+    def __init__(self, window=500):
+        self.lock = Lock()
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.audio_seconds = 0.0
+        self.stt_seconds = 0.0
+        self.max_depth = 0
+        self.latencies = collections.deque(maxlen=window)  # enqueue -> transcript ready
+        self.waits = collections.deque(maxlen=window)      # time spent queued
+
+    def observe_depth(self):
+        with self.lock:
+            self.max_depth = max(self.max_depth, speech_queue.qsize())
+
+    def record(self, audio_seconds, wait, stt_seconds):
+        with self.lock:
+            self.processed += 1
+            self.audio_seconds += audio_seconds
+            self.stt_seconds += stt_seconds
+            self.waits.append(wait)
+            self.latencies.append(wait + stt_seconds)
+
+    def snapshot(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            waits = sorted(self.waits)
+            pick = lambda values, q: round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else None
+            return {
+                "queue_depth": speech_queue.qsize(),
+                "max_queue_depth": self.max_depth,
+                "processed": self.processed,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "latency_p50_s": pick(latencies, 0.5),
+                "latency_p95_s": pick(latencies, 0.95),
+                "queue_wait_p95_s": pick(waits, 0.95),
+                "rtf": round(self.stt_seconds / self.audio_seconds, 3) if self.audio_seconds else None,
+            }
+
+
+stats = SegmentStats()
+
+
+def enqueue_segment(audio_segment):
+    """Queue a finished segment together with the time it was produced."""
+    speech_queue.put((time.monotonic(), audio_segment))
+    stats.observe_depth()
+
+
+def save_segment(audio_segment):
+    """Write a segment to SEGMENT_DIR as a numbered wav; returns the path."""
+    global segment_counter
+    with counter_lock:
+        segment_counter += 1
+        number = segment_counter
+    os.makedirs(SEGMENT_DIR, exist_ok=True)
+    filename = os.path.join(SEGMENT_DIR, f"speech_segment_{number}.wav")
+    with wave.open(filename, 'wb') as wf:
+        wf.setnchannels(CHANNELS)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(RATE)
+        wf.writeframes(audio_segment)
+    return filename
 
-def call_stt_api(audio_content, sample_rate):
-    """Simulates a call to a Speech-to-Text API."""
-    if len(audio_content) > 5000:
-        time.sleep(1)
-        return f"*** [STT Result]: The user spoke {len(audio_content)} bytes of audio. (RMS VAD used)"
-    else:
-        return "No clear speech detected for transcription."
 
 def audio_consumer():
-    """Consumes full speech segments, SAVES TO FILE, and calls the STT API."""
-    print("--- Consumer started, waiting for speech segments. ---")
-    file_counter = 1
+    """Consumes speech segments and transcribes them in memory with this thread's warm Whisper model."""
+    name = current_thread().name
+    get_model()  # load this thread's model now rather than on the first segment
+    print(f"--- {name} started, waiting for speech segments. ---")
     while True:
-        # Use a timeout to occasionally check the STOP_LISTENING_FLAG
-        try:
-            audio_segment = speech_queue.get(timeout=0.1) 
-        except:
-            if STOP_LISTENING_FLAG:
-                break
-            continue
-        
-        if audio_segment is None or STOP_LISTENING_FLAG:
+        item = speech_queue.get()
+        if item is None:  # one sentinel per consumer
             break
-        
+        queued_at, audio_segment = item
+        wait = time.monotonic() - queued_at
+
+        if len(audio_segment) < MIN_SEGMENT_BYTES:
+            with stats.lock:
+                stats.skipped += 1
+            continue
+
         try:
-            # 1. DEFINE FILENAME
-            filename = f"speech_segment_{file_counter}.wav"
-            
-            # 2. SAVE THE AUDIO SEGMENT TO A .WAV FILE
-            print(f"💾 Saving audio segment to {filename}...")
-            with wave.open(filename, 'wb') as wf:
-                wf.setnchannels(CHANNELS)
-                wf.setsampwidth(pyaudio.PyAudio().get_sample_size(FORMAT))
-                wf.setframerate(RATE)
-                wf.writeframes(audio_segment)
-            
-            # 3. CALL THE API (or simulate the call)
-            transcript = call_stt_api(audio_segment, RATE)
-            print(f"\n✅ TRANSCRIPTION COMPLETE:\n{transcript}\n")
-            
-            file_counter += 1 
-            
+            if SAVE_SEGMENTS:
+                print(f"💾 Saved audio segment to {save_segment(audio_segment)}")
+
+            started = time.monotonic()
+            transcript = transcribeArray(pcmToFloat(audio_segment), fp16=False)
+            stt_seconds = time.monotonic() - started
+            stats.record(len(audio_segment) / (SAMPLE_WIDTH * RATE), wait, stt_seconds)
+            print(f"\n✅ TRANSCRIPTION COMPLETE ({name}, queued {wait:.2f}s, stt {stt_seconds:.2f}s):\n{transcript.strip()}\n")
+
         except Exception as e:
+            with stats.lock:
+                stats.failed += 1
             print(f"\n❌ ERROR during processing: {e}")
-    
-    print("--- Consumer stopping. ---")
+
+    print(f"--- {name} stopping. ---")
+
+
+def stats_reporter(interval=STATS_INTERVAL):
+    """Prints queue depth and latency percentiles until the listener stops."""
+    while not STOP_LISTENING_FLAG:
+        time.sleep(interval)
+        print(f"📊 STT stats: {stats.snapshot()}")
 
 
-# Start all threads
-producer_thread = Thread(target=audio_producer)
-consumer_thread = Thread(target=audio_consumer)
-# --- NEW THREAD for Keyboard Listener ---
-key_thread = Thread(target=key_listener)
+if __name__ == "__main__":
+    # Start all threads
+    producer_thread = Thread(target=audio_producer)
+    consumer_threads = [Thread(target=audio_consumer, name=f"stt-consumer-{i + 1}") for i in range(NUM_CONSUMERS)]
+    # --- NEW THREAD for Keyboard Listener ---
+    key_thread = Thread(target=key_listener)
+    Thread(target=stats_reporter, daemon=True).start()
 
-key_thread.start()
-producer_thread.start()
-consumer_thread.start()
+    key_thread.start()
+    producer_thread.start()
+    for consumer_thread in consumer_threads:
+        consumer_thread.start()
 
-# Wait for threads to finish
-key_thread.join()
-producer_thread.join()
-consumer_thread.join()
+    # Wait for threads to finish
+    key_thread.join()
+    producer_thread.join()
+    for consumer_thread in consumer_threads:
+        consumer_thread.join()
 
-print("--- System shutdown complete. ---")
\ No newline at end of file
+    print(f"📊 Final STT stats: {stats.snapshot()}")
+    print("--- System shutdown complete. ---")
@@ -0,0 +1,275 @@
+"""
+WER / throughput evaluation of STT backends over a LibriSpeech manifest.
+
+Reads the JSONL manifest written by DataSet.py (reference text + wav path per
+utterance) and, for every backend configuration given, transcribes the
+utterances on a pool of threads with the real STT engine, then reports:
+
+    wer / cer          corpus error rates (total edits / total reference length)
+    rtf                wall-clock seconds per second of audio (< 1 is faster than real time)
+    audio_x_realtime   seconds of audio transcribed per wall-clock second
+    files_per_sec      utterances per wall-clock second
+    stt p50 / p95      per-utterance transcribe latency
+    load_seconds       model load time
+    rss_after_load_mb  peak RSS once the model(s) are loaded
+    peak_rss_mb        peak RSS over the whole run (includes per-thread replicas)
+
+Each configuration runs in its own spawned process, so memory numbers belong to
+that model alone and one configuration's allocations don't leak into the next:
+
+    python STTPhase/evalManifest.py --configs whisper:tiny whisper:base faster-whisper:small:int8 \
+        --limit 200 --workers 2 --output stt_eval.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+# Dynamically add project root to sys.path if needed
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from STTPhase.DataSet import MANIFEST_FILE
+from STTPhase.sttBackends import STT_BACKEND, STT_MODEL_SIZE
+from STTPhase.werUtils import corpusErrorRate, wordErrorRate
+
+SAMPLE_RATE = 16000
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+
+def loadManifest(manifest_path, limit=None):
+    """
+    Utterances of the manifest that can be scored: status ok, a reference text and
+    a wav on disk. Returns (utterances, number skipped). Relative wav paths are
+    resolved against the manifest's directory and then the working directory.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    utterances, skipped = [], 0
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted ingest
+            audio_path = record.get("audio_path")
+            if record.get("status") != "ok" or not record.get("text") or not audio_path:
+                skipped += 1
+                continue
+            if not os.path.isabs(audio_path) and not os.path.exists(audio_path):
+                audio_path = os.path.join(base_dir, audio_path)
+            if not os.path.exists(audio_path):
+                skipped += 1
+                continue
+            utterances.append({"id": record["id"], "text": record["text"], "audio_path": audio_path,
+                               "duration": record.get("duration", 0)})
+            if limit is not None and len(utterances) >= limit:
+                break
+    return utterances, skipped
+
+
+def parseConfig(spec):
+    """'backend:model_size[:compute_type]' -> make_backend arguments, e.g. 'faster-whisper:small:int8'."""
+    parts = spec.split(":")
+    if not 1 <= len(parts) <= 3 or not parts[0]:
+        raise ValueError(f"Bad config '{spec}', expected backend:model_size[:compute_type]")
+    config = {"backend": parts[0].lower(), "model_size": parts[1] if len(parts) > 1 and parts[1] else STT_MODEL_SIZE}
+    if len(parts) == 3:
+        if config["backend"] != "faster-whisper":
+            raise ValueError(f"'{spec}': a compute type only applies to faster-whisper")
+        config["compute_type"] = parts[2]
+    return config
+
+
+def peakRssMb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+
+def percentile(values, p):
+    return round(float(np.percentile(values, p)), 3) if values else None
+
+
+# --------------------------------------------------------------------------
+# 🧵 CONFIG PROCESS
+# Runs in a fresh spawned process per configuration: load the backend, warm
+# it up, then transcribe every utterance on `workers` threads.
+# --------------------------------------------------------------------------
+
+def _evaluateConfig(config, utterances, workers, language):
+    from STTPhase.sttBackends import make_backend
+    from STTPhase.wavAPIDirectory import load_audio
+
+    kwargs = {"model_size": config["model_size"], "num_workers": workers}
+    if config["backend"] == "faster-whisper":
+        kwargs["compute_type"] = config.get("compute_type", "int8")
+
+    start = time.perf_counter()
+    backend = make_backend(config["backend"], **kwargs)
+    backend.warmup()
+    load_seconds = time.perf_counter() - start
+
+    # The same threads load (for openai-whisper, one model replica each) and then
+    # transcribe, so replica loads stay out of the throughput numbers
+    pool = ThreadPoolExecutor(max_workers=workers)
+    if config["backend"] == "whisper":
+        barrier = threading.Barrier(workers)
+
+        def claim_replica(_):
+            backend.model_for_thread()
+            barrier.wait()  # every pool thread takes exactly one of these
+
+        start = time.perf_counter()
+        list(pool.map(claim_replica, range(workers)))
+        load_seconds += time.perf_counter() - start
+    rss_after_load = peakRssMb()
+
+    def transcribe(utterance):
+        result = {"id": utterance["id"]}
+        audio, _ = load_audio(utterance["audio_path"])
+        if audio is None:
+            return dict(result, status="error", error="unreadable wav")
+        stt_start = time.perf_counter()
+        try:
+            hypothesis = backend.transcribe(audio, language=language).strip()
+        except Exception as e:
+            return dict(result, status="error", error=f"{type(e).__name__}: {e}")
+        return dict(result, status="ok", hypothesis=hypothesis,
+                    duration=round(len(audio) / SAMPLE_RATE, 3),
+                    stt_seconds=round(time.perf_counter() - stt_start, 3))
+
+    start = time.perf_counter()
+    with pool:
+        results = list(pool.map(transcribe, utterances))
+    wall_seconds = time.perf_counter() - start
+
+    return {
+        "config": backend.describe(),
+        "load_seconds": round(load_seconds, 2),
+        "wall_seconds": round(wall_seconds, 3),
+        "rss_after_load_mb": rss_after_load,
+        "peak_rss_mb": peakRssMb(),
+        "results": results,
+    }
+
+
+def summarizeRun(run, utterances, workers):
+    """Corpus WER/CER and speed numbers for one configuration's results."""
+    references = {u["id"]: u["text"] for u in utterances}
+    ok = [r for r in run["results"] if r["status"] == "ok"]
+    pairs = [(references[r["id"]], r["hypothesis"]) for r in ok]
+    audio_seconds = sum(r["duration"] for r in ok)
+    latencies = [r["stt_seconds"] for r in ok]
+    wall = run["wall_seconds"]
+    return {
+        "config": run["config"],
+        "workers": workers,
+        "files": len(ok),
+        "errors": len(run["results"]) - len(ok),
+        "audio_seconds": round(audio_seconds, 1),
+        "wer": round(corpusErrorRate(pairs, "word"), 4) if pairs else None,
+        "cer": round(corpusErrorRate(pairs, "char"), 4) if pairs else None,
+        "wall_seconds": wall,
+        "rtf": round(wall / audio_seconds, 4) if audio_seconds else None,
+        "audio_x_realtime": round(audio_seconds / wall, 2) if wall else None,
+        "files_per_sec": round(len(ok) / wall, 3) if wall else None,
+        "stt_p50": percentile(latencies, 50),
+        "stt_p95": percentile(latencies, 95),
+        "load_seconds": run["load_seconds"],
+        "rss_after_load_mb": run["rss_after_load_mb"],
+        "peak_rss_mb": run["peak_rss_mb"],
+    }
+
+
+def evaluate(manifest_path, configs, workers=DEFAULT_WORKERS, limit=None, language="English",
+             hypotheses_path=None):
+    """Run every configuration over the manifest; returns the report dict."""
+    utterances, skipped = loadManifest(manifest_path, limit)
+    if not utterances:
+        raise ValueError(f"No scorable utterances in {manifest_path} "
+                         f"(run DataSet.py without --no-wav so the manifest has wav paths)")
+    audio_hours = sum(u["duration"] for u in utterances) / 3600
+    print(f"🎧 {len(utterances)} utterances from {manifest_path} ({skipped} skipped)")
+
+    summaries = []
+    hypotheses = open(hypotheses_path, "w", encoding="utf-8") if hypotheses_path else None
+    # spawn: a fresh interpreter per configuration, so peak RSS is that model's alone
+    context = multiprocessing.get_context("spawn")
+    try:
+        for config in configs:
+            label = ":".join(str(v) for v in config.values())
+            print(f"\n🚀 {label}: {workers} worker thread(s)")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                try:
+                    run = pool.submit(_evaluateConfig, config, utterances, workers, language).result()
+                except Exception as e:
+                    print(f"❌ {label} failed: {type(e).__name__}: {e}")
+                    summaries.append({"config": label, "error": f"{type(e).__name__}: {e}"})
+                    continue
+            summary = summarizeRun(run, utterances, workers)
+            summaries.append(summary)
+            print(f"✅ {summary['config']}: WER {summary['wer']}, CER {summary['cer']}, RTF {summary['rtf']}, "
+                  f"{summary['files_per_sec']} files/sec, peak RSS {summary['peak_rss_mb']} MB")
+            if hypotheses:
+                references = {u["id"]: u["text"] for u in utterances}
+                for result in run["results"]:
+                    if result["status"] == "ok":
+                        result["wer"] = round(wordErrorRate(references[result["id"]], result["hypothesis"]), 4)
+                    hypotheses.write(json.dumps(dict(result, config=summary["config"])) + "\n")
+    finally:
+        if hypotheses:
+            hypotheses.close()
+
+    return {
+        "manifest": manifest_path,
+        "utterances": len(utterances),
+        "skipped": skipped,
+        "audio_hours": round(audio_hours, 3),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpus": os.cpu_count(),
+        "results": summaries,
+    }
+
+
+def printTable(report):
+    print(f"\n{'config':<28} {'WER':>7} {'CER':>7} {'RTF':>7} {'x RT':>7} {'files/s':>8} "
+          f"{'p95 s':>7} {'load s':>7} {'RSS MB':>8}")
+    for row in report["results"]:
+        if "error" in row:
+            print(f"{row['config']:<28} failed: {row['error']}")
+            continue
+        print(f"{row['config']:<28} {row['wer']:>7} {row['cer']:>7} {row['rtf']:>7} {row['audio_x_realtime']:>7} "
+              f"{row['files_per_sec']:>8} {row['stt_p95']:>7} {row['load_seconds']:>7} {row['peak_rss_mb']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WER / RTF / memory of STT backends over a LibriSpeech manifest")
+    parser.add_argument("--manifest", default=MANIFEST_FILE, help="JSONL manifest written by DataSet.py")
+    parser.add_argument("--configs", nargs="+", default=[f"{STT_BACKEND}:{STT_MODEL_SIZE}"],
+                        help="backend:model_size[:compute_type], e.g. whisper:tiny faster-whisper:small:int8")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Transcription threads per config")
+    parser.add_argument("--limit", type=int, help="Only evaluate the first N utterances")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--hypotheses", help="Write per-utterance hypotheses and WER as JSONL")
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        configs = [parseConfig(spec) for spec in args.configs]
+        report = evaluate(args.manifest, configs, max(1, args.workers), args.limit, args.language, args.hypotheses)
+    except (OSError, ValueError) as e:
+        sys.exit(f"❌ {e}")
+    printTable(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
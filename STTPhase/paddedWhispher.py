@@ -1,33 +1,178 @@
-from pydub import AudioSegment
-import whisper
 import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import whisper
+
+# Dynamically add project root to sys.path if needed
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from STTPhase.wavAPIDirectory import load_audio
+from STTPhase.werUtils import corpusErrorRate
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30      # Whisper's encoder always sees a 30 s mel window
+GAP_SECONDS = 0.6        # silence between packed clips so words don't run together
+
+# Packed windows are decoded independently of each other (no prompt carry-over)
+# and with word timestamps so the text can be split back per clip. A single
+# temperature of 0 turns off the temperature fallback: otherwise one hard clip
+# would make Whisper re-decode the whole shared window at rising temperatures.
+PACKED_OPTIONS = {"language": "English", "word_timestamps": True, "temperature": 0.0,
+                  "condition_on_previous_text": False, "fp16": False}
+SINGLE_OPTIONS = {"language": "English", "condition_on_previous_text": False, "fp16": False}
+
+
+def pack_clips(clips, gap_seconds=GAP_SECONDS, window_seconds=WINDOW_SECONDS):
+    """
+    Greedily fill 30 s windows with consecutive clips separated by short silences.
+    Returns a list of (audio, spans) where spans is [(clip_index, start_s, end_s)].
+    A clip longer than the window gets a window (and sliding transcription) to itself.
+    """
+    window_samples = int(window_seconds * SAMPLE_RATE)
+    gap = np.zeros(int(gap_seconds * SAMPLE_RATE), dtype=np.float32)
+    windows, parts, spans, used = [], [], [], 0
+
+    def flush():
+        if parts:
+            windows.append((np.concatenate(parts), list(spans)))
+            parts.clear()
+            spans.clear()
+
+    for index, clip in enumerate(clips):
+        needed = len(clip) + (len(gap) if parts else 0)
+        if parts and used + needed > window_samples:
+            flush()
+            used, needed = 0, len(clip)
+        if parts:
+            parts.append(gap)
+        start = used + (needed - len(clip))
+        parts.append(clip.astype(np.float32, copy=False))
+        spans.append((index, start / SAMPLE_RATE, (start + len(clip)) / SAMPLE_RATE))
+        used += needed
+    flush()
+    return windows
+
+
+def split_by_timestamps(result, spans):
+    """
+    Assign each recognized word to the clip whose span contains its midpoint
+    (or the nearest one, for words that drift into a gap) and rebuild per-clip text.
+    """
+    texts = {index: [] for index, _, _ in spans}
+    starts = np.array([start for _, start, _ in spans])
+    ends = np.array([end for _, _, end in spans])
+
+    def owner(midpoint):
+        distance = np.maximum(starts - midpoint, 0) + np.maximum(midpoint - ends, 0)
+        return spans[int(np.argmin(distance))][0]
+
+    for segment in result["segments"]:
+        words = segment.get("words")
+        if words:
+            for word in words:
+                texts[owner((word["start"] + word["end"]) / 2)].append(word["word"])
+        else:
+            texts[owner((segment["start"] + segment["end"]) / 2)].append(segment["text"])
+    return ["".join(texts[index]).strip() for index, _, _ in spans]
+
+
+def transcribe_packed(model, clips, gap_seconds=GAP_SECONDS):
+    """Transcribe short clips several to a window; returns one text per clip."""
+    texts = [""] * len(clips)
+    for audio, spans in pack_clips(clips, gap_seconds):
+        result = model.transcribe(audio, **PACKED_OPTIONS)
+        for (index, _, _), text in zip(spans, split_by_timestamps(result, spans)):
+            texts[index] = text
+    return texts
+
+
+def transcribe_single(model, clips):
+    """Baseline: one clip per window (Whisper pads each to 30 s in memory)."""
+    return [model.transcribe(clip, **SINGLE_OPTIONS)["text"].strip() for clip in clips]
+
+
+def load_references(path):
+    """Reads a LibriSpeech-style '<audio_id> <TRANSCRIPT>' file into a dict."""
+    references = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.strip().split(" ", 1)
+            if len(parts) == 2:
+                references[parts[0]] = parts[1]
+    return references
 
-# Load your short audio clip (2 seconds)
-input_path = "processed_wavs/84-121123-0007.wav"
-audio = AudioSegment.from_wav(input_path)
 
-# Pad with silence to make it 30 seconds (Whisper expects 30s chunks)
-target_duration_ms = 30 * 1000  # 30 seconds in milliseconds
-padding_needed = target_duration_ms - len(audio)
+def compare(wav_dir, model_size="base", references_path=None, gap_seconds=GAP_SECONDS, limit=None):
+    """
+    Accuracy vs throughput of packed windows against one clip per window on the
+    same clips. Without reference transcripts the single-clip output is used as
+    the reference, so WER measures how much packing changes the transcripts.
+    """
+    names = sorted(f for f in os.listdir(wav_dir) if f.endswith(".wav"))[:limit]
+    clips, ids = [], []
+    for name in names:
+        audio, _ = load_audio(os.path.join(wav_dir, name))
+        if audio is not None:
+            clips.append(audio)
+            ids.append(name[:-len(".wav")])
+    if not clips:
+        raise ValueError(f"No readable .wav clips in {wav_dir}")
+    audio_seconds = sum(len(clip) for clip in clips) / SAMPLE_RATE
+    model = whisper.load_model(model_size)
+    model.transcribe(clips[0], **SINGLE_OPTIONS)  # warm-up so neither mode pays first-call costs
 
-if padding_needed > 0:
-    silence = AudioSegment.silent(duration=padding_needed)
-    padded_audio = audio + silence
-else:
-    padded_audio = audio  # already long enough
+    start = time.perf_counter()
+    single = transcribe_single(model, clips)
+    single_seconds = time.perf_counter() - start
 
-# Save the padded audio to a temporary file
-padded_path = "temp_padded.wav"
-padded_audio.export(padded_path, format="wav")
+    start = time.perf_counter()
+    packed = transcribe_packed(model, clips, gap_seconds)
+    packed_seconds = time.perf_counter() - start
 
-# Load Whisper model
-model = whisper.load_model("base")
+    references = load_references(references_path) if references_path else {}
+    report = {
+        "clips": len(clips),
+        "audio_seconds": round(audio_seconds, 2),
+        "windows": {"single": len(clips), "packed": len(pack_clips(clips, gap_seconds))},
+        "seconds": {"single": round(single_seconds, 3), "packed": round(packed_seconds, 3)},
+        "rtf": {"single": round(single_seconds / audio_seconds, 4), "packed": round(packed_seconds / audio_seconds, 4)},
+        "speedup": round(single_seconds / packed_seconds, 2) if packed_seconds else None,
+    }
+    if references:
+        pairs = [(references[i], s, p) for i, s, p in zip(ids, single, packed) if i in references]
+        report["wer"] = {
+            "single": round(corpusErrorRate([(r, s) for r, s, _ in pairs]), 4),
+            "packed": round(corpusErrorRate([(r, p) for r, _, p in pairs]), 4),
+        }
+    else:
+        report["wer_packed_vs_single"] = round(corpusErrorRate(zip(single, packed)), 4)
+    report["transcripts"] = [{"id": i, "single": s, "packed": p} for i, s, p in zip(ids, single, packed)]
+    return report
 
-# Transcribe the padded audio
-result = model.transcribe(padded_path, language="English")
 
-# Print the output
-print("Transcription:", result["text"])
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare packed 30 s Whisper windows with one clip per window")
+    parser.add_argument("--wav-dir", default="processed_wavs")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--references", help="LibriSpeech .trans.txt style file for WER")
+    parser.add_argument("--gap", type=float, default=GAP_SECONDS, help="Silence between packed clips (s)")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", help="Write the full report as JSON")
+    args = parser.parse_args()
 
-# Optional: remove the temporary padded file
-os.remove(padded_path)
+    try:
+        report = compare(args.wav_dir, args.model, args.references, args.gap, args.limit)
+    except (OSError, ValueError) as e:
+        sys.exit(f"❌ {e}")
+    for row in report["transcripts"]:
+        print(f"{row['id']}\n  single: {row['single']}\n  packed: {row['packed']}")
+    summary = {k: v for k, v in report.items() if k != "transcripts"}
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
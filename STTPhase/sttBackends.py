@@ -0,0 +1,139 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+# --- Deployment configuration ---
+STT_BACKEND = os.getenv("STT_BACKEND", "whisper")            # whisper | faster-whisper
+STT_MODEL_SIZE = os.getenv("STT_MODEL_SIZE", "tiny")         # tiny, base, small, medium, large-v3 ...
+STT_COMPUTE_TYPE = os.getenv("STT_COMPUTE_TYPE", "int8")     # faster-whisper only: int8, int8_float16, float16, float32
+STT_DEVICE = os.getenv("STT_DEVICE", "cpu")
+STT_CPU_THREADS = int(os.getenv("STT_CPU_THREADS", "0"))     # 0 = let the engine decide
+
+SAMPLE_RATE = 16000
+
+# Language names as openai-whisper accepts them -> ISO codes for engines that want codes
+LANGUAGE_CODES = {"english": "en", "spanish": "es", "french": "fr", "german": "de", "hindi": "hi"}
+
+
+class STTBackend(ABC):
+    """
+    What processAudio/transcribeArray need from a speech-to-text engine: transcribe
+    a wav path or a 16 kHz mono float32 array and return the text. Options use
+    openai-whisper's transcribe() names; each backend maps the ones it supports.
+    num_workers is how many threads the caller will transcribe on at once (the
+    server passes its STT pool size).
+    """
+
+    name = "base"
+
+    def __init__(self, model_size=STT_MODEL_SIZE, num_workers=1):
+        self.model_size = model_size
+        self.num_workers = max(1, num_workers)
+
+    @abstractmethod
+    def model_for_thread(self):
+        """The engine instance the calling thread should use (loading it if needed)."""
+
+    @abstractmethod
+    def transcribe(self, audio, **options):
+        """Text for a wav path or 16 kHz mono float32 array."""
+
+    def warmup(self):
+        # One second of silence exercises feature extraction, encoder and decoder
+        self.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), language="English")
+
+    def describe(self):
+        return f"{self.name}:{self.model_size}"
+
+
+class WhisperBackend(STTBackend):
+    """
+    openai-whisper (fp32 PyTorch on CPU). Its decoder installs kv-cache hooks on
+    the model for the duration of a transcribe call, so one instance must never be
+    used by two threads at once: the first thread to transcribe keeps the primary
+    model and any other thread (e.g. extra server STT workers) loads its own replica,
+    so expect one loaded model per transcribing thread.
+    """
+
+    name = "whisper"
+
+    def __init__(self, model_size=STT_MODEL_SIZE, num_workers=1):
+        import whisper
+        super().__init__(model_size, num_workers)
+        self._whisper = whisper
+        self.model = whisper.load_model(model_size)
+        self._thread_state = threading.local()
+        self._replica_lock = threading.Lock()
+        self._model_owner = None
+
+    def model_for_thread(self):
+        replica = getattr(self._thread_state, "model", None)
+        if replica is None:
+            with self._replica_lock:
+                if self._model_owner is None:
+                    self._model_owner = threading.get_ident()
+                    replica = self.model
+                else:
+                    replica = self._whisper.load_model(self.model_size)
+            self._thread_state.model = replica
+        return replica
+
+    def transcribe(self, audio, **options):
+        options.setdefault("fp16", STT_DEVICE == "cuda")
+        return self.model_for_thread().transcribe(audio, **options)["text"]
+
+    def warmup(self):
+        # Warm the primary model directly: going through model_for_thread would
+        # hand it to the short-lived loader thread
+        self.model.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), language="English",
+                              fp16=STT_DEVICE == "cuda")
+
+
+class FasterWhisperBackend(STTBackend):
+    """
+    CTranslate2 Whisper via faster-whisper, with int8 weights by default. One model
+    is shared by every thread; CTranslate2 runs up to num_workers transcriptions
+    in parallel on it. Requires `pip install faster-whisper`.
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size=STT_MODEL_SIZE, compute_type=STT_COMPUTE_TYPE, device=STT_DEVICE,
+                 cpu_threads=STT_CPU_THREADS, num_workers=1):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise ImportError("STT_BACKEND=faster-whisper needs the faster-whisper package (pip install faster-whisper)") from e
+        super().__init__(model_size, num_workers)
+        self.compute_type = compute_type
+        self.model = WhisperModel(model_size, device=device, compute_type=compute_type,
+                                  cpu_threads=cpu_threads, num_workers=self.num_workers)
+
+    def model_for_thread(self):
+        return self.model
+
+    def transcribe(self, audio, **options):
+        options.pop("fp16", None)  # precision is fixed by compute_type
+        language = options.pop("language", None)
+        if language:
+            options["language"] = LANGUAGE_CODES.get(language.lower(), language)
+        # openai-whisper's transcribe() is greedy by default; match it unless asked otherwise
+        options.setdefault("beam_size", 1)
+        segments, _ = self.model.transcribe(audio, **options)
+        return "".join(segment.text for segment in segments)
+
+    def describe(self):
+        return f"{self.name}:{self.model_size}:{self.compute_type}"
+
+
+BACKENDS = {"whisper": WhisperBackend, "faster-whisper": FasterWhisperBackend}
+
+
+def make_backend(name=None, **kwargs):
+    """Build the backend named by name (default: STT_BACKEND)."""
+    name = (name or STT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown STT_BACKEND '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,215 @@
+import os
+import collections
+import numpy as np
+
+# --- Audio Parameters (match STTVad's capture settings) ---
+RATE = 16000
+CHUNK_DURATION_MS = 30
+CHUNK_SIZE = int(RATE * CHUNK_DURATION_MS / 1000)
+PADDING_DURATION_MS = 300
+PADDING_CHUNKS = int(PADDING_DURATION_MS / CHUNK_DURATION_MS)
+HANGOVER_MS = 450  # bridges the pauses between words and short phrases
+HANGOVER_CHUNKS = int(HANGOVER_MS / CHUNK_DURATION_MS)
+MAX_SEGMENT_SECONDS = 30
+
+VAD_MODE = os.getenv("VAD_MODE", "energy")  # energy | spectral | webrtc
+
+SpeechSegment = collections.namedtuple("SpeechSegment", ["audio", "start_chunk", "end_chunk"])
+
+
+def pcm_view(chunk):
+    """Zero-copy int16 view over a raw 16-bit little-endian PCM chunk."""
+    return np.frombuffer(chunk, dtype="<i2")
+
+
+def chunk_rms(samples):
+    """RMS energy (int16 units) of a chunk given as raw bytes or an int16 array."""
+    if isinstance(samples, (bytes, bytearray, memoryview)):
+        samples = pcm_view(samples)
+    if len(samples) == 0:
+        return 0.0
+    x = samples.astype(np.float32)
+    return float(np.sqrt(np.dot(x, x) / len(x)))
+
+
+class EnergyVAD:
+    """
+    RMS voice activity detector with an adaptive noise floor.
+
+    A chunk counts as speech when its energy is on_ratio times the tracked noise
+    floor (off_ratio once already speaking, so the decision doesn't flicker
+    around one threshold). The floor follows the background quickly downwards
+    and slowly upwards, and barely moves during speech. Speech must last
+    attack_chunks to trigger, and the detector stays active for hangover_chunks
+    after the last speech chunk so short pauses between words don't end a segment.
+    """
+
+    def __init__(self, on_ratio=3.0, off_ratio=1.8, min_on=200.0, min_off=120.0, initial_floor=100.0,
+                 floor_rise=0.05, floor_fall=0.5, attack_chunks=2, hangover_chunks=HANGOVER_CHUNKS):
+        self.on_ratio = on_ratio
+        self.off_ratio = off_ratio
+        self.min_on = min_on
+        self.min_off = min_off
+        self.initial_floor = initial_floor
+        self.floor_rise = floor_rise
+        self.floor_fall = floor_fall
+        self.attack_chunks = attack_chunks
+        self.hangover_chunks = hangover_chunks
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = self.initial_floor
+        self.active = False
+        self.run = 0        # consecutive speech chunks while inactive
+        self.hangover = 0   # chunks left before an active detector releases
+        self.last_rms = 0.0
+
+    def thresholds(self):
+        return (max(self.min_on, self.noise_floor * self.on_ratio),
+                max(self.min_off, self.noise_floor * self.off_ratio))
+
+    def _frame_is_speech(self, chunk, samples, rms):
+        on, off = self.thresholds()
+        return rms > (off if self.active else on)
+
+    def _track_floor(self, rms, speech):
+        if rms < self.noise_floor:
+            self.noise_floor += self.floor_fall * (rms - self.noise_floor)
+        else:
+            # Creep up slowly during speech too, so a step change in background
+            # noise can't hold the detector open forever
+            rise = self.floor_rise if not speech else self.floor_rise / 20
+            self.noise_floor += rise * (rms - self.noise_floor)
+        self.noise_floor = max(self.noise_floor, 1.0)
+
+    def is_speech(self, chunk):
+        """Feed one chunk of 16-bit PCM; returns whether the detector is in speech."""
+        samples = pcm_view(chunk)
+        rms = chunk_rms(samples)
+        self.last_rms = rms
+        speech = self._frame_is_speech(chunk, samples, rms)
+        self._track_floor(rms, speech)
+
+        if self.active:
+            if speech:
+                self.hangover = self.hangover_chunks
+            elif self.hangover > 0:
+                self.hangover -= 1
+            else:
+                self.active = False
+        else:
+            self.run = self.run + 1 if speech else 0
+            if self.run >= self.attack_chunks:
+                self.active = True
+                self.run = 0
+                self.hangover = self.hangover_chunks
+        return self.active
+
+
+class SpectralVAD(EnergyVAD):
+    """
+    EnergyVAD that also requires a speech-like spectrum to trigger: most of the
+    energy in the 300-3400 Hz band and a low spectral flatness. Rejects broadband
+    noise (fans, hiss) and low rumble that pass a pure energy test. Once active,
+    the energy test alone sustains speech, so fricatives and breathy syllables
+    don't cut a segment short.
+    """
+
+    def __init__(self, band=(300, 3400), min_band_ratio=0.5, max_flatness=0.45, **kwargs):
+        super().__init__(**kwargs)
+        self.window = np.hanning(CHUNK_SIZE).astype(np.float32)
+        freqs = np.fft.rfftfreq(CHUNK_SIZE, 1.0 / RATE)
+        self.band_mask = (freqs >= band[0]) & (freqs <= band[1])
+        self.min_band_ratio = min_band_ratio
+        self.max_flatness = max_flatness
+
+    def _frame_is_speech(self, chunk, samples, rms):
+        if not super()._frame_is_speech(chunk, samples, rms):
+            return False
+        if self.active or len(samples) != len(self.window):
+            return True
+        power = np.abs(np.fft.rfft(samples.astype(np.float32) * self.window)) ** 2 + 1e-10
+        band_ratio = power[self.band_mask].sum() / power.sum()
+        flatness = np.exp(np.mean(np.log(power))) / np.mean(power)
+        return band_ratio >= self.min_band_ratio and flatness <= self.max_flatness
+
+
+class WebRtcVAD(EnergyVAD):
+    """
+    Uses the webrtcvad GMM classifier for the per-chunk decision, keeping the
+    attack/hangover smoothing from EnergyVAD. Requires `pip install webrtcvad`.
+    """
+
+    def __init__(self, aggressiveness=2, **kwargs):
+        try:
+            import webrtcvad
+        except ImportError as e:
+            raise ImportError("VAD_MODE=webrtc needs the webrtcvad package (pip install webrtcvad)") from e
+        super().__init__(**kwargs)
+        self.vad = webrtcvad.Vad(aggressiveness)
+
+    def _frame_is_speech(self, chunk, samples, rms):
+        return self.vad.is_speech(bytes(chunk), RATE)
+
+
+VAD_CLASSES = {"energy": EnergyVAD, "spectral": SpectralVAD, "webrtc": WebRtcVAD}
+
+
+def make_vad(mode=None, **kwargs):
+    """Build the detector named by mode (default: VAD_MODE env var)."""
+    mode = mode or VAD_MODE
+    if mode not in VAD_CLASSES:
+        raise ValueError(f"Unknown VAD mode '{mode}', expected one of {sorted(VAD_CLASSES)}")
+    return VAD_CLASSES[mode](**kwargs)
+
+
+class Segmenter:
+    """
+    Turns a stream of PCM chunks into speech segments using a VAD. Keeps
+    padding_chunks of audio from before the trigger as pre-roll and force-splits
+    segments that run longer than max_chunks.
+    """
+
+    def __init__(self, vad, padding_chunks=PADDING_CHUNKS,
+                 max_chunks=int(MAX_SEGMENT_SECONDS * 1000 / CHUNK_DURATION_MS)):
+        self.vad = vad
+        self.padding_chunks = padding_chunks
+        self.max_chunks = max_chunks
+        self.ring_buffer = collections.deque(maxlen=padding_chunks)
+        self.voiced = []
+        self.start_chunk = None
+        self.chunk_index = 0
+
+    @property
+    def triggered(self):
+        return self.start_chunk is not None
+
+    def _emit(self):
+        segment = SpeechSegment(b"".join(self.voiced), self.start_chunk, self.chunk_index)
+        self.voiced = []
+        self.start_chunk = None
+        return segment
+
+    def feed(self, chunk):
+        """Add one chunk; returns a SpeechSegment when one has just ended, else None."""
+        speech = self.vad.is_speech(chunk)
+        self.chunk_index += 1
+        if not self.triggered:
+            if speech:
+                self.start_chunk = self.chunk_index - 1 - len(self.ring_buffer)
+                self.voiced.extend(self.ring_buffer)
+                self.ring_buffer.clear()
+                self.voiced.append(chunk)
+            else:
+                self.ring_buffer.append(chunk)
+            return None
+
+        self.voiced.append(chunk)
+        if not speech or len(self.voiced) >= self.max_chunks:
+            return self._emit()
+        return None
+
+    def flush(self):
+        """Return the in-progress segment (if any), e.g. when the stream stops."""
+        self.ring_buffer.clear()
+        return self._emit() if self.voiced else None
@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+import numpy as np
+
+# Dynamically add project root to sys.path if needed
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from STTPhase.vadDetectors import (CHUNK_DURATION_MS, CHUNK_SIZE, RATE, VAD_CLASSES, Segmenter,
+                                   chunk_rms, make_vad)
+from STTPhase.wavAPIDirectory import load_audio
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCES = [os.path.join(CURRENT_DIR, "samplesWavs"), os.path.join(CURRENT_DIR, "recordedWavs")]
+
+
+def legacy_rms(chunk):
+    """The original STTVad struct.unpack RMS, kept only as a CPU cost baseline."""
+    count = len(chunk) // 2
+    shorts = struct.unpack("%dh" % count, chunk)
+    return np.sqrt(np.mean(np.square(shorts)))
+
+
+def load_clips(sources):
+    """16 kHz int16 clips from the given wav files / directories."""
+    clips = []
+    for source in sources:
+        paths = ([os.path.join(source, f) for f in sorted(os.listdir(source)) if f.endswith(".wav")]
+                 if os.path.isdir(source) else [source])
+        for path in paths:
+            audio, _ = load_audio(path)
+            if audio is not None and len(audio):
+                clips.append((os.path.basename(path), np.clip(audio * 32768, -32768, 32767).astype(np.int16)))
+    return clips
+
+
+def speech_bounds(clip, relative_db=-30):
+    """
+    Ground-truth speech extent of a clean clip: first to last 30 ms chunk within
+    relative_db of the clip's loudest chunk (trims recorded lead-in/lead-out silence).
+    """
+    n = len(clip) // CHUNK_SIZE
+    if n == 0:
+        return 0, len(clip)
+    frames = clip[:n * CHUNK_SIZE].astype(np.float32).reshape(n, CHUNK_SIZE)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    loud = np.flatnonzero(rms >= rms.max() * 10 ** (relative_db / 20))
+    return int(loud[0]) * CHUNK_SIZE, int(loud[-1] + 1) * CHUNK_SIZE
+
+
+def build_stream(clips, noise_levels=(60, 250), gap_seconds=(0.8, 2.5), seed=0):
+    """
+    Lay clips end to end with gaps of Gaussian background noise between them.
+    The noise level steps through noise_levels (one step per equal share of the
+    stream) so the adaptive floor has something to track. Returns the int16
+    stream and the ground-truth [start, end) sample spans of speech in it.
+    """
+    rng = np.random.default_rng(seed)
+    parts, spans, position = [], [], 0
+    for index, (_, clip) in enumerate(clips + clips[:1]):
+        gap = int(rng.uniform(*gap_seconds) * RATE)
+        parts.append(np.zeros(gap, dtype=np.float32))
+        position += gap
+        if index == len(clips):
+            break  # trailing gap only
+        parts.append(clip.astype(np.float32))
+        start, end = speech_bounds(clip)
+        spans.append((position + start, position + end))
+        position += len(clip)
+    stream = np.concatenate(parts)
+    levels = np.repeat(noise_levels, -(-len(stream) // len(noise_levels)))[:len(stream)]
+    stream += rng.standard_normal(len(stream)).astype(np.float32) * levels
+    return np.clip(stream, -32768, 32767).astype(np.int16), spans
+
+
+def chunk_labels(spans, n_chunks):
+    labels = np.zeros(n_chunks, dtype=bool)
+    for start, end in spans:
+        labels[start // CHUNK_SIZE:-(-end // CHUNK_SIZE)] = True
+    return labels
+
+
+def replay(stream, mode, **vad_kwargs):
+    """Run stream through a fresh detector; returns (segments, per-chunk active flags, ns per chunk)."""
+    vad = make_vad(mode, **vad_kwargs)
+    segmenter = Segmenter(vad)
+    data = stream.tobytes()
+    step = CHUNK_SIZE * 2
+    chunks = [data[i:i + step] for i in range(0, len(data) - step + 1, step)]
+    active = np.zeros(len(chunks), dtype=bool)
+    segments, cost_ns = [], np.zeros(len(chunks), dtype=np.int64)
+    for i, chunk in enumerate(chunks):
+        start = time.perf_counter_ns()
+        segment = segmenter.feed(chunk)
+        cost_ns[i] = time.perf_counter_ns() - start
+        active[i] = vad.active
+        if segment is not None:
+            segments.append((segment.start_chunk, segment.end_chunk))
+    tail = segmenter.flush()
+    if tail is not None:
+        segments.append((tail.start_chunk, tail.end_chunk))
+    return segments, active, cost_ns
+
+
+def score(segments, active, spans):
+    """Frame-level precision/recall plus utterance-level detection, splits, false alarms and boundary error."""
+    truth = chunk_labels(spans, len(active))
+    tp = int(np.sum(active & truth))
+    precision = tp / max(1, int(active.sum()))
+    recall = tp / max(1, int(truth.sum()))
+
+    truth_chunks = [(s // CHUNK_SIZE, -(-e // CHUNK_SIZE)) for s, e in spans]
+    overlaps = lambda a, b: a[0] < b[1] and b[0] < a[1]
+    detected = splits = 0
+    onset_ms, offset_ms = [], []
+    for utterance in truth_chunks:
+        hits = [seg for seg in segments if overlaps(seg, utterance)]
+        if hits:
+            detected += 1
+            splits += len(hits) - 1
+            onset_ms.append((hits[0][0] - utterance[0]) * CHUNK_DURATION_MS)
+            offset_ms.append((hits[-1][1] - utterance[1]) * CHUNK_DURATION_MS)
+    false_alarms = sum(1 for seg in segments if not any(overlaps(seg, u) for u in truth_chunks))
+    return {
+        "frame_precision": round(precision, 4),
+        "frame_recall": round(recall, 4),
+        "frame_f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        "utterances": len(spans),
+        "segments": len(segments),
+        "detected": detected,
+        "extra_splits": splits,
+        "false_alarms": false_alarms,
+        "mean_onset_error_ms": round(float(np.mean(onset_ms)), 1) if onset_ms else None,
+        "mean_offset_error_ms": round(float(np.mean(offset_ms)), 1) if offset_ms else None,
+    }
+
+
+def cost_stats(cost_ns):
+    return {"mean_us": round(float(np.mean(cost_ns)) / 1000, 2),
+            "p99_us": round(float(np.percentile(cost_ns, 99)) / 1000, 2)}
+
+
+def rms_cost(stream, fn, repeats=3):
+    data = stream.tobytes()
+    step = CHUNK_SIZE * 2
+    chunks = [data[i:i + step] for i in range(0, len(data) - step + 1, step)]
+    start = time.perf_counter_ns()
+    for _ in range(repeats):
+        for chunk in chunks:
+            fn(chunk)
+    return round((time.perf_counter_ns() - start) / (repeats * len(chunks)) / 1000, 2)
+
+
+def run(sources, modes, noise_levels, seed=0):
+    clips = load_clips(sources)
+    if not clips:
+        raise SystemExit(f"No wav files found in {sources}")
+    stream, spans = build_stream(clips, noise_levels=noise_levels, seed=seed)
+    report = {
+        "clips": [name for name, _ in clips],
+        "stream_seconds": round(len(stream) / RATE, 2),
+        "noise_levels": list(noise_levels),
+        "rms_us_per_chunk": {"struct_unpack": rms_cost(stream, legacy_rms), "frombuffer": rms_cost(stream, chunk_rms)},
+        "detectors": {},
+    }
+    for mode in modes:
+        try:
+            segments, active, cost_ns = replay(stream, mode)
+        except ImportError as e:
+            print(f"⚠️ Skipping {mode}: {e}")
+            continue
+        report["detectors"][mode] = {**score(segments, active, spans), "cpu_per_chunk": cost_stats(cost_ns)}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay wav files through the VAD and score its segmentation")
+    parser.add_argument("sources", nargs="*", default=DEFAULT_SOURCES, help="wav files or directories")
+    parser.add_argument("--modes", default="energy,spectral,webrtc")
+    parser.add_argument("--noise", default="60,250", help="Background noise RMS levels (int16 units), stepped through the stream")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    modes = [m for m in args.modes.split(",") if m in VAD_CLASSES]
+    report = run(args.sources, modes, [float(x) for x in args.noise.split(",")], args.seed)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
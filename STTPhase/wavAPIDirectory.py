@@ -1,104 +1,271 @@
 import os
+import json
+import time
 import wave
-import whisper
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-# Load the Whisper model (choose "base", "small", etc.)
-model = whisper.load_model("tiny")  # You can change to "tiny", "small", "medium", or "large"
+import numpy as np
 
 # --- CONFIGURATION CONSTANTS ---
-WAV_INPUT_DIR = "recordedWavs"  #change to your wav files
-TRANSCRIPT_OUTPUT_DIR = "processed_text" # New directory for individual TXT files
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+WAV_INPUT_DIR = os.path.join(CURRENT_DIR, "recordedWavs")  #change to your wav files
+TRANSCRIPT_OUTPUT_DIR = os.path.join(CURRENT_DIR, "processed_text") # New directory for individual TXT files
+RESULTS_FILE = "transcripts.jsonl"
 FILE_LIMIT = 5 # Process only the first 5 files
 
-# Ensure the output directory exists
-os.makedirs(TRANSCRIPT_OUTPUT_DIR, exist_ok=True)
+MODEL_SIZE = os.getenv("STT_MODEL_SIZE", "tiny")  # "tiny", "base", "small", "medium", or "large"
+DEFAULT_WORKERS = int(os.getenv("STT_BATCH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+DEFAULT_BATCH_SIZE = int(os.getenv("STT_BATCH_SIZE", "8"))
 
-# --- UTILITY FUNCTIONS (Keep these) ---
+WHISPER_SAMPLE_RATE = 16000
+WHISPER_WINDOW_SECONDS = 30
+
+# --- UTILITY FUNCTIONS ---
 
 def load_audio(filename):
-    """Loads a WAV file and returns audio bytes and sample rate."""
+    """
+    Loads a WAV file as the 16 kHz mono float32 array Whisper consumes.
+    16 kHz mono int16 files are converted in memory; anything else is
+    resampled by whisper.load_audio (ffmpeg). Returns (audio, sample_rate).
+    """
     try:
         with wave.open(filename, "rb") as wf:
             audio_bytes = wf.readframes(wf.getnframes())
             sample_rate = wf.getframerate()
-        return audio_bytes, sample_rate
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
     except wave.Error as e:
         print(f"ERROR: Could not load WAV file: {filename}. {e}")
         return None, None
 
-def call_stt_api(audio_content, sample_rate, audio_id):
-    """Placeholder for actual API call, simulates a result."""
-    # Simulate API call time    
-    # time.sleep(0.5) 
-    
-    print(f"  -> Sending {audio_id}.wav to STT API...")
-    
-    # In a real scenario, this is where you'd send the audio_content
-    # and receive the transcription string.
-    
-    # Transcribe the audio file
-    result = model.transcribe(f"{WAV_INPUT_DIR}/{audio_id}.wav", language="English")
+    if sample_rate == WHISPER_SAMPLE_RATE and channels == 1 and sample_width == 2:
+        return np.frombuffer(audio_bytes, dtype="<i2").astype(np.float32) / 32768.0, sample_rate
+
+    import whisper
+    return whisper.load_audio(filename), sample_rate
+
+# --------------------------------------------------------------------------
+# 🧵 WORKER PROCESS
+# Each worker loads one Whisper model in its initializer and keeps it warm
+# for every batch it is handed, so model load is paid once per process.
+# --------------------------------------------------------------------------
+
+_worker_model = None
 
-    # Print the recognized text
-    print("Transcription:", result["text"])
 
+def _init_worker(model_size, torch_threads):
+    global _worker_model
+    import torch
+    import whisper
+    # Split the cores between workers instead of letting each one grab all of them
+    torch.set_num_threads(torch_threads)
+    _worker_model = whisper.load_model(model_size)
 
-    # Simulating a result:
-    return f"[TRANSCRIPT]: This is the automated speech recognition output for audio file {audio_id}. The sample rate used was {sample_rate} Hz. \n {result['text']}"
+
+def _decode_batch(clips, language):
+    """
+    One encoder + decoder pass over several <=30 s clips: their log-mel
+    spectrograms are stacked into a (batch, n_mels, 3000) tensor and handed to
+    whisper.decode. Greedy decoding without temperature fallback, so it trades
+    a little robustness on hard clips for throughput.
+    """
+    import torch
+    import whisper
+
+    model = _worker_model
+    mels = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels)
+        for audio in clips
+    ]).to(model.device)
+    options = whisper.DecodingOptions(
+        language=language, without_timestamps=True, fp16=model.device.type == "cuda"
+    )
+    return [result.text.strip() for result in whisper.decode(model, mels, options)]
+
+
+def _error_record(path, error):
+    if isinstance(error, Exception):
+        error = f"{type(error).__name__}: {error}"
+    return {"file": os.path.basename(path), "status": "error", "error": error}
+
+
+def _transcribe_batch(paths, batch_decode, language):
+    """
+    Transcribe a list of WAV paths in this worker; returns one record per file.
+    Never raises: a file that fails to load or decode gets an error record, so
+    one bad wav can't stop the directory job.
+    """
+    records, batchable = [], []
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            audio, sample_rate = load_audio(path)
+        except Exception as e:  # empty/truncated files, ffmpeg rejections
+            records.append(_error_record(path, e))
+            continue
+        if audio is None:
+            records.append(_error_record(path, "unreadable wav"))
+            continue
+        record = {
+            "file": os.path.basename(path),
+            "sample_rate": sample_rate,
+            "duration": round(len(audio) / WHISPER_SAMPLE_RATE, 3),
+        }
+        if batch_decode and len(audio) <= WHISPER_WINDOW_SECONDS * WHISPER_SAMPLE_RATE:
+            batchable.append((record, audio, time.perf_counter() - start))
+            continue
+        # Long clips (or batching disabled) go through the regular sliding-window transcribe
+        try:
+            result = _worker_model.transcribe(audio, language=language, fp16=False)
+        except Exception as e:
+            records.append(_error_record(path, e))
+            continue
+        record.update(status="ok", text=result["text"].strip(), mode="transcribe",
+                      seconds=round(time.perf_counter() - start, 3))
+        records.append(record)
+
+    if batchable:
+        start = time.perf_counter()
+        try:
+            texts = _decode_batch([audio for _, audio, _ in batchable], language)
+        except Exception as e:
+            records.extend(_error_record(record["file"], e) for record, _, _ in batchable)
+            return records
+        # Attribute the shared decode time evenly across the batch
+        share = (time.perf_counter() - start) / len(batchable)
+        for (record, _, load_seconds), text in zip(batchable, texts):
+            record.update(status="ok", text=text, mode="batch",
+                          seconds=round(load_seconds + share, 3))
+            records.append(record)
+    return records
 
 # --------------------------------------------------------------------------
 # 🎯 MAIN PROCESSING LOGIC
 # --------------------------------------------------------------------------
 
+def load_done(results_path):
+    """Files that already have a successful record in the results JSONL."""
+    done = set()
+    if os.path.exists(results_path):
+        with open(results_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from an interrupted run
+                if record.get("status") == "ok":
+                    done.add(record["file"])
+    return done
+
+
+def write_transcript_txt(record, txt_dir):
+    audio_id = record["file"].replace('.wav', '')
+    txt_output_path = os.path.join(txt_dir, f"{audio_id}.txt")
+    with open(txt_output_path, 'w', encoding='utf-8') as f_out:
+        f_out.write(f"Audio ID: {audio_id}\n")
+        f_out.write(f"Sample Rate: {record['sample_rate']} Hz\n\n")
+        f_out.write(record["text"])
+
+
+def transcribe_directory(input_dir=WAV_INPUT_DIR, results_path=None, workers=DEFAULT_WORKERS,
+                         batch_size=DEFAULT_BATCH_SIZE, batch_decode=False, model_size=MODEL_SIZE,
+                         limit=None, language="en", txt_dir=None):
+    """
+    Transcribe every WAV in input_dir on a pool of worker processes, each holding a
+    warm Whisper model. Files are handed out batch_size at a time; with batch_decode
+    the <=30 s clips of a batch share one decoder pass. Results stream to a JSONL
+    file as batches finish, files already recorded there are skipped, and the
+    returned report includes files/sec and real-time factor.
+    """
+    results_path = results_path or os.path.join(input_dir, RESULTS_FILE)
+    all_wav_files = sorted(f for f in os.listdir(input_dir) if f.endswith(".wav"))
+    if limit:
+        all_wav_files = all_wav_files[:limit]
+    done = load_done(results_path)
+    todo = [os.path.join(input_dir, f) for f in all_wav_files if f not in done]
+    if txt_dir:
+        os.makedirs(txt_dir, exist_ok=True)
+
+    workers = max(1, min(workers, -(-len(todo) // batch_size) if todo else 1))
+    print(f"Found {len(all_wav_files)} WAV files: {len(all_wav_files) - len(todo)} already done, "
+          f"{len(todo)} to transcribe on {workers} worker(s), batches of {batch_size}"
+          f"{' (batched decode)' if batch_decode else ''}.")
+
+    report = {"files": 0, "failed": 0, "skipped": len(all_wav_files) - len(todo), "audio_seconds": 0.0}
+    start = time.perf_counter()
+    if todo:
+        torch_threads = max(1, (os.cpu_count() or 2) // workers)
+        # spawn: torch and fork don't mix well, and each worker loads its own model anyway
+        context = multiprocessing.get_context("spawn")
+        batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(model_size, torch_threads)) as pool, \
+                open(results_path, "a", encoding="utf-8") as results:
+            futures = {pool.submit(_transcribe_batch, batch, batch_decode, language): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    batch_records = future.result()
+                except Exception as e:  # the worker process itself died (e.g. out of memory)
+                    batch_records = [_error_record(path, e) for path in futures[future]]
+                for record in batch_records:
+                    results.write(json.dumps(record) + "\n")
+                    if record["status"] != "ok":
+                        report["failed"] += 1
+                        print(f"  -> Skipping {record['file']}: {record['error']}")
+                        continue
+                    report["files"] += 1
+                    report["audio_seconds"] += record["duration"]
+                    if txt_dir:
+                        write_transcript_txt(record, txt_dir)
+                    print(f"  -> {record['file']}: {record['text']}")
+                results.flush()
+
+    elapsed = time.perf_counter() - start
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["files_per_sec"] = round(report["files"] / elapsed, 3) if report["files"] else 0.0
+    # Real-time factor: wall-clock seconds spent per second of audio (lower is faster)
+    report["rtf"] = round(elapsed / report["audio_seconds"], 4) if report["audio_seconds"] else None
+    report["results"] = results_path
+    print(f"\n✅ Transcribed {report['files']} files ({report['audio_seconds']:.1f}s of audio) in {elapsed:.1f}s: "
+          f"{report['files_per_sec']} files/sec, RTF {report['rtf']}")
+    return report
+
+
 def process_first_n_files(limit):
     """
-    Reads the first N WAV files, calls the API, and saves each transcript 
-    to a separate .txt file.
+    Transcribes the first N WAV files and saves each transcript to a separate
+    .txt file (plus the JSONL results) in TRANSCRIPT_OUTPUT_DIR.
     """
-    
-    # 1. Get all WAV files and sort them
-    all_wav_files = sorted([f for f in os.listdir(WAV_INPUT_DIR) if f.endswith(".wav")])
-    
-    if not all_wav_files:
-        print(f"ERROR: No .wav files found in {WAV_INPUT_DIR}. Please check the directory.")
-        return
-
-    # 2. Select only the first 'limit' files
-    files_to_process = all_wav_files[:limit]
-    
-    print(f"Found {len(all_wav_files)} WAV files. Processing the first {len(files_to_process)}.")
-
-    for file_name in files_to_process:
-        wav_path = os.path.join(WAV_INPUT_DIR, file_name)
-        audio_id = file_name.replace('.wav', '')
-        
-        # 3. Define the output file path (e.g., processed_text/174-50561-0000.txt)
-        txt_output_path = os.path.join(TRANSCRIPT_OUTPUT_DIR, f"{audio_id}.txt")
-
-        print(f"\nProcessing file: {file_name}")
-
-        # 4. Load the WAV file
-        audio_content, sample_rate = load_audio(wav_path)
-        
-        if audio_content is not None:
-            # 5. Call the STT API
-            stt_result = call_stt_api(audio_content, sample_rate, audio_id)
-            
-            # 6. Save the transcription result to the individual TXT file
-            try:
-                with open(txt_output_path, 'w') as f_out:
-                    f_out.write(f"Audio ID: {audio_id}\n")
-                    f_out.write(f"Sample Rate: {sample_rate} Hz\n\n")
-                    f_out.write(stt_result)
-                print(f"  -> Transcript saved to: {txt_output_path}")
-            except Exception as e:
-                print(f"  -> ERROR: Failed to write output file {txt_output_path}. Error: {e}")
-                
-        else:
-            print(f"  -> Skipping {audio_id} due to loading error.")
-    
-    print("\n✅ Limited batch processing complete.")
+    os.makedirs(TRANSCRIPT_OUTPUT_DIR, exist_ok=True)
+    return transcribe_directory(
+        WAV_INPUT_DIR,
+        results_path=os.path.join(TRANSCRIPT_OUTPUT_DIR, RESULTS_FILE),
+        limit=limit,
+        txt_dir=TRANSCRIPT_OUTPUT_DIR,
+    )
 
 # --- EXECUTION ---
 if __name__ == "__main__":
-    process_first_n_files(limit=FILE_LIMIT)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Batch-transcribe a directory of WAV files with Whisper")
+    parser.add_argument("--input-dir", default=WAV_INPUT_DIR)
+    parser.add_argument("--results", help=f"JSONL results path (default: <input-dir>/{RESULTS_FILE})")
+    parser.add_argument("--txt-dir", help="Also write one .txt transcript per file here")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--batch-decode", action="store_true",
+                        help="Decode the <=30 s clips of each batch in a single Whisper pass")
+    parser.add_argument("--model", default=MODEL_SIZE)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--report", help="Also write the throughput report as JSON")
+    args = parser.parse_args()
+
+    report = transcribe_directory(args.input_dir, args.results, args.workers, args.batch_size,
+                                  args.batch_decode, args.model, args.limit, txt_dir=args.txt_dir)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
@@ -1,13 +1,59 @@
 import os
+import sys
 import wave
-import whisper
+import numpy as np
 
-model = whisper.load_model("tiny")  # Change as needed
+# Dynamically add project root to sys.path if needed
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
-def processAudio(filename, directory="recordedWavs"):
+from Shared.metrics import AUDIO_SECONDS, stage_timer
+from Shared.modelRegistry import registry
+from STTPhase.sttBackends import STT_MODEL_SIZE, make_backend
+
+# Engine, model size and compute type come from STT_BACKEND / STT_MODEL_SIZE /
+# STT_COMPUTE_TYPE (see sttBackends.py); the default is openai-whisper tiny
+MODEL_SIZE = STT_MODEL_SIZE
+WHISPER_SAMPLE_RATE = 16000
+
+# make_backend arguments set by the host process before the model loads
+_backend_options = {}
+
+# Loaded on first use (or by the server's startup preload), not at import
+registry.register("stt", lambda: make_backend(**_backend_options), lambda backend: backend.warmup())
+
+
+def set_num_workers(count):
+    """How many threads will call transcribeArray at once (e.g. the server's STT pool); set before the first use."""
+    _backend_options["num_workers"] = count
+
+
+def get_backend():
+    """The configured STT backend (shared by all threads)."""
+    return registry.get("stt")
+
+
+def get_model():
+    """Return the engine instance owned by the calling thread (loads a replica if the engine needs one)."""
+    return get_backend().model_for_thread()
+
+
+def __getattr__(name):
+    # Keeps `from STTPhase.wavWhisperSingleFile import model` working
+    if name == "model":
+        return get_backend().model
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def pcmToFloat(audio_bytes):
+    """Converts 16-bit little-endian PCM bytes to the float32 array Whisper consumes."""
+    return np.frombuffer(audio_bytes, dtype="<i2").astype(np.float32) / 32768.0
+
+def processAudio(filename, directory="recordedWavs", save_transcript=True):
     """
-    Transcribes the given WAV file using Whisper, saves the transcript as .txt in the same directory,
-    and returns the transcribed text.
+    Transcribes the given WAV file with the configured STT backend, saves the transcript as .txt in the same directory
+    (unless save_transcript is False), and returns the transcribed text.
     """
     wav_path = os.path.join(directory, filename)
     txt_path = os.path.join(directory, filename.replace('.wav', '.txt'))
@@ -17,14 +63,27 @@ def processAudio(filename, directory="recordedWavs"):
         with wave.open(wav_path, "rb") as wf:
             audio_bytes = wf.readframes(wf.getnframes())
             sample_rate = wf.getframerate()
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
     except wave.Error as e:
         print(f"ERROR: Could not load WAV file: {wav_path}. {e}")
         return None
 
-    # Transcribe using Whisper
+    # Reuse the frames we just read when they are already 16 kHz mono int16;
+    # otherwise let the STT engine resample the file through ffmpeg
+    if sample_rate == WHISPER_SAMPLE_RATE and channels == 1 and sample_width == 2:
+        audio = pcmToFloat(audio_bytes)
+    else:
+        audio = wav_path
+
+    # Transcribe using the configured backend
     print(f"  -> Transcribing {wav_path} ...")
-    result = model.transcribe(wav_path, language="English")
-    transcript_text = result["text"]
+    with stage_timer("transcribe"):
+        transcript_text = get_backend().transcribe(audio, language="English")
+    AUDIO_SECONDS.inc(len(audio_bytes) / (sample_width * channels * sample_rate))
+
+    if not save_transcript:
+        return transcript_text
 
     # Save transcript
     try:
@@ -36,6 +95,17 @@ def processAudio(filename, directory="recordedWavs"):
 
     return transcript_text
 
+def transcribeArray(audio, **options):
+    """
+    Transcribes a 16 kHz mono float32 numpy array in memory and returns the text.
+    Extra keyword options use openai-whisper's transcribe() names; the backend maps them.
+    """
+    options.setdefault("language", "English")
+    with stage_timer("transcribe"):
+        text = get_backend().transcribe(audio, **options)
+    AUDIO_SECONDS.inc(len(audio) / WHISPER_SAMPLE_RATE)
+    return text
+
 # Example usage
 if __name__ == "__main__":
     filename = "rec_1759564478.wav"
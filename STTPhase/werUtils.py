@@ -0,0 +1,73 @@
+import re
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[^\w\s']")
+
+
+def normalizeText(text):
+    """Lowercase, drop punctuation and collapse whitespace so WER compares words, not formatting."""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+def editDistance(ref, hyp):
+    """
+    Levenshtein distance between two token sequences.
+
+    Row-by-row DP with numpy: substitutions and deletions are vectorized against
+    the previous row, and the left-to-right insertion chain row[j] = min(row[j],
+    row[j-1] + 1) becomes a running minimum of (row[j] - j), so each row costs a
+    few array ops instead of a Python loop over the hypothesis.
+    """
+    if not ref:
+        return len(hyp)
+    if not hyp:
+        return len(ref)
+    vocab = {}
+    ref_ids = np.array([vocab.setdefault(t, len(vocab)) for t in ref])
+    hyp_ids = np.array([vocab.setdefault(t, len(vocab)) for t in hyp])
+
+    offsets = np.arange(len(hyp) + 1)
+    row = offsets.copy()
+    for i, token in enumerate(ref_ids, start=1):
+        candidate = np.empty_like(row)
+        candidate[0] = i
+        candidate[1:] = np.minimum(row[:-1] + (hyp_ids != token), row[1:] + 1)
+        row = np.minimum.accumulate(candidate - offsets) + offsets
+    return int(row[-1])
+
+
+def wordErrorRate(reference, hypothesis, normalize=True):
+    """Word error rate of hypothesis against reference (0.0 = identical)."""
+    if normalize:
+        reference, hypothesis = normalizeText(reference), normalizeText(hypothesis)
+    ref_words, hyp_words = reference.split(), hypothesis.split()
+    if not ref_words:
+        return 0.0 if not hyp_words else 1.0
+    return editDistance(ref_words, hyp_words) / len(ref_words)
+
+
+def charErrorRate(reference, hypothesis, normalize=True):
+    """Character error rate, ignoring spaces."""
+    if normalize:
+        reference, hypothesis = normalizeText(reference), normalizeText(hypothesis)
+    ref_chars, hyp_chars = list(reference.replace(" ", "")), list(hypothesis.replace(" ", ""))
+    if not ref_chars:
+        return 0.0 if not hyp_chars else 1.0
+    return editDistance(ref_chars, hyp_chars) / len(ref_chars)
+
+
+def corpusErrorRate(pairs, unit="word"):
+    """
+    Corpus-level WER/CER over (reference, hypothesis) pairs: total edits divided
+    by total reference length, so long utterances weigh more than short ones.
+    """
+    edits = total = 0
+    for reference, hypothesis in pairs:
+        reference, hypothesis = normalizeText(reference), normalizeText(hypothesis)
+        if unit == "word":
+            ref, hyp = reference.split(), hypothesis.split()
+        else:
+            ref, hyp = list(reference.replace(" ", "")), list(hypothesis.replace(" ", ""))
+        edits += editDistance(ref, hyp)
+        total += len(ref)
+    return edits / total if total else 0.0
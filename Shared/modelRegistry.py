@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Set MODEL_PRELOAD=0 to skip the startup preload and load each model on first use
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "1").lower() not in ("0", "false", "no")
+
+
+class ModelEntry:
+    """One registered model: how to load it, how to warm it up, and what happened when we did."""
+
+    def __init__(self, name, loader, warmup=None):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.value = None
+        self.state = "registered"  # registered -> loading -> warming -> ready | failed
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    def status(self):
+        return {
+            "state": self.state,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    """
+    Central place for the heavy models behind the pipeline (Whisper, the embedder,
+    the KB index, flan-t5). Modules register a loader instead of loading at import;
+    the model is built on the first get() or by load_all(), which loads every
+    registered model on its own thread so startup takes as long as the slowest one.
+    Each model runs its warm-up inference once before it is reported ready.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.preload_seconds = None  # wall time of the last load_all()
+        self._lock = threading.Lock()
+
+    def register(self, name, loader, warmup=None):
+        """Register loader() -> model and optional warmup(model); nothing is loaded yet."""
+        with self._lock:
+            if name not in self.entries:
+                self.entries[name] = ModelEntry(name, loader, warmup)
+            return self.entries[name]
+
+    def get(self, name):
+        """Return the named model, loading and warming it on first use (thread-safe)."""
+        entry = self.entries[name]
+        if entry.state == "ready":
+            return entry.value
+        with entry.lock:
+            if entry.state != "ready":
+                self._load(entry)
+        return entry.value
+
+    def _load(self, entry):
+        try:
+            entry.state, entry.error = "loading", None
+            start = time.perf_counter()
+            value = entry.loader()
+            entry.load_seconds = round(time.perf_counter() - start, 3)
+            if entry.warmup is not None:
+                entry.state = "warming"
+                start = time.perf_counter()
+                entry.warmup(value)
+                entry.warmup_seconds = round(time.perf_counter() - start, 3)
+            entry.value = value
+            entry.state = "ready"
+            warm = f", warm-up {entry.warmup_seconds}s" if entry.warmup_seconds is not None else ""
+            print(f"✅ Model '{entry.name}' ready (load {entry.load_seconds}s{warm})")
+        except Exception as e:
+            entry.state = "failed"
+            entry.error = f"{type(e).__name__}: {e}"
+            print(f"❌ Model '{entry.name}' failed to load: {entry.error}")
+            traceback.print_exc()
+            raise
+
+    def load_all(self, names=None):
+        """
+        Load and warm the given (default: all) models concurrently and block until
+        done. Models that depend on another one simply get() it and wait for it.
+        Returns True if every model is ready.
+        """
+        names = list(names or self.entries)
+        if not names:
+            return True
+
+        def load(name):
+            try:
+                self.get(name)
+            except Exception:
+                pass  # recorded on the entry and reported by status()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="model-load") as pool:
+            list(pool.map(load, names))
+        self.preload_seconds = round(time.perf_counter() - start, 3)
+        return self.ready()
+
+    def ready(self):
+        return all(entry.state == "ready" for entry in self.entries.values())
+
+    def status(self):
+        return {
+            "ready": self.ready(),
+            "preload_seconds": self.preload_seconds,
+            "models": {name: entry.status() for name, entry in self.entries.items()},
+        }
+
+
+registry = ModelRegistry()
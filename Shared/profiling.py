@@ -0,0 +1,89 @@
+"""cProfile hooks that pipeline code can use without depending on the web server.
+
+The server (server/profiling.py) decides which requests are profiled and
+stores each one's CallProfile in ``current_profile``. STT, RAG and TTS code
+only needs the hooks below: look up the current profile, run work on another
+thread under it, or pause it while waiting on that thread.
+
+    profile = current_profile.get()
+    if profile is not None:
+        with profile.paused():
+            result = future.result()
+
+Requests that are not profiled only pay one ContextVar lookup.
+"""
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# The profile of the request being handled, if it is profiled
+current_profile: ContextVar[Optional['CallProfile']] = ContextVar('current_profile', default=None)
+
+# cProfile can only be active once per thread (and, from Python 3.12, once per
+# interpreter), so overlapping profiled calls run unprofiled instead of failing
+_profiler_lock = threading.Lock()
+# The profiler the current thread is running under CallProfile.run (and holds the lock for), if any
+_active = threading.local()
+
+
+class CallProfile:
+    """cProfile stats and wall times collected across one request's calls."""
+
+    def __init__(self):
+        self.calls = []  # (stage, function, seconds, profiled)
+        self.stats = None
+        self._lock = threading.Lock()
+
+    def run(self, stage: str, fn, name: Optional[str] = None):
+        """Call fn() on the current (worker) thread under cProfile."""
+        name = name or getattr(getattr(fn, 'func', fn), '__qualname__', repr(fn))
+        profiler = cProfile.Profile()
+        profiled = _profiler_lock.acquire(blocking=False)
+        # Pool threads don't inherit the handler's context; set it so code called
+        # from fn (e.g. the generation batcher) can find this profile
+        token = current_profile.set(self)
+        _active.profiler = profiler if profiled else None
+        start = time.perf_counter()
+        try:
+            return profiler.runcall(fn) if profiled else fn()
+        finally:
+            elapsed = time.perf_counter() - start
+            # paused() may have had to give the slot up for the rest of the call
+            if getattr(_active, 'profiler', None) is not None:
+                _profiler_lock.release()
+            _active.profiler = None
+            current_profile.reset(token)
+            with self._lock:
+                self.calls.append((stage, name, elapsed, profiled))
+                if profiled:
+                    if self.stats is None:
+                        self.stats = pstats.Stats(profiler)
+                    else:
+                        self.stats.add(profiler)
+
+    @contextmanager
+    def paused(self):
+        """
+        Stop profiling the current thread while it waits on work done elsewhere.
+        The profiler slot is released so the thread doing that work (the
+        generation batcher) can profile it under this request instead. If another
+        profile has taken the slot by then, the rest of the call runs unprofiled
+        instead of waiting for that request to finish, as run() does.
+        """
+        profiler = getattr(_active, 'profiler', None)
+        if profiler is None:
+            yield
+            return
+        profiler.disable()
+        _profiler_lock.release()
+        try:
+            yield
+        finally:
+            if _profiler_lock.acquire(blocking=False):
+                profiler.enable()
+            else:
+                _active.profiler = None
@@ -1,60 +1,211 @@
 import os
-import requests
+import sys
 import json
+import time
+import argparse
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-load_dotenv()  # Loads variables from .env
+load_dotenv()  # Loads variables from .env (ELEVENLABS_API_KEY)
 
-# --- Load API key from config file ---
-api_key = os.getenv("ELEVENLABS_API_KEY")
-api_key = "sk_57ae3b6b247a6ca193723a5e3b0053957a7df45a0af19936"
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
-CONFIG_PATH = "config.json"
+from TTSPhase.ttsCache import cacheKey
+from TTSPhase.ttsClient import TTSRequestError, get_client
+
+CONFIG_PATH = os.path.join(CURRENT_DIR, "config.json")
 with open(CONFIG_PATH, "r") as f:
     config = json.load(f)
 
 voice_id = config["voice_id"]
-
-# --- Directories ---
-TEXT_INPUT_DIR = "sampleTexts"
-AUDIO_OUTPUT_DIR = "elevenAudio"
-os.makedirs(AUDIO_OUTPUT_DIR, exist_ok=True)
-
-# --- ElevenLabs API settings ---
-url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-headers = {
-    "xi-api-key": api_key,
-    "Content-Type": "application/json"
-}
 model_id = config.get("model_id", "eleven_monolingual_v1")
 voice_settings = config.get("voice_settings", {"stability": 0.75, "similarity_boost": 0.75})
 
-# --- Process each text file ---
-for filename in os.listdir(TEXT_INPUT_DIR):
-    if filename.endswith(".txt"):
-        text_path = os.path.join(TEXT_INPUT_DIR, filename)
-        with open(text_path, "r", encoding="utf-8") as f:
-            text_to_speak = f.read().strip()
-        if not text_to_speak:
-            print(f"⚠️ Skipping empty file: {filename}")
-            continue
+# --- Directories ---
+TEXT_INPUT_DIR = os.path.join(CURRENT_DIR, "sampleTexts")
+AUDIO_OUTPUT_DIR = os.path.join(CURRENT_DIR, "elevenAudio")
+MANIFEST_NAME = "manifest.jsonl"
+
+# --- Batch defaults (connection pool, deadlines and retries live in ttsClient) ---
+DEFAULT_CONCURRENCY = int(os.getenv("TTS_BATCH_CONCURRENCY", "8"))
+DEFAULT_CHARS_PER_MINUTE = int(os.getenv("TTS_CHARS_PER_MINUTE", "0"))  # 0 = no client-side limit
+
+
+class CharTokenBucket:
+    """
+    Token bucket metered in characters per minute, shared by all batch workers.
+    A text longer than the bucket may still go out once the bucket is full; it
+    simply leaves the balance negative so later requests wait for it to refill.
+    """
+
+    def __init__(self, chars_per_minute, burst=None):
+        self.rate = chars_per_minute / 60.0
+        self.capacity = burst or chars_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, chars):
+        need = min(chars, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= need:
+                    self.tokens -= chars
+                    return
+                wait = (need - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def textHash(text):
+    """Fingerprint of everything that changes the rendered audio."""
+    return cacheKey(text, voice_id, model_id, voice_settings)
+
+
+def loadManifest(manifest_path):
+    """Latest manifest record per input file."""
+    done = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from an interrupted run
+                done[record["file"]] = record
+    return done
 
+
+def synthesizeFile(client, bucket, filename, text, output_dir):
+    """Render one text file; returns a manifest record (never raises, so one bad file can't stop the batch)."""
+    start = time.monotonic()
+    record = {"file": filename, "hash": textHash(text), "chars": len(text)}
+    try:
+        if bucket is not None:
+            bucket.acquire(len(text))
         data = {
-            "text": text_to_speak,
+            "text": text,
             "model_id": model_id,
             "voice_settings": voice_settings
         }
-
-        print(f"🔊 Generating audio for: {filename}")
-        response = requests.post(url, headers=headers, json=data)
+        audio_bytes = client.synthesize(voice_id, data)
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         audio_filename = f"{os.path.splitext(filename)[0]}_{timestamp}.mp3"
-        audio_path = os.path.join(AUDIO_OUTPUT_DIR, audio_filename)
-
-        if response.status_code == 200:
-            with open(audio_path, "wb") as audio_file:
-                audio_file.write(response.content)
-            print(f"✅ Saved: {audio_path}")
-        else:
-            print(f"❌ Failed for {filename}: {response.status_code} {response.text}")
\ No newline at end of file
+        audio_path = os.path.join(output_dir, audio_filename)
+        tmp_path = audio_path + ".part"
+        with open(tmp_path, "wb") as audio_file:
+            audio_file.write(audio_bytes)
+        os.replace(tmp_path, audio_path)
+    except TTSRequestError as e:
+        record.update(status="error", error=f"{e.status_code} {e.body or e}", seconds=time.monotonic() - start)
+        return record
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}", seconds=time.monotonic() - start)
+        return record
+    record.update(status="ok", output=audio_filename, bytes=len(audio_bytes), seconds=time.monotonic() - start)
+    return record
+
+
+def run_batch(input_dir=TEXT_INPUT_DIR, output_dir=AUDIO_OUTPUT_DIR, concurrency=DEFAULT_CONCURRENCY,
+              chars_per_minute=DEFAULT_CHARS_PER_MINUTE, manifest_path=None, client=None):
+    """
+    Synthesize every .txt in input_dir with bounded concurrency. Progress is appended
+    to a JSONL manifest, so rerunning skips files whose text/voice/model are unchanged
+    and whose audio is still present. Returns a throughput report dict.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+    client = client or get_client()
+    bucket = CharTokenBucket(chars_per_minute) if chars_per_minute else None
+    previous = loadManifest(manifest_path)
+
+    jobs, skipped, empty = [], 0, 0
+    for filename in sorted(os.listdir(input_dir)):
+        if not filename.endswith(".txt"):
+            continue
+        with open(os.path.join(input_dir, filename), "r", encoding="utf-8") as f:
+            text_to_speak = f.read().strip()
+        if not text_to_speak:
+            print(f"⚠️ Skipping empty file: {filename}")
+            empty += 1
+            continue
+        record = previous.get(filename)
+        if (record and record.get("status") == "ok" and record.get("hash") == textHash(text_to_speak)
+                and os.path.exists(os.path.join(output_dir, record["output"]))):
+            skipped += 1
+            continue
+        jobs.append((filename, text_to_speak))
+
+    print(f"🔊 {len(jobs)} files to synthesize ({skipped} already done) with concurrency {concurrency}")
+    start = time.monotonic()
+    ok, failed, chars, audio_bytes, latencies = 0, 0, 0, 0, []
+    manifest_lock = threading.Lock()
+    with open(manifest_path, "a", encoding="utf-8") as manifest, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="tts-batch") as pool:
+        futures = [pool.submit(synthesizeFile, client, bucket, filename, text, output_dir)
+                   for filename, text in jobs]
+        for future in as_completed(futures):
+            record = future.result()
+            try:
+                with manifest_lock:
+                    manifest.write(json.dumps(record) + "\n")
+                    manifest.flush()
+            except OSError as e:
+                # The file is redone on the next run instead of aborting this one
+                print(f"⚠️ Could not record {record['file']} in the manifest: {e}")
+            latencies.append(record["seconds"])
+            if record["status"] == "ok":
+                ok += 1
+                chars += record["chars"]
+                audio_bytes += record["bytes"]
+                print(f"✅ Saved: {record['output']}")
+            else:
+                failed += 1
+                print(f"❌ Failed for {record['file']}: {record['error']}")
+
+    elapsed = time.monotonic() - start
+    latencies.sort()
+    report = {
+        "synthesized": ok,
+        "failed": failed,
+        "skipped": skipped,
+        "empty": empty,
+        "elapsed_s": elapsed,
+        "files_per_s": ok / elapsed if elapsed else 0.0,
+        "chars_per_min": chars * 60 / elapsed if elapsed else 0.0,
+        "audio_bytes": audio_bytes,
+        "latency_p50_s": latencies[len(latencies) // 2] if latencies else None,
+        "latency_p95_s": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+        "manifest": manifest_path,
+    }
+    print("\n--- Batch Report ---")
+    print(f"Synthesized: {ok}  Failed: {failed}  Skipped: {skipped}")
+    print(f"Elapsed: {elapsed:.1f}s  Files/s: {report['files_per_s']:.2f}  Chars/min: {report['chars_per_min']:.0f}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-synthesize a directory of text prompts with ElevenLabs")
+    parser.add_argument("--input-dir", default=TEXT_INPUT_DIR)
+    parser.add_argument("--output-dir", default=AUDIO_OUTPUT_DIR)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--chars-per-minute", type=int, default=DEFAULT_CHARS_PER_MINUTE,
+                        help="Client-side rate limit in characters/minute (0 disables)")
+    parser.add_argument("--manifest", help="Manifest path (default: <output-dir>/manifest.jsonl)")
+    parser.add_argument("--report", help="Also write the throughput report as JSON")
+    args = parser.parse_args()
+
+    report = run_batch(args.input_dir, args.output_dir, args.concurrency, args.chars_per_minute, args.manifest)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
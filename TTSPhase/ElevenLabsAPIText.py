@@ -1,16 +1,25 @@
 import os
-import requests
+import sys
 import json
 import time
+import queue
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load .env from project root to avoid CWD issues when run from subdirectories
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(dotenv_path=CURRENT_DIR, override=False)
 
-api_key = os.getenv("ELEVENLABS_API_KEY")
+project_root = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
-# --- Load API key and config ---
+from TTSPhase.ttsCache import AudioCache, cacheKey
+from TTSPhase.ttsClient import TTSRequestError, get_client, get_async_client
+from Shared.metrics import record_cache_lookup, stage_timer
+
+# --- Load config (the API key and ELEVENLABS_BASE_URL are read by ttsClient) ---
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.json")
 with open(CONFIG_PATH, "r") as f:
     config = json.load(f)
@@ -18,34 +27,219 @@ voice_id = config["voice_id"]
 model_id = config.get("model_id", "eleven_monolingual_v1")
 voice_settings = config.get("voice_settings", {"stability": 0.75, "similarity_boost": 0.75})
 
+# --- Content-addressed audio cache (set TTS_CACHE=0 to disable) ---
+audio_cache = None
+if os.getenv("TTS_CACHE", "1").lower() not in ("0", "false", "no"):
+    audio_cache = AudioCache(
+        os.getenv("TTS_CACHE_DIR", os.path.join(CURRENT_DIR, "ttsCache")),
+        max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    )
+
+def _payload(text_to_speak):
+    return {
+        "text": text_to_speak,
+        "model_id": model_id,
+        "voice_settings": voice_settings
+    }
+
+def _cache_key(text_to_speak, use_cache):
+    if use_cache and audio_cache is not None:
+        return cacheKey(text_to_speak, voice_id, model_id, voice_settings)
+    return None
+
+def _cache_get(key):
+    cached = audio_cache.get(key)
+    record_cache_lookup("tts_audio", cached is not None)
+    return cached
+
+def _chunks(data, chunk_size):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+def synthesizeText(text_to_speak, use_cache=True):
+    """
+    Generate audio from text using ElevenLabs API and return the mp3 bytes without touching disk.
+    Identical text/voice/model/settings are served from the audio cache without a network call.
+    Returns None if the request fails.
+    """
+    key = _cache_key(text_to_speak, use_cache)
+    if key is not None:
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+    try:
+        with stage_timer("tts"):
+            audio_bytes = get_client().synthesize(voice_id, _payload(text_to_speak))
+    except TTSRequestError as e:
+        print("❌ Failed to generate audio")
+        print(e.status_code, e.body or e)
+        return None
+    if key is not None:
+        audio_cache.put(key, audio_bytes)
+    return audio_bytes
+
+def streamText(text_to_speak, chunk_size=4096, use_cache=True):
+    """
+    Generate audio with the ElevenLabs streaming endpoint and yield mp3 chunks as they arrive,
+    so playback can start on the first chunk. A complete stream is stored in the audio cache;
+    cache hits are yielded straight from disk.
+    """
+    key = _cache_key(text_to_speak, use_cache)
+    if key is not None:
+        cached = _cache_get(key)
+        if cached is not None:
+            yield from _chunks(cached, chunk_size)
+            return
+    received = []
+    try:
+        for chunk in get_client().stream(voice_id, _payload(text_to_speak), chunk_size=chunk_size):
+            received.append(chunk)
+            yield chunk
+    except TTSRequestError as e:
+        print("❌ Failed to stream audio")
+        print(e.status_code, e.body or e)
+        return
+    if key is not None:
+        audio_cache.put(key, b"".join(received))
+
+async def synthesizeTextAsync(text_to_speak, use_cache=True):
+    """
+    asyncio version of synthesizeText for FastAPI handlers; uses the pooled httpx client.
+    """
+    key = _cache_key(text_to_speak, use_cache)
+    if key is not None:
+        cached = await asyncio.to_thread(_cache_get, key)
+        if cached is not None:
+            return cached
+    try:
+        with stage_timer("tts"):
+            audio_bytes = await get_async_client().synthesize(voice_id, _payload(text_to_speak))
+    except TTSRequestError as e:
+        print("❌ Failed to generate audio")
+        print(e.status_code, e.body or e)
+        return None
+    if key is not None:
+        await asyncio.to_thread(audio_cache.put, key, audio_bytes)
+    return audio_bytes
+
+async def streamTextAsync(text_to_speak, chunk_size=4096, use_cache=True):
+    """
+    asyncio version of streamText: yields mp3 chunks without holding a worker thread.
+    """
+    key = _cache_key(text_to_speak, use_cache)
+    if key is not None:
+        cached = await asyncio.to_thread(_cache_get, key)
+        if cached is not None:
+            for chunk in _chunks(cached, chunk_size):
+                yield chunk
+            return
+    received = []
+    try:
+        async for chunk in get_async_client().stream(voice_id, _payload(text_to_speak), chunk_size=chunk_size):
+            received.append(chunk)
+            yield chunk
+    except TTSRequestError as e:
+        print("❌ Failed to stream audio")
+        print(e.status_code, e.body or e)
+        return
+    if key is not None:
+        await asyncio.to_thread(audio_cache.put, key, b"".join(received))
+
+def synthesizeSentences(sentences, max_in_flight=2, use_cache=True):
+    """
+    Synthesize sentences as they arrive from an iterator (e.g. a streaming answer) and yield
+    (sentence, mp3 bytes) in order. The iterator is drained on a helper thread and each
+    sentence's TTS call starts as soon as it is produced, so synthesis overlaps generation
+    of the next sentence. mp3 bytes are None for failed sentences.
+    """
+    ready = queue.Queue()
+    done = object()
+
+    def produce(pool):
+        try:
+            for sentence in sentences:
+                ready.put((sentence, pool.submit(synthesizeText, sentence, use_cache)))
+        except Exception as e:
+            ready.put((done, e))
+        else:
+            ready.put((done, None))
+
+    with ThreadPoolExecutor(max_workers=max_in_flight + 1, thread_name_prefix="tts-sentence") as pool:
+        pool.submit(produce, pool)
+        while True:
+            sentence, future = ready.get()
+            if sentence is done:
+                if future is not None:
+                    raise future
+                return
+            yield sentence, future.result()
+
+async def synthesizeSentencesAsync(sentences, use_cache=True):
+    """
+    asyncio version of synthesizeSentences for an async iterator of sentences: every sentence
+    gets its own TTS task the moment it arrives, and (sentence, mp3 bytes) pairs are yielded
+    in order as soon as each is ready.
+    """
+    ready = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for sentence in sentences:
+                ready.put_nowait((sentence, asyncio.create_task(synthesizeTextAsync(sentence, use_cache))))
+        finally:
+            ready.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (item := await ready.get()) is not None:
+            sentence, task = item
+            yield sentence, await task
+        await producer  # surfaces errors from the sentence source
+    finally:
+        producer.cancel()
+        while not ready.empty():
+            item = ready.get_nowait()
+            if item is not None:
+                item[1].cancel()
+
+def genAudioSentences(sentences, filename="output", directory="elevenAudio"):
+    """
+    Like genAudioText, but for an iterator of sentences: TTS overlaps with whatever produces
+    the sentences, and the per-sentence mp3s (plain frame streams) are stitched in order.
+    Returns (path, answer_text).
+    """
+    os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    spoken, parts = [], []
+    for sentence, audio_bytes in synthesizeSentences(sentences):
+        spoken.append(sentence)
+        if audio_bytes:
+            if not parts:
+                print(f"🔊 First audio after {time.perf_counter() - start:.2f}s: {sentence}")
+            parts.append(audio_bytes)
+    if not parts:
+        return None, " ".join(spoken)
+    output_path = os.path.join(directory, f"{filename}Eleven.mp3")
+    with open(output_path, "wb") as f:
+        f.write(b"".join(parts))
+    print(f"✅ Audio file saved as {output_path}")
+    return output_path, " ".join(spoken)
+
 def genAudioText(text_to_speak, filename="output", directory="elevenAudio"):
     """
     Generate audio from text using ElevenLabs API, save as filenameEleven.mp3 in the specified directory.
     Returns the full path to the saved audio file.
     """
     os.makedirs(directory, exist_ok=True)
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-    headers = {
-        "xi-api-key": api_key,
-        "Content-Type": "application/json"
-    }
-    data = {
-        "text": text_to_speak,
-        "model_id": model_id,
-        "voice_settings": voice_settings
-    }
-    response = requests.post(url, headers=headers, json=data)
+    audio_bytes = synthesizeText(text_to_speak)
+    if audio_bytes is None:
+        return None
     output_filename = f"{filename}Eleven.mp3"
     output_path = os.path.join(directory, output_filename)
-    if response.status_code == 200:
-        with open(output_path, "wb") as f:
-            f.write(response.content)
-        print(f"✅ Audio file saved as {output_path}")
-        return output_path
-    else:
-        print("❌ Failed to generate audio")
-        print(response.status_code, response.text)
-        return None
+    with open(output_path, "wb") as f:
+        f.write(audio_bytes)
+    print(f"✅ Audio file saved as {output_path}")
+    return output_path
 
 # Example usage
 if __name__ == "__main__":
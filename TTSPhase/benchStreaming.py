@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from TTSPhase.fakeElevenServer import start_server
+
+TEXT_INPUT_DIR = os.path.join(CURRENT_DIR, "sampleTexts")
+
+
+def load_texts(directory):
+    texts = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".txt"):
+            with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+                text = f.read().strip()
+            if text:
+                texts.append(text)
+    return texts
+
+
+def time_full(tts, text):
+    """Time-to-first-audio equals total time: nothing is playable until the body arrives."""
+    start = time.perf_counter()
+    audio = tts.synthesizeText(text, use_cache=False)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed, len(audio or b"")
+
+
+def time_streaming(tts, text):
+    start = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in tts.streamText(text, use_cache=False):
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    return first if first is not None else float("nan"), time.perf_counter() - start, size
+
+
+def summarize(samples):
+    return {
+        "p50": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "max": max(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare time-to-first-audio of full vs streaming TTS")
+    parser.add_argument("--base-url", help="Use a running API (default: start a local fake server)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--first-byte-ms", type=float, default=350)
+    parser.add_argument("--realtime-factor", type=float, default=0.25)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = start_server(first_byte_ms=args.first_byte_ms, realtime_factor=args.realtime_factor)
+    # The shared TTS client reads its endpoint when it is first created
+    os.environ["ELEVENLABS_BASE_URL"] = base_url
+    from TTSPhase import ElevenLabsAPIText as tts
+
+    texts = load_texts(TEXT_INPUT_DIR)
+    results = {}
+    try:
+        for mode, fn in (("full", time_full), ("streaming", time_streaming)):
+            first, total = [], []
+            for _ in range(args.repeats):
+                for text in texts:
+                    ttfa, elapsed, _ = fn(tts, text)
+                    first.append(ttfa)
+                    total.append(elapsed)
+            results[mode] = {"time_to_first_audio_s": summarize(first), "total_s": summarize(total)}
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print(f"{'mode':<10} {'TTFA p50':>10} {'TTFA max':>10} {'total p50':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<10} {r['time_to_first_audio_s']['p50']:>10.3f} "
+              f"{r['time_to_first_audio_s']['max']:>10.3f} {r['total_s']['p50']:>10.3f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"base_url": base_url, "texts": len(texts), "repeats": args.repeats, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
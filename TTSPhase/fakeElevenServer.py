@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# One silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, mono, no padding.
+# 417 bytes that decode to 1152 samples (~26 ms), so the fake audio is playable.
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0xC4])
+FRAME = FRAME_HEADER + bytes(417 - len(FRAME_HEADER))
+FRAME_SECONDS = 1152 / 44100
+
+# Rough latency model for a hosted TTS API; override per instance.
+DEFAULT_FIRST_BYTE_MS = 350     # request accepted -> first audio ready
+DEFAULT_REALTIME_FACTOR = 0.25  # seconds of generation per second of audio
+DEFAULT_SPEECH_CHARS_PER_SEC = 15
+DEFAULT_FRAMES_PER_CHUNK = 10
+
+
+class FakeElevenHandler(BaseHTTPRequestHandler):
+    """
+    Mimics POST /v1/text-to-speech/{voice_id} and /v1/text-to-speech/{voice_id}/stream.
+    The streaming route sends chunked audio paced by the latency model; the plain
+    route waits for the whole clip to be "generated" before answering.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_text(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        return body.get("text", "")
+
+    def _frame_count(self, text):
+        audio_seconds = max(len(text), 1) / self.server.speech_chars_per_sec
+        return max(1, int(audio_seconds / FRAME_SECONDS))
+
+    def do_POST(self):
+        parts = self.path.rstrip("/").split("/")
+        if len(parts) < 4 or parts[1:3] != ["v1", "text-to-speech"]:
+            self.send_error(404)
+            return
+        if self.server.fail_status:
+            self.send_error(self.server.fail_status)
+            return
+        streaming = parts[-1] == "stream"
+        frames = self._frame_count(self._read_text())
+        seconds_per_frame = FRAME_SECONDS * self.server.realtime_factor
+
+        time.sleep(self.server.first_byte_ms / 1000.0)
+        if not streaming:
+            time.sleep(frames * seconds_per_frame)
+            payload = FRAME * frames
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/mpeg")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = 0
+        while sent < frames:
+            n = min(self.server.frames_per_chunk, frames - sent)
+            chunk = FRAME * n
+            self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+            self.wfile.flush()
+            sent += n
+            if sent < frames:
+                time.sleep(n * seconds_per_frame)
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_server(port=0, first_byte_ms=DEFAULT_FIRST_BYTE_MS, realtime_factor=DEFAULT_REALTIME_FACTOR,
+                 speech_chars_per_sec=DEFAULT_SPEECH_CHARS_PER_SEC, frames_per_chunk=DEFAULT_FRAMES_PER_CHUNK,
+                 fail_status=None, verbose=False):
+    """
+    Start the fake API on a background thread. Returns (server, base_url);
+    call server.shutdown() when done. port=0 picks a free port.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeElevenHandler)
+    server.daemon_threads = True
+    server.first_byte_ms = first_byte_ms
+    server.realtime_factor = realtime_factor
+    server.speech_chars_per_sec = speech_chars_per_sec
+    server.frames_per_chunk = frames_per_chunk
+    server.fail_status = fail_status
+    server.verbose = verbose
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the ElevenLabs text-to-speech API")
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_ELEVEN_PORT", "8765")))
+    parser.add_argument("--first-byte-ms", type=float, default=DEFAULT_FIRST_BYTE_MS)
+    parser.add_argument("--realtime-factor", type=float, default=DEFAULT_REALTIME_FACTOR)
+    parser.add_argument("--frames-per-chunk", type=int, default=DEFAULT_FRAMES_PER_CHUNK)
+    args = parser.parse_args()
+
+    server, base_url = start_server(
+        port=args.port,
+        first_byte_ms=args.first_byte_ms,
+        realtime_factor=args.realtime_factor,
+        frames_per_chunk=args.frames_per_chunk,
+        verbose=True,
+    )
+    print(f"Fake ElevenLabs API listening on {base_url} (set ELEVENLABS_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
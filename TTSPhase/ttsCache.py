@@ -0,0 +1,162 @@
+import os
+import json
+import fcntl
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+def cacheKey(text, voice_id, model_id, voice_settings):
+    """
+    Content address for a synthesized clip: everything that changes the audio goes into the hash.
+    """
+    payload = json.dumps(
+        {"text": text, "voice_id": voice_id, "model_id": model_id, "voice_settings": voice_settings},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Size-bounded on-disk mp3 store shared by every worker on the host.
+
+    Files live at <directory>/<key[:2]>/<key>.mp3 and are written to a temp file
+    then renamed into place, so readers never see partial audio. A hit bumps the
+    file's mtime, and eviction removes the least recently used files (oldest
+    mtime) until the store is back below its budget.
+
+    The store's total size is kept in <directory>/.size and only changed under
+    an flock on <directory>/.lock, so every worker process evicts against the
+    same figure instead of a count of its own writes.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, ".lock")
+        self._size_path = os.path.join(directory, ".size")
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def _scan(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".mp3"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive flock shared by every process using this directory."""
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_total(self):
+        """Shared size total (call under _locked); rebuilt from a scan if missing or torn."""
+        try:
+            with open(self._size_path, "r") as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return sum(size for _, size, _ in self._scan())
+
+    def _write_total(self, total):
+        with open(self._size_path, "w") as f:
+            f.write(str(max(0, total)))
+
+    def get(self, key):
+        """Return cached mp3 bytes or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._counter_lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            pass
+        with self._counter_lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Atomically store mp3 bytes under key."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            with self._locked():
+                total = self._read_total()
+                # Replacing a key frees the old file's bytes
+                try:
+                    replaced = os.path.getsize(path)
+                except FileNotFoundError:
+                    replaced = 0
+                os.replace(tmp_path, path)
+                total += len(data) - replaced
+                if total > self.max_bytes:
+                    total = self._evict_locked()
+                self._write_total(total)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def evict(self):
+        """Delete least recently used files until the store is under 90% of its budget."""
+        with self._locked():
+            self._write_total(self._evict_locked())
+
+    def _evict_locked(self):
+        # A full scan, so the total also picks up files added or removed outside the cache
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def stats(self):
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        with self._locked():
+            total = self._read_total()
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "approx_bytes": total,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,382 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Defaults (overridable through the environment) ---
+DEFAULT_BASE_URL = "https://api.elevenlabs.io"
+DEFAULT_DEADLINE = float(os.getenv("TTS_DEADLINE", "20"))         # seconds for a whole call, retries included
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("TTS_CONNECT_TIMEOUT", "3.05"))
+DEFAULT_RETRIES = int(os.getenv("TTS_RETRIES", "3"))
+DEFAULT_POOL_SIZE = int(os.getenv("TTS_POOL_SIZE", "16"))
+# Hedging is off unless a percentile is given, e.g. TTS_HEDGE_PERCENTILE=0.95
+DEFAULT_HEDGE_PERCENTILE = float(os.getenv("TTS_HEDGE_PERCENTILE", "0") or 0)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Reads block until a whole chunk has arrived, so this also bounds how late the
+# deadline and hedge-cancel checks between chunks can fire (~0.5 s of 128 kbps mp3)
+BODY_CHUNK_SIZE = 8192
+
+
+class TTSRequestError(Exception):
+    """Raised when ElevenLabs returns an error or the deadline runs out."""
+
+    def __init__(self, message, status_code=None, body=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies, used to decide when to hedge."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q):
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def backoff_delay(attempt, base=0.25, cap=4.0, retry_after=None):
+    """Full-jitter exponential backoff; a Retry-After header sets the floor."""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return delay
+
+
+class _ClientConfig:
+    def __init__(self, api_key, base_url, deadline, connect_timeout, retries, pool_size, hedge_percentile):
+        self.api_key = api_key
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self.hedge_percentile = hedge_percentile
+        # Kept apart: hedging compares a full synthesis against full syntheses,
+        # while stream() only measures time to the first byte
+        self.latency = LatencyTracker()
+        self.first_byte_latency = LatencyTracker()
+
+    def url(self, voice_id, stream):
+        return f"{self.base_url}/v1/text-to-speech/{voice_id}" + ("/stream" if stream else "")
+
+    def headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["xi-api-key"] = self.api_key
+        return headers
+
+    def hedge_after(self):
+        if not self.hedge_percentile:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+
+class ElevenLabsClient(_ClientConfig):
+    """
+    Blocking ElevenLabs client shared by the TTS scripts: one keep-alive connection
+    pool, a deadline per call, jittered retries on 429/5xx, and optional hedging.
+    """
+
+    def __init__(self, api_key=None, base_url=None, deadline=DEFAULT_DEADLINE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 pool_size=DEFAULT_POOL_SIZE, hedge_percentile=DEFAULT_HEDGE_PERCENTILE):
+        super().__init__(api_key, base_url, deadline, connect_timeout, retries, pool_size, hedge_percentile)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="tts-hedge")
+
+    def _send(self, voice_id, payload, stream, deadline_at, cancelled=None):
+        """POST with retries until success or the deadline; returns the open response."""
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise TTSRequestError("TTS deadline exceeded")
+            if cancelled is not None and cancelled.is_set():
+                raise TTSRequestError("TTS hedged request cancelled")
+            try:
+                # Always streamed: the body is read by _iter_body, which holds it to the deadline
+                response = self.session.post(
+                    self.url(voice_id, stream),
+                    headers=self.headers(),
+                    json=payload,
+                    stream=True,
+                    timeout=(min(self.connect_timeout, remaining), remaining),
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries:
+                    raise TTSRequestError(f"TTS request failed: {e}") from e
+                retry_after = None
+            else:
+                if response.status_code == 200:
+                    return response
+                body = response.text
+                response.close()
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    raise TTSRequestError(f"TTS request failed with {response.status_code}",
+                                          response.status_code, body)
+                retry_after = response.headers.get("Retry-After")
+            delay = backoff_delay(attempt, retry_after=retry_after)
+            if time.monotonic() + delay >= deadline_at:
+                raise TTSRequestError("TTS deadline exceeded while backing off")
+            time.sleep(delay)
+            attempt += 1
+
+    def _iter_body(self, response, chunk_size, deadline_at, cancelled=None):
+        """
+        Yield the body, failing with TTSRequestError once the call's deadline passes
+        or the cancelled event is set (a hedge that lost). The socket timeout only
+        bounds each read, so a slowly dripping body would otherwise run past it;
+        transport errors mid-body are wrapped too. The response is closed either way.
+        """
+        with response:
+            try:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if time.monotonic() > deadline_at:
+                        raise TTSRequestError("TTS deadline exceeded while reading the audio")
+                    if cancelled is not None and cancelled.is_set():
+                        raise TTSRequestError("TTS hedged request cancelled")
+                    if chunk:
+                        yield chunk
+            except requests.RequestException as e:
+                raise TTSRequestError(f"TTS response failed: {e}") from e
+
+    def _synthesize_once(self, voice_id, payload, deadline_at, cancelled=None):
+        start = time.monotonic()
+        response = self._send(voice_id, payload, False, deadline_at, cancelled)
+        content = b"".join(self._iter_body(response, BODY_CHUNK_SIZE, deadline_at, cancelled))
+        self.latency.record(time.monotonic() - start)
+        return content
+
+    def synthesize(self, voice_id, payload, deadline=None):
+        """Return the full mp3 for payload. Raises TTSRequestError on failure."""
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        hedge_after = self.hedge_after()
+        if hedge_after is None:
+            return self._synthesize_once(voice_id, payload, deadline_at)
+
+        # Hedged: if the first request is slower than the tracked percentile,
+        # fire a second one and take whichever succeeds first.
+        # The loser is told to stop through `cancelled` and closes its own response
+        # at its next chunk: closing it from here would block on the loser's read.
+        cancelled = threading.Event()
+        futures = [self._hedge_pool.submit(self._synthesize_once, voice_id, payload, deadline_at, cancelled)]
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            futures.append(self._hedge_pool.submit(self._synthesize_once, voice_id, payload, deadline_at, cancelled))
+        pending = set(futures)
+        error = None
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline_at - time.monotonic()),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+            raise error or TTSRequestError("TTS deadline exceeded")
+        finally:
+            # Free the loser's pooled connection and hedge thread instead of reading its body to the end
+            cancelled.set()
+
+    def stream(self, voice_id, payload, chunk_size=4096, deadline=None):
+        """Yield mp3 chunks from the streaming endpoint (retries only before the first byte)."""
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        start = time.monotonic()
+        response = self._send(voice_id, payload, True, deadline_at)
+        first = True
+        for chunk in self._iter_body(response, chunk_size, deadline_at):
+            if first:
+                self.first_byte_latency.record(time.monotonic() - start)
+                first = False
+            yield chunk
+
+    def close(self):
+        self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+
+
+class AsyncElevenLabsClient(_ClientConfig):
+    """
+    asyncio counterpart of ElevenLabsClient built on httpx, for use inside FastAPI
+    handlers without tying up a worker thread per TTS call.
+    """
+
+    def __init__(self, api_key=None, base_url=None, deadline=DEFAULT_DEADLINE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 pool_size=DEFAULT_POOL_SIZE, hedge_percentile=DEFAULT_HEDGE_PERCENTILE):
+        import httpx
+        super().__init__(api_key, base_url, deadline, connect_timeout, retries, pool_size, hedge_percentile)
+        self._httpx = httpx
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(deadline, connect=connect_timeout),
+        )
+
+    async def _send(self, voice_id, payload, stream, deadline_at):
+        httpx = self._httpx
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise TTSRequestError("TTS deadline exceeded")
+            request = self.client.build_request(
+                "POST", self.url(voice_id, stream), headers=self.headers(), json=payload,
+                timeout=httpx.Timeout(remaining, connect=min(self.connect_timeout, remaining)),
+            )
+            try:
+                response = await self.client.send(request, stream=stream)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                if attempt >= self.retries:
+                    raise TTSRequestError(f"TTS request failed: {e}") from e
+                retry_after = None
+            else:
+                if response.status_code == 200:
+                    return response
+                body = (await response.aread()).decode("utf-8", "replace")
+                await response.aclose()
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    raise TTSRequestError(f"TTS request failed with {response.status_code}",
+                                          response.status_code, body)
+                retry_after = response.headers.get("Retry-After")
+            delay = backoff_delay(attempt, retry_after=retry_after)
+            if time.monotonic() + delay >= deadline_at:
+                raise TTSRequestError("TTS deadline exceeded while backing off")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _iter_body(self, response, chunk_size, deadline_at):
+        """Yield the body; each read waits at most until the deadline, and transport errors become TTSRequestError."""
+        chunks = response.aiter_bytes(chunk_size)
+        try:
+            while True:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise TTSRequestError("TTS deadline exceeded while reading the audio")
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError as e:
+                    raise TTSRequestError("TTS deadline exceeded while reading the audio") from e
+                except self._httpx.HTTPError as e:
+                    raise TTSRequestError(f"TTS response failed: {e}") from e
+                if chunk:
+                    yield chunk
+        finally:
+            await response.aclose()
+
+    async def _synthesize_once(self, voice_id, payload, deadline_at):
+        start = time.monotonic()
+        # Streamed so the body read is held to the deadline as well
+        response = await self._send(voice_id, payload, True, deadline_at)
+        content = b"".join([chunk async for chunk in self._iter_body(response, BODY_CHUNK_SIZE, deadline_at)])
+        self.latency.record(time.monotonic() - start)
+        return content
+
+    async def synthesize(self, voice_id, payload, deadline=None):
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        hedge_after = self.hedge_after()
+        if hedge_after is None:
+            return await self._synthesize_once(voice_id, payload, deadline_at)
+
+        tasks = [asyncio.create_task(self._synthesize_once(voice_id, payload, deadline_at))]
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            tasks.append(asyncio.create_task(self._synthesize_once(voice_id, payload, deadline_at)))
+        pending = set(tasks)
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline_at - time.monotonic()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error or TTSRequestError("TTS deadline exceeded")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(self, voice_id, payload, chunk_size=4096, deadline=None):
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        start = time.monotonic()
+        response = await self._send(voice_id, payload, True, deadline_at)
+        first = True
+        async for chunk in self._iter_body(response, chunk_size, deadline_at):
+            if first:
+                self.first_byte_latency.record(time.monotonic() - start)
+                first = False
+            yield chunk
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# --- Shared instances ---
+_client = None
+_client_lock = threading.Lock()
+_async_clients = {}
+
+
+def _default_settings():
+    return {
+        "api_key": os.getenv("ELEVENLABS_API_KEY"),
+        "base_url": os.getenv("ELEVENLABS_BASE_URL", DEFAULT_BASE_URL),
+    }
+
+
+def get_client():
+    """Process-wide blocking client, so every caller reuses the same connection pool."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ElevenLabsClient(**_default_settings())
+        return _client
+
+
+def get_async_client():
+    """Async client bound to the running event loop (httpx clients can't cross loops)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncElevenLabsClient(**_default_settings())
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
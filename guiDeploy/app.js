@@ -12,11 +12,15 @@ const transcriptEl = document.getElementById('transcript');
 const answerEl = document.getElementById('answer');
 const player = document.getElementById('player');
 const timerEl = document.getElementById('timer');
+const streamToggle = document.getElementById('streamToggle');
+const timingsEl = document.getElementById('timings');
 
 let mediaRecorder;
 let recordedChunks = [];
 let timerInterval;
 let seconds = 0;
+let socket;
+let audioQueue = [];
 
 function setStatus(text) {
   statusEl.textContent = text;
@@ -38,9 +42,92 @@ function startTimer() {
   }, 1000);
 }
 
+function playAudioUrl(url) {
+  // In-memory mode returns a data: URL; archival mode returns '/audio/...'
+  player.src = url.startsWith('/') ? `${API_BASE}${url}` : url;
+  player.play().catch(() => {});
+}
+
+// Sentence clips from /process/stream play back to back in the order they arrive
+function enqueueAudioUrl(url) {
+  audioQueue.push(url.startsWith('/') ? `${API_BASE}${url}` : url);
+  if (player.paused || player.ended) playNextClip();
+}
+
+function playNextClip() {
+  const next = audioQueue.shift();
+  if (!next) return;
+  player.src = next;
+  player.play().catch(() => {});
+}
+
+player.addEventListener('ended', playNextClip);
+
+function renderTimings(timings) {
+  timingsEl.textContent = Object.entries(timings)
+    .map(([stage, seconds]) => `${stage} ${seconds.toFixed(2)}s`)
+    .join(' · ');
+}
+
+function openConverseSocket() {
+  // Streams MediaRecorder fragments to /ws/converse so STT runs while the user talks
+  return new Promise((resolve, reject) => {
+    const ws = new WebSocket(`${API_BASE.replace(/^http/, 'ws')}/ws/converse`);
+    ws.binaryType = 'arraybuffer';
+    ws.onopen = () => {
+      ws.send(JSON.stringify({ type: 'start', format: 'webm' }));
+      resolve(ws);
+    };
+    ws.onerror = (e) => reject(e);
+    ws.onmessage = (event) => {
+      const msg = JSON.parse(event.data);
+      if (msg.type === 'partial') {
+        transcriptEl.textContent = msg.text;
+        setStatus('Listening...');
+      } else if (msg.type === 'final') {
+        transcriptEl.textContent = msg.text;
+        setStatus('Thinking...');
+      } else if (msg.type === 'answer') {
+        answerEl.textContent = msg.answer || '';
+        setStatus('Synthesizing speech...');
+      } else if (msg.type === 'audio') {
+        playAudioUrl(msg.audio_url);
+        setStatus('Done');
+      } else if (msg.type === 'error') {
+        setStatus(`Server error: ${msg.error}`);
+      }
+    };
+  });
+}
+
+async function startStreamingRecording(stream) {
+  socket = await openConverseSocket();
+  mediaRecorder = new MediaRecorder(stream, { mimeType: 'audio/webm' });
+  mediaRecorder.ondataavailable = (e) => {
+    if (e.data && e.data.size > 0 && socket.readyState === WebSocket.OPEN) socket.send(e.data);
+  };
+  mediaRecorder.onstop = () => {
+    if (socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify({ type: 'stop' }));
+  };
+  // Emit a fragment every 250 ms instead of one blob at the end
+  mediaRecorder.start(250);
+}
+
 async function startRecording() {
   try {
     const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+    if (streamToggle && streamToggle.checked) {
+      try {
+        await startStreamingRecording(stream);
+        transcriptEl.textContent = ''; answerEl.textContent = '';
+        startTimer();
+        setStatus('Recording (streaming)...');
+        recordBtn.disabled = true; stopBtn.disabled = false;
+        return;
+      } catch (err) {
+        console.warn('Streaming unavailable, falling back to upload', err);
+      }
+    }
     recordedChunks = [];
     mediaRecorder = new MediaRecorder(stream, { mimeType: 'audio/webm' });
     mediaRecorder.ondataavailable = (e) => {
@@ -68,25 +155,65 @@ function stopRecording() {
   setStatus('Processing...');
 }
 
+function handleStreamEvent(name, data) {
+  if (name === 'transcript') {
+    transcriptEl.textContent = data.text;
+    setStatus('Searching the knowledge base...');
+  } else if (name === 'retrieval') {
+    setStatus(`Answering from ${data.hits.length} articles...`);
+  } else if (name === 'token') {
+    answerEl.textContent += data.text;
+  } else if (name === 'answer') {
+    answerEl.textContent = data.text;
+    setStatus('Synthesizing speech...');
+  } else if (name === 'audio') {
+    enqueueAudioUrl(data.audio_url);
+  } else if (name === 'error') {
+    setStatus(`Server error: ${data.error}`);
+  } else if (name === 'done') {
+    renderTimings(data.timings);
+    if (!statusEl.textContent.startsWith('Server error')) setStatus('Done');
+  }
+}
+
+async function readEventStream(res) {
+  // EventSource cannot POST a file, so parse the text/event-stream body by hand
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let name = 'message';
+      let data = '';
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) name = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (data) handleStreamEvent(name, JSON.parse(data));
+    }
+  }
+}
+
 async function sendAudioBlob(blob) {
   try {
     setStatus('Uploading audio...');
+    transcriptEl.textContent = ''; answerEl.textContent = ''; timingsEl.textContent = '';
+    audioQueue = [];
     const form = new FormData();
     // The backend expects a WAV filename; the server converts if needed
     form.append('file', blob, 'recording.webm');
-    const res = await fetch(`${API_BASE}/process`, {
+    const res = await fetch(`${API_BASE}/process/stream`, {
       method: 'POST',
       body: form
     });
     if (!res.ok) throw new Error(`HTTP ${res.status}`);
-    const data = await res.json();
-    transcriptEl.textContent = data.transcript || '';
-    answerEl.textContent = data.answer || '';
-    if (data.audio_url) {
-      player.src = `${API_BASE}${data.audio_url}`; // audio_url starts with '/audio/...'
-      player.play().catch(() => {});
-    }
-    setStatus('Done');
+    setStatus('Transcribing...');
+    await readEventStream(res);
   } catch (e) {
     console.error(e);
     setStatus('Failed to process audio');
@@ -0,0 +1,168 @@
+"""Bounded per-stage executors for the voiceLLM server.
+
+Every CPU step of /process blocks (ffmpeg, Whisper, FAISS + flan-t5), so none of
+it may run on the event loop. Each stage gets its own thread pool sized from the
+environment, plus a cap on how many calls may be queued behind it so a burst of
+uploads turns into 503s instead of an unbounded backlog. TTS is network bound
+and goes through the pooled async client in TTSPhase/ttsClient.py instead
+(TTS_POOL_SIZE bounds its connections).
+
+Environment:
+    IO_WORKERS / IO_QUEUE       upload conversion (ffmpeg subprocesses)
+    STT_WORKERS / STT_QUEUE     Whisper transcription
+    GEN_WORKERS / GEN_QUEUE     retrieval + flan-t5 generation; while GEN_BATCHING is on the
+                                default is at least GEN_MAX_BATCH, since every prompt in a
+                                RAGs/batch_scheduler.py batch holds one gen worker
+    TORCH_NUM_THREADS           optional intra-op thread count per process
+"""
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from Shared.profiling import current_profile
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+_CPUS = os.cpu_count() or 2
+
+# Same switches as RAGs/batch_scheduler.py (read here so the server doesn't import torch to size pools)
+GEN_BATCHING = os.getenv('GEN_BATCHING', '1').lower() not in ('0', 'false', 'no')
+GEN_MAX_BATCH = _env_int('GEN_MAX_BATCH', 8)
+
+# Torch releases the GIL inside its kernels, so threads give real parallelism
+# for STT and generation; ffmpeg and archival writes just wait on I/O. With
+# batching, gen workers mostly wait on the batcher, and a batch can only be as
+# large as the number of them.
+STAGE_DEFAULTS = {
+    'io': _CPUS,
+    'stt': max(1, _CPUS // 2),
+    'gen': max(_CPUS // 2, GEN_MAX_BATCH) if GEN_BATCHING else max(1, _CPUS // 2),
+}
+
+
+class StageOverloaded(RuntimeError):
+    """Raised when a stage already has its maximum number of queued calls."""
+
+
+class Stage:
+    """A thread pool with a bounded number of in-flight (running + queued) calls."""
+
+    def __init__(self, name: str, workers: int, queue: int):
+        self.name = name
+        self.workers = workers
+        self.capacity = workers + queue
+        self.in_flight = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{name}-worker')
+
+    async def run(self, fn, *args, **kwargs):
+        if self.in_flight >= self.capacity:
+            raise StageOverloaded(f"stage '{self.name}' is at capacity ({self.capacity})")
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            call = functools.partial(fn, *args, **kwargs)
+            profile = current_profile.get()
+            if profile is not None:
+                call = functools.partial(profile.run, self.name, call)
+            return await loop.run_in_executor(self.executor, call)
+        finally:
+            self.in_flight -= 1
+
+    async def iterate(self, gen_fn, *args, **kwargs):
+        """Run a blocking generator on this stage and yield its items as they are produced.
+
+        The generator holds one worker (and one in-flight slot) until it is exhausted or the
+        consumer stops early, in which case it is closed after its current item.
+        """
+        if self.in_flight >= self.capacity:
+            raise StageOverloaded(f"stage '{self.name}' is at capacity ({self.capacity})")
+        self.in_flight += 1
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        cancelled = threading.Event()
+        done = object()
+
+        def pump():
+            gen = gen_fn(*args, **kwargs)
+            try:
+                for item in gen:
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, (item, None))
+                loop.call_soon_threadsafe(items.put_nowait, (done, None))
+            except Exception as e:
+                loop.call_soon_threadsafe(items.put_nowait, (done, e))
+            finally:
+                gen.close()
+
+        call = pump
+        profile = current_profile.get()
+        if profile is not None:
+            call = functools.partial(profile.run, self.name, pump, getattr(gen_fn, '__qualname__', None))
+        worker = loop.run_in_executor(self.executor, call)
+        try:
+            while True:
+                item, error = await items.get()
+                if item is done:
+                    await asyncio.shield(worker)
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            cancelled.set()
+            # The slot is released when the worker is actually free, not when the consumer leaves
+            if worker.done():
+                self._release()
+            else:
+                worker.add_done_callback(self._release)
+
+    def _release(self, _future=None):
+        self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        return {'workers': self.workers, 'capacity': self.capacity, 'in_flight': self.in_flight}
+
+
+class StagePools:
+    """Holds one Stage per pipeline step, configured from environment variables."""
+
+    def __init__(self):
+        self.stages = {}
+        for name, default_workers in STAGE_DEFAULTS.items():
+            workers = _env_int(f'{name.upper()}_WORKERS', default_workers)
+            queue = _env_int(f'{name.upper()}_QUEUE', workers * 4)
+            self.stages[name] = Stage(name, workers, queue)
+
+    def __getitem__(self, name: str) -> Stage:
+        return self.stages[name]
+
+    async def run(self, stage: str, fn, *args, **kwargs):
+        return await self.stages[stage].run(fn, *args, **kwargs)
+
+    def iterate(self, stage: str, gen_fn, *args, **kwargs):
+        return self.stages[stage].iterate(gen_fn, *args, **kwargs)
+
+    def snapshot(self) -> dict:
+        return {name: stage.snapshot() for name, stage in self.stages.items()}
+
+    def shutdown(self):
+        for stage in self.stages.values():
+            stage.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def configure_torch_threads():
+    """Apply TORCH_NUM_THREADS if set, so concurrent workers don't oversubscribe cores."""
+    value = os.getenv('TORCH_NUM_THREADS')
+    if not value:
+        return
+    import torch
+    torch.set_num_threads(_env_int('TORCH_NUM_THREADS', 1))
@@ -1,17 +1,26 @@
 import os
 import sys
 import io
+import json
+import base64
+import asyncio
 import time
+import uuid
 import shutil
 import wave
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from typing import Optional
 import subprocess
 
+import numpy as np
 from dotenv import load_dotenv
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, Request, UploadFile, File, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.routing import Match
 
 # Ensure project root is on path so we can import existing modules
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -22,12 +31,45 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 # Import existing pipeline pieces
-from STTPhase.wavWhisperSingleFile import processAudio
-from RAGs.Implementation_with_GRPO import ask_query_with_grpo
-from TTSPhase.ElevenLabsAPIText import genAudioText
+from STTPhase.wavWhisperSingleFile import set_num_workers, transcribeArray
+from RAGs.Implementation_with_GRPO import ask_query_with_grpo, stream_answer_events, stream_answer_sentences
+from TTSPhase.ElevenLabsAPIText import synthesizeTextAsync, synthesizeSentencesAsync, streamTextAsync
+from TTSPhase.ttsClient import close_async_client
+from server import profiling
+from server.executors import StagePools, StageOverloaded, configure_torch_threads
+from server.streaming import FfmpegStreamDecoder, UtteranceBuffer, pcm16_to_float, resample
+from Shared.metrics import STAGE_SECONDS, metrics, stage_timer
+from Shared.modelRegistry import MODEL_PRELOAD, registry
 
 
-app = FastAPI(title="voiceLLM Server")
+# Per-stage worker pools; sizes are configured through *_WORKERS / *_QUEUE env vars
+configure_torch_threads()
+pools = StagePools()
+# The STT backend sizes itself (faster-whisper's parallel transcriptions) to the STT pool
+set_num_workers(pools['stt'].workers)
+
+# Server-side metrics; stage latencies, cache lookups and rewards are recorded by the pipeline modules
+REQUESTS_IN_FLIGHT = metrics.gauge('voicellm_requests_in_flight', 'Requests being handled, by endpoint.', ('endpoint',))
+REQUEST_SECONDS = metrics.histogram('voicellm_request_seconds', 'Time until the response starts, by endpoint.', ('endpoint',))
+REQUESTS = metrics.counter('voicellm_requests', 'Responses by endpoint and status code.', ('endpoint', 'status'))
+POOL_IN_FLIGHT = metrics.gauge('voicellm_pool_in_flight', 'Calls running or queued on each stage pool.', ('stage',))
+POOL_IN_FLIGHT.set_function(lambda: {(name,): stage['in_flight'] for name, stage in pools.snapshot().items()})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Importing the pipeline modules only registers their models. Load and warm
+    # them all in parallel in the background: the server accepts connections at
+    # once, /ready turns 200 when the slowest model is warm, and requests that
+    # arrive earlier wait for just the models they need.
+    if MODEL_PRELOAD:
+        threading.Thread(target=registry.load_all, name='model-preload', daemon=True).start()
+    yield
+    await close_async_client()
+    pools.shutdown()
+
+
+app = FastAPI(title="voiceLLM Server", lifespan=lifespan)
 
 # Allow GitHub Pages host and local dev by default
 allowed_origins = os.getenv('ALLOWED_ORIGINS', '*')
@@ -39,6 +81,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def route_label(scope) -> str:
+    """The route template (e.g. /tts/stream/{token}) so metric labels stay low-cardinality."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return 'unmatched'
+
+
+@app.middleware('http')
+async def track_requests(request, call_next):
+    endpoint = route_label(request.scope)
+    if endpoint == '/metrics':
+        return await call_next(request)
+    with REQUESTS_IN_FLIGHT.track_inprogress(endpoint=endpoint), REQUEST_SECONDS.time(endpoint=endpoint):
+        response = await call_next(request)
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+
 # Mount static route to serve generated TTS audio directly
 tts_audio_dir = os.path.join(PROJECT_ROOT, 'TTSPhase', 'elevenAudio')
 os.makedirs(tts_audio_dir, exist_ok=True)
@@ -48,9 +110,36 @@ app.mount('/audio', StaticFiles(directory=tts_audio_dir), name='audio')
 uploads_dir = os.path.join(CURRENT_DIR, 'uploads')
 os.makedirs(uploads_dir, exist_ok=True)
 
+# By default uploads are decoded, transcribed and answered entirely in memory.
+# Set ARCHIVE_AUDIO=1 to also keep the normalized upload, its transcript and the TTS mp3 on disk.
+ARCHIVE_AUDIO = os.getenv('ARCHIVE_AUDIO', '0').lower() in ('1', 'true', 'yes')
+
+# With TTS_STREAMING=1 the response carries a /tts/stream/<token> URL instead of finished audio;
+# the browser's audio element starts playing as soon as the first ElevenLabs chunk is relayed.
+TTS_STREAMING = os.getenv('TTS_STREAMING', '0').lower() in ('1', 'true', 'yes')
+# With ANSWER_STREAMING=1 flan-t5 streams the answer sentence by sentence and each sentence is
+# sent to TTS as soon as it is complete, so synthesis overlaps the rest of generation.
+ANSWER_STREAMING = os.getenv('ANSWER_STREAMING', '0').lower() in ('1', 'true', 'yes')
+PENDING_SPEECH_TTL = 300
+PENDING_SPEECH_MAX = 1024
+pending_speech = OrderedDict()  # token -> (text, created)
+pending_speech_lock = threading.Lock()
+
 
-def convert_to_wav(input_path: str, output_path: str) -> str:
-    """Convert input media to 16kHz mono WAV using ffmpeg. Returns output path.
+def register_speech(text: str) -> str:
+    """Remember text to be synthesized on demand and return its streaming URL."""
+    token = uuid.uuid4().hex
+    now = time.time()
+    with pending_speech_lock:
+        while pending_speech and (len(pending_speech) >= PENDING_SPEECH_MAX
+                                  or now - next(iter(pending_speech.values()))[1] > PENDING_SPEECH_TTL):
+            pending_speech.popitem(last=False)
+        pending_speech[token] = (text, now)
+    return f"/tts/stream/{token}"
+
+
+def decode_with_ffmpeg(input_bytes: bytes) -> np.ndarray:
+    """Decode any input ffmpeg understands to 16kHz mono float32 through stdin/stdout pipes.
     Requires ffmpeg to be installed and on PATH.
     """
     ffmpeg_bin = shutil.which('ffmpeg')
@@ -59,87 +148,471 @@ def convert_to_wav(input_path: str, output_path: str) -> str:
 
     cmd = [
         ffmpeg_bin,
-        '-y',
-        '-i', input_path,
+        '-loglevel', 'error',
+        '-i', 'pipe:0',
         '-ac', '1',
         '-ar', '16000',
-        '-f', 'wav',
-        output_path,
+        '-f', 's16le',
+        'pipe:1',
     ]
-    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return output_path
+    result = subprocess.run(cmd, input=input_bytes, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return pcm16_to_float(result.stdout)
 
 
-def ensure_wav(input_bytes: bytes, target_wav_path: str, original_filename: str) -> str:
-    """Store upload as WAV if possible; if not, save original then convert to WAV via ffmpeg."""
-    # If the upload file extension is already .wav, try to save directly
+@stage_timer('decode')
+def decode_upload(input_bytes: bytes, original_filename: str) -> np.ndarray:
+    """Decode an upload straight to the array Whisper consumes, without temp files.
+    16-bit WAV is parsed in-process; anything else takes a single ffmpeg pipe.
+    """
     _, ext = os.path.splitext(original_filename.lower())
     if ext == '.wav':
         try:
-            with wave.open(io.BytesIO(input_bytes), 'rb'):
-                pass
-            with open(target_wav_path, 'wb') as f:
-                f.write(input_bytes)
-            return target_wav_path
+            with wave.open(io.BytesIO(input_bytes), 'rb') as wf:
+                channels = wf.getnchannels()
+                sample_width = wf.getsampwidth()
+                sample_rate = wf.getframerate()
+                frames = wf.readframes(wf.getnframes())
+            if sample_width == 2:
+                audio = pcm16_to_float(frames)
+                if channels > 1:
+                    audio = audio.reshape(-1, channels).mean(axis=1)
+                return resample(audio, sample_rate)
         except wave.Error:
-            # Fall through to conversion if header invalid
+            # Fall through to ffmpeg if header invalid
             pass
+    return decode_with_ffmpeg(input_bytes)
 
-    # Save original bytes to temp file then convert
-    tmp_input_path = target_wav_path.replace('.wav', ext if ext else '.webm')
-    with open(tmp_input_path, 'wb') as f:
-        f.write(input_bytes)
 
-    try:
-        return convert_to_wav(tmp_input_path, target_wav_path)
-    finally:
-        # Best-effort cleanup of temp source
-        try:
-            os.remove(tmp_input_path)
-        except OSError:
-            pass
+def archive_request(request_tag: str, audio: np.ndarray, transcript: str):
+    """Write the normalized upload and its transcript to uploads_dir (ARCHIVE_AUDIO only)."""
+    wav_path = os.path.join(uploads_dir, f"query_{request_tag}.wav")
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(wav_path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(pcm.tobytes())
+    with open(wav_path.replace('.wav', '.txt'), 'w', encoding='utf-8') as f:
+        f.write(transcript)
 
 
-@app.post('/process')
-async def process(file: UploadFile = File(...)):
-    timestamp = time.strftime('%Y%m%d_%H%M%S')
-    base_name = f"query_{timestamp}.wav"
-    save_path = os.path.join(uploads_dir, base_name)
+def save_response_audio(audio_bytes: bytes, request_tag: str) -> str:
+    """Write TTS output under tts_audio_dir (ARCHIVE_AUDIO only) and return its filename."""
+    filename = f"response_{request_tag}Eleven.mp3"
+    with open(os.path.join(tts_audio_dir, filename), 'wb') as f:
+        f.write(audio_bytes)
+    return filename
+
+
+async def audio_url_for(audio_bytes: bytes, request_tag: str) -> Optional[str]:
+    """Turn finished mp3 bytes into a playable URL: /audio with ARCHIVE_AUDIO, otherwise a data: URL."""
+    if not audio_bytes:
+        return None
+    if ARCHIVE_AUDIO:
+        filename = await pools.run('io', save_response_audio, audio_bytes, request_tag)
+        # Public /audio URL for the saved file
+        return f"/audio/{filename}"
+    return 'data:audio/mpeg;base64,' + base64.b64encode(audio_bytes).decode('ascii')
 
-    # Read upload into memory and store/convert to wav
-    content = await file.read()
-    stored_path = ensure_wav(content, save_path, file.filename or 'upload.webm')
 
-    # Choose directory and filename for processAudio API
-    directory = os.path.dirname(stored_path)
-    filename = os.path.basename(stored_path)
+async def synthesize_response(answer: str, request_tag: str) -> Optional[str]:
+    """Run TTS for an answer and return a URL the browser can play.
+    In-memory mode returns a data: URL; with ARCHIVE_AUDIO the mp3 is saved and served from /audio;
+    with TTS_STREAMING synthesis is deferred to the /tts/stream URL.
+    TTS runs on the pooled async ElevenLabs client, so it holds no worker thread.
+    """
+    if TTS_STREAMING:
+        return register_speech(answer)
+    return await audio_url_for(await synthesizeTextAsync(answer), request_tag)
+
+
+async def answer_and_speak(transcript: str, request_tag: str):
+    """Generate the answer and its audio URL, returning (answer, audio_url).
+    With ANSWER_STREAMING each generated sentence goes to TTS while the next one is decoded
+    and the per-sentence mp3s are stitched; otherwise the whole answer is generated first.
+    """
+    if not ANSWER_STREAMING or TTS_STREAMING:
+        answer = await pools.run('gen', ask_query_with_grpo, transcript)
+        return answer, await synthesize_response(answer, request_tag)
+    sentences, parts = [], []
+    async for sentence, audio_bytes in synthesizeSentencesAsync(pools.iterate('gen', stream_answer_sentences, transcript)):
+        sentences.append(sentence)
+        if audio_bytes:
+            parts.append(audio_bytes)
+    return ' '.join(sentences), await audio_url_for(b''.join(parts), request_tag)
 
-    # Transcribe
-    transcript: Optional[str] = processAudio(filename, directory=directory)
-    if not transcript:
-        return JSONResponse(status_code=400, content={'error': 'transcription_failed'})
 
-    # RAG answer
-    answer: str = ask_query_with_grpo(transcript)
+@app.post('/process')
+async def process(request: Request, file: UploadFile = File(...)):
+    timestamp = time.strftime('%Y%m%d_%H%M%S')
+    # Concurrent requests can land in the same second, so make names unique
+    request_tag = f"{timestamp}_{uuid.uuid4().hex[:8]}"
+    # Opt-in cProfile of this request's pool calls (X-Profile header or PROFILE_SAMPLE_RATE)
+    profile = profiling.begin(request_tag, request.headers)
+    try:
+        response = await run_process(file, request_tag)
+    finally:
+        # Failed requests are the ones most worth profiling, so save on errors too
+        if profile is not None:
+            await asyncio.to_thread(profile.save)
+    response.headers['X-Request-Id'] = request_tag
+    if profile is not None:
+        response.headers['X-Profile-Id'] = profile.request_id
+    return response
+
+
+async def run_process(file: UploadFile, request_tag: str):
+    """decode -> STT -> RAG -> TTS for one upload; returns the JSON response."""
+    # Read upload into memory; every blocking step below runs on its stage pool
+    start = time.perf_counter()
+    with stage_timer('upload_read'):
+        content = await file.read()
+    try:
+        audio = await pools.run('io', decode_upload, content, file.filename or 'upload.webm')
 
-    # TTS
-    audio_filename = f"response_{timestamp}"
-    audio_path = genAudioText(answer, filename=audio_filename, directory=tts_audio_dir)
+        # Transcribe straight from the decoded array
+        transcript: Optional[str] = await pools.run('stt', transcribeArray, audio)
+        if not transcript or not transcript.strip():
+            return JSONResponse(status_code=400, content={'error': 'transcription_failed'})
+        if ARCHIVE_AUDIO:
+            await pools.run('io', archive_request, request_tag, audio, transcript)
 
-    audio_url = None
-    if audio_path and os.path.exists(audio_path):
-        # Convert absolute path to public /audio URL
-        audio_url = f"/audio/{os.path.basename(audio_path)}"
+        # RAG answer + TTS
+        answer, audio_url = await answer_and_speak(transcript, request_tag)
+    except StageOverloaded as e:
+        return JSONResponse(status_code=503, content={'error': 'server_busy', 'detail': str(e)})
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage='end_to_end')
 
-    return {
+    return JSONResponse({
         'transcript': transcript,
         'answer': answer,
         'audio_url': audio_url,
-    }
+    })
+
+
+def sse_event(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post('/process/stream')
+async def process_stream(request: Request, file: UploadFile = File(...)):
+    """/process as a server-sent event stream, one event per step as soon as it is done.
+
+    Events: transcript, retrieval (KB hits), token (answer text as it is decoded),
+    sentence, audio (one playable URL per sentence, in order), answer, error and a
+    final done event with the per-stage timings. Every event carries t, the seconds
+    since the request started.
+    """
+    request_tag = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    profile = profiling.begin(request_tag, request.headers)
+    with stage_timer('upload_read'):
+        content = await file.read()
+    filename = file.filename or 'upload.webm'
+
+    async def events():
+        start = time.perf_counter()
+        timings = {}
+        outbox = asyncio.Queue()
+
+        def elapsed():
+            return round(time.perf_counter() - start, 3)
+
+        def emit(name: str, data: dict):
+            outbox.put_nowait(sse_event(name, {**data, 't': elapsed()}))
+
+        async def speak(index: int, sentence: str, previous):
+            if TTS_STREAMING:
+                audio_url = register_speech(sentence)
+            else:
+                audio_url = await audio_url_for(await synthesizeTextAsync(sentence), f"{request_tag}_{index}")
+            # Audio events go out in sentence order even if a later sentence finishes first
+            if previous is not None:
+                await previous
+            if audio_url:
+                timings.setdefault('first_audio', elapsed())
+                emit('audio', {'index': index, 'audio_url': audio_url})
+
+        speakers = []
+
+        async def run():
+            # The response body streams from another task, so carry the profile over explicitly
+            profiling.current_profile.set(profile)
+            try:
+                mark = time.perf_counter()
+                audio = await pools.run('io', decode_upload, content, filename)
+                timings['decode'] = round(time.perf_counter() - mark, 3)
+
+                mark = time.perf_counter()
+                transcript = await pools.run('stt', transcribeArray, audio)
+                timings['stt'] = round(time.perf_counter() - mark, 3)
+                if not transcript or not transcript.strip():
+                    emit('error', {'error': 'transcription_failed'})
+                    return
+                emit('transcript', {'text': transcript})
+                if ARCHIVE_AUDIO:
+                    await pools.run('io', archive_request, request_tag, audio, transcript)
+
+                mark = time.perf_counter()
+                sentences, cached = [], False
+                async for kind, value in pools.iterate('gen', stream_answer_events, transcript):
+                    if kind == 'cached':
+                        cached = True
+                    elif kind == 'retrieval':
+                        timings['retrieval'] = round(time.perf_counter() - mark, 3)
+                        emit('retrieval', {'hits': value})
+                    elif kind == 'token':
+                        timings.setdefault('first_token', round(time.perf_counter() - mark, 3))
+                        emit('token', {'text': value})
+                    elif kind == 'sentence':
+                        emit('sentence', {'index': len(sentences), 'text': value})
+                        previous = speakers[-1] if speakers else None
+                        speakers.append(asyncio.create_task(speak(len(sentences), value, previous)))
+                        sentences.append(value)
+                timings['generation'] = round(time.perf_counter() - mark, 3)
+                emit('answer', {'text': ' '.join(sentences), 'cached': cached})
+
+                if speakers:
+                    await speakers[-1]
+                timings['tts_tail'] = round(time.perf_counter() - mark - timings['generation'], 3)
+            except StageOverloaded as e:
+                emit('error', {'error': 'server_busy', 'detail': str(e)})
+            except Exception as e:
+                emit('error', {'error': 'pipeline_failed', 'detail': f"{type(e).__name__}: {e}"})
+            finally:
+                for speaker in speakers:
+                    speaker.cancel()
+                timings['total'] = elapsed()
+                STAGE_SECONDS.observe(timings['total'], stage='end_to_end')
+                done = {'timings': timings}
+                if profile is not None:
+                    await asyncio.to_thread(profile.save)
+                    done['profile_id'] = profile.request_id
+                emit('done', done)
+                outbox.put_nowait(None)
+
+        task = asyncio.create_task(run())
+        try:
+            while (event := await outbox.get()) is not None:
+                yield event
+        finally:
+            # Client went away: stop generation and pending TTS
+            task.cancel()
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Request-Id': request_tag}
+    if profile is not None:
+        headers['X-Profile-Id'] = profile.request_id
+    return StreamingResponse(events(), media_type='text/event-stream', headers=headers)
+
+
+@app.get('/tts/stream/{token}')
+async def stream_speech(token: str):
+    """Relay ElevenLabs' chunked mp3 stream for a registered answer as it arrives."""
+    with pending_speech_lock:
+        entry = pending_speech.get(token)
+        # Expired entries are only evicted when new ones are registered, so check the age here too
+        if entry is not None and time.time() - entry[1] > PENDING_SPEECH_TTL:
+            del pending_speech[token]
+            entry = None
+    if entry is None:
+        return JSONResponse(status_code=404, content={'error': 'unknown_or_expired_audio'})
+    return StreamingResponse(streamTextAsync(entry[0]), media_type='audio/mpeg')
+
+
+# Partials favour speed: greedy only, no temperature fallback, no cross-window prompt
+PARTIAL_OPTIONS = {'temperature': 0.0, 'condition_on_previous_text': False, 'fp16': False}
+
+
+@app.websocket('/ws/converse')
+async def converse(ws: WebSocket):
+    """Streaming speech endpoint.
+
+    Protocol: the client first sends {"type": "start", "format": "webm" | "pcm16",
+    "sample_rate": 48000} as text, then binary audio frames as they are recorded,
+    and optionally {"type": "stop"} to force the end of the utterance. The server
+    replies with "partial", "final", "answer", "audio" and "error" JSON messages.
+    """
+    await ws.accept()
+    REQUESTS_IN_FLIGHT.inc(endpoint='/ws/converse')
+    send_lock = asyncio.Lock()
+    buffer = UtteranceBuffer()
+    decoder = None
+    pcm_rate = 16000
+    stt_task = None
+    answer_tasks = set()
+    last_partial = ''
+
+    async def send(message: dict):
+        async with send_lock:
+            await ws.send_json(message)
+
+    async def commit_overflow():
+        head = buffer.split_overflow()
+        if head is not None:
+            try:
+                buffer.committed.append(await pools.run('stt', transcribeArray, head, **PARTIAL_OPTIONS))
+            except StageOverloaded:
+                buffer.restore_head(head)
+                raise
+
+    async def refresh_partial():
+        nonlocal last_partial
+        buffer.samples_since_partial = 0
+        try:
+            await commit_overflow()
+            tail_text = await pools.run('stt', transcribeArray, buffer.audio.copy(), **PARTIAL_OPTIONS)
+        except StageOverloaded:
+            # Partials are best effort; the final transcript is still produced
+            return
+        text = buffer.text(tail_text)
+        if text and text != last_partial:
+            last_partial = text
+            await send({'type': 'partial', 'text': text})
+
+    async def answer(transcript: str):
+        request_tag = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        try:
+            if ANSWER_STREAMING and not TTS_STREAMING:
+                reply, audio_url = await answer_and_speak(transcript, request_tag)
+                await send({'type': 'answer', 'transcript': transcript, 'answer': reply})
+            else:
+                reply = await pools.run('gen', ask_query_with_grpo, transcript)
+                await send({'type': 'answer', 'transcript': transcript, 'answer': reply})
+                audio_url = await synthesize_response(reply, request_tag)
+            if audio_url:
+                await send({'type': 'audio', 'audio_url': audio_url})
+        except StageOverloaded as e:
+            await send({'type': 'error', 'error': 'server_busy', 'detail': str(e)})
+
+    async def finish_utterance():
+        nonlocal stt_task, last_partial
+        if stt_task is not None:
+            await stt_task
+            stt_task = None
+        await commit_overflow()
+        tail_text = ''
+        if buffer.audio.size:
+            tail_text = await pools.run('stt', transcribeArray, buffer.audio.copy(), fp16=False)
+        transcript = buffer.text(tail_text)
+        buffer.reset()
+        last_partial = ''
+        if not transcript:
+            return
+        await send({'type': 'final', 'text': transcript})
+        # RAG + TTS run in the background so the socket keeps taking audio
+        task = asyncio.create_task(answer(transcript))
+        answer_tasks.add(task)
+        task.add_done_callback(answer_tasks.discard)
+
+    try:
+        start = await ws.receive_json()
+        if start.get('format', 'webm') == 'pcm16':
+            pcm_rate = int(start.get('sample_rate', 16000))
+        else:
+            decoder = FfmpegStreamDecoder()
+            await decoder.start()
+
+        while True:
+            message = await ws.receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            stop = False
+            if message.get('bytes') is not None:
+                if decoder is not None:
+                    await decoder.feed(message['bytes'])
+                else:
+                    buffer.append(resample(pcm16_to_float(message['bytes']), pcm_rate))
+            elif message.get('text'):
+                stop = json.loads(message['text']).get('type') == 'stop'
+            if decoder is not None:
+                buffer.append(decoder.take_samples() if not stop else await decoder.close())
+
+            if stop or buffer.end_of_utterance():
+                await finish_utterance()
+                if stop:
+                    break
+            elif buffer.partial_due() and (stt_task is None or stt_task.done()):
+                stt_task = asyncio.create_task(refresh_partial())
+
+        if answer_tasks:
+            await asyncio.gather(*answer_tasks, return_exceptions=True)
+    except WebSocketDisconnect:
+        pass
+    except StageOverloaded as e:
+        await send({'type': 'error', 'error': 'server_busy', 'detail': str(e)})
+    finally:
+        for task in [stt_task, *answer_tasks]:
+            if task is not None and not task.done():
+                task.cancel()
+        if decoder is not None and decoder.process is not None and decoder.process.returncode is None:
+            decoder.process.kill()
+        REQUESTS_IN_FLIGHT.dec(endpoint='/ws/converse')
 
 
 @app.get('/')
 def root():
+    """Liveness: the process is up (models may still be loading; see /ready)."""
     return {'ok': True, 'message': 'voiceLLM server running'}
 
 
+@app.get('/ready')
+def ready():
+    """
+    Readiness: 200 once every registered model has loaded and run its warm-up.
+    With MODEL_PRELOAD=0 models load on first use, so nothing would ever become
+    ready before traffic arrives; the server is then ready as soon as it is up.
+    """
+    status = registry.status()
+    status['preload'] = MODEL_PRELOAD
+    if MODEL_PRELOAD and not status['ready']:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+
+@app.get('/models')
+def models():
+    """Per-model state with load and warm-up times."""
+    return registry.status()
+
+
+@app.get('/pools')
+def pool_status():
+    return pools.snapshot()
+
+
+def profiles_forbidden(request: Request):
+    """403 response unless the request carries PROFILE_TOKEN (no token configured: always 403)."""
+    if profiling.has_token(request.headers):
+        return None
+    return JSONResponse(status_code=403, content={'error': 'profiles_require_token'})
+
+
+@app.get('/profiles')
+def profiles(request: Request):
+    """Stored request profiles, newest first (needs X-Profile-Token)."""
+    forbidden = profiles_forbidden(request)
+    if forbidden is not None:
+        return forbidden
+    return {'profiles': profiling.list_profiles()}
+
+
+@app.get('/profiles/{request_id}')
+def get_profile(request_id: str, request: Request, raw: bool = False):
+    """A request's profile: text summary, or the pstats dump with ?raw=1 (needs X-Profile-Token)."""
+    forbidden = profiles_forbidden(request)
+    if forbidden is not None:
+        return forbidden
+    path = profiling.profile_path(request_id, '.prof' if raw else '.txt')
+    if path is None:
+        return JSONResponse(status_code=404, content={'error': 'unknown_profile'})
+    if raw:
+        return FileResponse(path, media_type='application/octet-stream', filename=f"{request_id}.prof")
+    with open(path, encoding='utf-8') as f:
+        return PlainTextResponse(f.read())
+
+
+@app.get('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (text exposition format 0.0.4)."""
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
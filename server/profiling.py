@@ -0,0 +1,153 @@
+"""Opt-in cProfile capture for single requests.
+
+A request is profiled when it is picked by PROFILE_SAMPLE_RATE or, with
+PROFILE_ALLOW_HEADER=1, carries ``X-Profile: 1``. The handler stores a
+RequestProfile in the context variable from Shared/profiling.py (so pipeline
+code can reach it without importing the server); Stage.run/iterate see it and
+run that request's pool calls (decode, Whisper, retrieval + flan-t5) under cProfile.
+Generation that runs on another thread (the micro-batcher, the answer-stream
+thread) is profiled there under the same request. The merged stats are written
+to a bounded spool directory as <request_id>.prof (for snakeviz or pstats) and
+<request_id>.txt (per-call wall times + top functions), served by
+/profiles/<request_id>. Requests that are not profiled only pay one ContextVar
+lookup per pool call.
+
+Profiling serializes profiled calls and the spool shows code paths and timings,
+so both are closed by default on a public deployment: the header is ignored
+unless PROFILE_ALLOW_HEADER=1, and with PROFILE_TOKEN set both the header and
+/profiles also need ``X-Profile-Token: <token>``. Without a token /profiles
+is disabled and the spool is only readable on disk.
+
+Environment:
+    PROFILE_SAMPLE_RATE     fraction of requests to profile (default 0)
+    PROFILE_ALLOW_HEADER    honour the X-Profile header (default 0)
+    PROFILE_TOKEN           shared secret for the header and /profiles (default unset)
+    PROFILE_DIR             spool directory (default server/profiles)
+    PROFILE_MAX_FILES       profiles kept before the oldest are deleted (default 100)
+"""
+import io
+import os
+import re
+import time
+import hmac
+import random
+from typing import Optional
+
+from Shared.profiling import CallProfile, current_profile
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROFILE_HEADER = 'x-profile'
+TOKEN_HEADER = 'x-profile-token'
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_ALLOW_HEADER = os.getenv('PROFILE_ALLOW_HEADER', '0').lower() in ('1', 'true', 'yes')
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(CURRENT_DIR, 'profiles'))
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '100'))
+PROFILE_TOP_FUNCTIONS = 40
+
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class RequestProfile(CallProfile):
+    """A CallProfile (Shared/profiling.py) for one HTTP request, saved to the spool."""
+
+    def __init__(self, request_id: str, reason: str):
+        super().__init__()
+        self.request_id = request_id
+        self.reason = reason
+        self.started = time.time()
+
+    def summary(self) -> str:
+        out = io.StringIO()
+        out.write(f"request {self.request_id} ({self.reason}) at "
+                  f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started))}\n\n")
+        out.write(f"{'stage':<6} {'seconds':>8}  function\n")
+        for stage, name, seconds, profiled in self.calls:
+            note = '' if profiled else '  (not profiled: another profile was running)'
+            out.write(f"{stage:<6} {seconds:>8.3f}  {name}{note}\n")
+        if self.stats is not None:
+            out.write('\n')
+            self.stats.stream = out
+            self.stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        return out.getvalue()
+
+    def save(self, directory: str = PROFILE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            if self.stats is not None:
+                self.stats.dump_stats(os.path.join(directory, f"{self.request_id}.prof"))
+            with open(os.path.join(directory, f"{self.request_id}.txt"), 'w', encoding='utf-8') as f:
+                f.write(self.summary())
+        prune_spool(directory)
+
+
+def has_token(headers) -> bool:
+    """True when PROFILE_TOKEN is set and the request carries it."""
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(headers.get(TOKEN_HEADER, ''), PROFILE_TOKEN)
+
+
+def should_profile(headers) -> Optional[str]:
+    """Why this request should be profiled ('header' or 'sampled'), or None."""
+    if (PROFILE_ALLOW_HEADER and headers.get(PROFILE_HEADER, '').lower() in ('1', 'true', 'yes')
+            and (not PROFILE_TOKEN or has_token(headers))):
+        return 'header'
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+def begin(request_id: str, headers) -> Optional[RequestProfile]:
+    """Start profiling the current request if asked to; returns the profile or None."""
+    reason = should_profile(headers)
+    if reason is None:
+        return None
+    profile = RequestProfile(request_id, reason)
+    current_profile.set(profile)
+    return profile
+
+
+def prune_spool(directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+    """Delete the oldest profiles beyond max_files (a .prof/.txt pair counts once)."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    ids = {}
+    for name in names:
+        request_id, ext = os.path.splitext(name)
+        if ext in ('.prof', '.txt'):
+            try:
+                mtime = os.path.getmtime(os.path.join(directory, name))
+            except FileNotFoundError:
+                continue
+            ids[request_id] = max(ids.get(request_id, 0), mtime)
+    for request_id in sorted(ids, key=ids.get)[:max(0, len(ids) - max_files)]:
+        for ext in ('.prof', '.txt'):
+            try:
+                os.remove(os.path.join(directory, request_id + ext))
+            except FileNotFoundError:
+                pass
+
+
+def profile_path(request_id: str, ext: str, directory: str = PROFILE_DIR) -> Optional[str]:
+    """Path of a stored profile file, or None for unknown or malformed ids."""
+    if not REQUEST_ID_PATTERN.match(request_id):
+        return None
+    path = os.path.join(directory, request_id + ext)
+    return path if os.path.exists(path) else None
+
+
+def list_profiles(directory: str = PROFILE_DIR) -> list:
+    try:
+        names = [n for n in os.listdir(directory) if n.endswith('.txt')]
+    except FileNotFoundError:
+        return []
+    entries = []
+    for name in names:
+        try:
+            mtime = os.path.getmtime(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        entries.append({'request_id': name[:-4], 'created': round(mtime, 3)})
+    return sorted(entries, key=lambda e: e['created'], reverse=True)
@@ -0,0 +1,210 @@
+"""Incremental decode + transcription state for the /ws/converse endpoint.
+
+The browser sends MediaRecorder webm/opus fragments (or raw PCM) while the user
+is still talking. Compressed input is piped through one long-lived ffmpeg
+process per connection; the resulting 16 kHz samples accumulate in a buffer
+that Whisper re-transcribes over a sliding window to produce partials. A run
+of trailing silence marks the end of the utterance.
+
+Environment:
+    WS_PARTIAL_INTERVAL   seconds of new audio between partial transcripts (default 1.0)
+    WS_WINDOW_SECONDS     longest buffer transcribed in one pass (default 25)
+    WS_SILENCE_MS         trailing silence that ends an utterance (default 800)
+    WS_SILENCE_RMS        int16 RMS below which a frame counts as silence (default 500)
+    WS_PREROLL_SECONDS    audio kept from before the first speech frame (default 1.0)
+"""
+import os
+import shutil
+import asyncio
+from typing import Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = SAMPLE_RATE * 30 // 1000  # 30 ms, same framing as STTPhase/STTVad.py
+
+PARTIAL_INTERVAL = float(os.getenv('WS_PARTIAL_INTERVAL', '1.0'))
+WINDOW_SECONDS = float(os.getenv('WS_WINDOW_SECONDS', '25'))
+SILENCE_MS = int(os.getenv('WS_SILENCE_MS', '800'))
+SILENCE_RMS = float(os.getenv('WS_SILENCE_RMS', '500')) / 32768.0
+PREROLL_SECONDS = float(os.getenv('WS_PREROLL_SECONDS', '1.0'))
+
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    """Convert little-endian int16 PCM bytes to float32 samples in [-1, 1]."""
+    return np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+
+
+def resample(audio: np.ndarray, source_rate: int) -> np.ndarray:
+    """Linear resample to 16 kHz; good enough for speech fed to Whisper."""
+    if source_rate == SAMPLE_RATE or audio.size == 0:
+        return audio
+    duration = audio.size / source_rate
+    target = np.linspace(0, duration, int(round(duration * SAMPLE_RATE)), endpoint=False)
+    source = np.arange(audio.size) / source_rate
+    return np.interp(target, source, audio).astype(np.float32)
+
+
+def frame_rms(audio: np.ndarray) -> np.ndarray:
+    """RMS of consecutive 30 ms frames (trailing partial frame dropped)."""
+    n = audio.size // FRAME_SAMPLES
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n * FRAME_SAMPLES].reshape(n, FRAME_SAMPLES)
+    return np.sqrt(np.mean(np.square(frames), axis=1))
+
+
+class FfmpegStreamDecoder:
+    """Feeds a compressed stream into ffmpeg's stdin and collects s16le PCM from stdout."""
+
+    def __init__(self, input_format: Optional[str] = None):
+        self.input_format = input_format
+        self.process = None
+        self.reader = None
+        self.pending = bytearray()
+
+    async def start(self):
+        ffmpeg_bin = shutil.which('ffmpeg')
+        if not ffmpeg_bin:
+            raise RuntimeError('ffmpeg not found on PATH')
+        cmd = [ffmpeg_bin, '-loglevel', 'error']
+        if self.input_format:
+            cmd += ['-f', self.input_format]
+        cmd += ['-i', 'pipe:0', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', 'pipe:1']
+        self.process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self.reader = asyncio.create_task(self._read_stdout())
+
+    async def _read_stdout(self):
+        while True:
+            data = await self.process.stdout.read(4096)
+            if not data:
+                break
+            self.pending.extend(data)
+
+    async def feed(self, data: bytes):
+        self.process.stdin.write(data)
+        await self.process.stdin.drain()
+
+    def take_samples(self) -> np.ndarray:
+        """Return whatever PCM has been decoded since the last call."""
+        usable = len(self.pending) - (len(self.pending) % 2)
+        chunk = bytes(self.pending[:usable])
+        del self.pending[:usable]
+        return pcm16_to_float(chunk)
+
+    async def close(self) -> np.ndarray:
+        """Flush ffmpeg and return the last decoded samples."""
+        if self.process is None:
+            return np.zeros(0, dtype=np.float32)
+        if self.process.stdin and not self.process.stdin.is_closing():
+            self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.reader, timeout=5)
+        except asyncio.TimeoutError:
+            self.process.kill()
+        await self.process.wait()
+        return self.take_samples()
+
+
+class UtteranceBuffer:
+    """Audio for the utterance in progress, plus text already committed from it.
+
+    Whisper handles at most 30 s per pass, so once the buffer grows past the
+    window its head is cut at the quietest frame near the window edge,
+    transcribed once, and moved into ``committed``; partials only re-run the tail.
+
+    Frames are kept as a list of chunks and only joined when the whole buffer is
+    read, so appending costs O(frame) instead of copying the buffer every time.
+    Until speech is heard only the last PREROLL_SECONDS are kept, so a silent or
+    muted connection holds a bounded amount of memory.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+        self.committed = []
+        self.samples_since_partial = 0
+        self.heard_speech = False
+
+    @property
+    def audio(self) -> np.ndarray:
+        if len(self._chunks) != 1:
+            self._chunks = [np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=np.float32)]
+        return self._chunks[0]
+
+    @audio.setter
+    def audio(self, value: np.ndarray):
+        self._chunks = [value]
+        self._size = value.size
+
+    def _tail(self, count: int) -> np.ndarray:
+        """The last count samples, joining only the chunks that hold them."""
+        parts, size = [], 0
+        for chunk in reversed(self._chunks):
+            if size >= count:
+                break
+            parts.append(chunk)
+            size += chunk.size
+        if not parts:
+            return np.zeros(0, dtype=np.float32)
+        tail = np.concatenate(parts[::-1]) if len(parts) > 1 else parts[0]
+        return tail[-count:] if count else tail[:0]
+
+    def append(self, samples: np.ndarray):
+        if samples.size == 0:
+            return
+        self._chunks.append(samples)
+        self._size += samples.size
+        self.samples_since_partial += samples.size
+        if self.heard_speech:
+            return
+        # Include the previous frame so tiny PCM packets still form whole frames
+        recent = self._tail(samples.size + FRAME_SAMPLES)
+        if np.any(frame_rms(recent) >= SILENCE_RMS):
+            self.heard_speech = True
+            return
+        preroll = int(PREROLL_SECONDS * SAMPLE_RATE)
+        if self._size > 2 * preroll:  # trim in steps so silence costs O(frame) per append
+            self.audio = self._tail(preroll).copy()
+
+    @property
+    def seconds(self) -> float:
+        return self._size / SAMPLE_RATE
+
+    def partial_due(self) -> bool:
+        return self.heard_speech and self.samples_since_partial >= PARTIAL_INTERVAL * SAMPLE_RATE
+
+    def end_of_utterance(self) -> bool:
+        """True once speech was heard and the last SILENCE_MS of audio is quiet."""
+        if not self.heard_speech:
+            return False
+        tail_frames = max(1, SILENCE_MS // 30)
+        rms = frame_rms(self._tail(tail_frames * FRAME_SAMPLES))
+        return rms.size >= tail_frames and bool(np.all(rms < SILENCE_RMS))
+
+    def split_overflow(self) -> Optional[np.ndarray]:
+        """If the buffer exceeds the window, detach and return its head for committing."""
+        window = int(WINDOW_SECONDS * SAMPLE_RATE)
+        if self._size <= window:
+            return None
+        # Look for the quietest frame in the last two seconds before the window edge
+        search_start = max(0, window - 2 * SAMPLE_RATE)
+        rms = frame_rms(self.audio[search_start:window])
+        cut = search_start + (int(np.argmin(rms)) * FRAME_SAMPLES if rms.size else window - search_start)
+        head, self.audio = self.audio[:cut], self.audio[cut:]
+        return head
+
+    def restore_head(self, head: np.ndarray):
+        """Put back a head returned by split_overflow that could not be transcribed."""
+        self.audio = np.concatenate([head, self.audio])
+
+    def text(self, tail_text: str = '') -> str:
+        return ' '.join(t.strip() for t in self.committed + [tail_text] if t and t.strip())
+
+    def reset(self):
+        self.__init__()